@@ -0,0 +1,171 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import ADMISSION_REJECTED, ADMISSION_WAIT, ADMISSION_WAITING
+
+# ---------------- Admission Control ----------------
+# CPU-bound requests are admitted into lanes with a fixed number of slots.
+# Requests that find every slot busy wait in a bounded FIFO queue for at
+# most max_wait seconds; beyond that they are shed with Overloaded, which
+# the app turns into a 429 with Retry-After. Cheap requests get their own
+# lane so they never queue behind a 12 MP embed.
+
+class Overloaded(Exception):
+    def __init__(self, lane, retry_after, reason=None):
+        super().__init__(f"Server busy ({reason or lane + ' queue full'}), retry in {retry_after}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+class Lane:
+    """Fixed-size slot pool with a bounded FIFO wait queue"""
+
+    def __init__(self, name, slots, max_queue, max_wait):
+        self.name = name
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._running = 0
+        self._running_cost = 0
+        self._waiting = deque()
+        self._queued_cost = 0
+        # seconds of work per cost unit, learned from finished requests
+        self._seconds_per_unit = None
+
+    def retry_after(self, extra_cost=0):
+        """Seconds until the current backlog should have drained"""
+        with self._cond:
+            return self._retry_after(extra_cost)
+
+    def _retry_after(self, extra_cost=0):
+        if not self._seconds_per_unit:
+            return 1
+        backlog = self._running_cost + self._queued_cost + extra_cost
+        return min(120, max(1, math.ceil(backlog * self._seconds_per_unit / self.slots)))
+
+    def saturated(self):
+        with self._cond:
+            return self._running >= self.slots and len(self._waiting) >= self.max_queue
+
+    def _shed(self, cost):
+        ADMISSION_REJECTED.inc(lane=self.name)
+        return Overloaded(self.name, self._retry_after(cost))
+
+    @contextmanager
+    def admit(self, cost):
+        start = time.perf_counter()
+        ticket = object()
+        with self._cond:
+            if self._running >= self.slots or self._waiting:
+                if len(self._waiting) >= self.max_queue:
+                    raise self._shed(cost)
+                self._waiting.append(ticket)
+                self._queued_cost += cost
+                ADMISSION_WAITING.set(len(self._waiting), lane=self.name)
+                try:
+                    deadline = start + self.max_wait
+                    while self._waiting[0] is not ticket or self._running >= self.slots:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            raise self._shed(cost)
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting.remove(ticket)
+                    self._queued_cost -= cost
+                    ADMISSION_WAITING.set(len(self._waiting), lane=self.name)
+                    self._cond.notify_all()
+            self._running += 1
+            self._running_cost += cost
+        ADMISSION_WAIT.observe(time.perf_counter() - start, lane=self.name)
+
+        work_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - work_start
+            with self._cond:
+                self._running -= 1
+                self._running_cost -= cost
+                if cost > 0:
+                    rate = elapsed / cost
+                    self._seconds_per_unit = rate if self._seconds_per_unit is None else 0.8 * self._seconds_per_unit + 0.2 * rate
+                self._cond.notify_all()
+
+class Scheduler:
+    """Routes each request to the light or heavy lane by estimated cost"""
+
+    def __init__(self, light_slots, heavy_slots, max_queue, max_wait, light_cost_limit):
+        self.light_cost_limit = light_cost_limit
+        self.light = Lane('light', light_slots, max_queue, max_wait)
+        self.heavy = Lane('heavy', heavy_slots, max_queue, max_wait)
+
+    def lane_for(self, cost):
+        return self.light if cost <= self.light_cost_limit else self.heavy
+
+    def admit(self, cost, cheap=False):
+        return (self.light if cheap else self.lane_for(cost)).admit(cost)
+
+# ---------------- Memory Budget ----------------
+# Each request reserves its estimated peak allocation for as long as it runs.
+# Requests that do not fit in what is left wait up to max_wait seconds for
+# running ones to release theirs; requests larger than the whole budget can
+# never run and are refused outright.
+
+class OverBudget(Exception):
+    def __init__(self, needed, budget):
+        super().__init__(f"Request needs about {needed / 1e6:.0f} MB, above the "
+                         f"server memory budget of {budget / 1e6:.0f} MB")
+        self.needed = needed
+        self.budget = budget
+
+class MemoryBudget:
+    """Bytes shared by the requests running in this process"""
+
+    def __init__(self, budget, max_wait):
+        self.budget = budget
+        self.max_wait = max_wait
+        self.name = 'memory'
+        self._cond = threading.Condition()
+        self._reserved = 0
+        self._waiting = 0
+
+    def _shed(self):
+        ADMISSION_REJECTED.inc(lane=self.name)
+        return Overloaded(self.name, min(120, max(1, math.ceil(self.max_wait))), 'memory budget exhausted')
+
+    @contextmanager
+    def reserve(self, nbytes):
+        if nbytes <= 0:
+            yield
+            return
+        if nbytes > self.budget:
+            ADMISSION_REJECTED.inc(lane=self.name)
+            raise OverBudget(nbytes, self.budget)
+
+        start = time.perf_counter()
+        with self._cond:
+            if self._reserved + nbytes > self.budget:
+                self._waiting += 1
+                ADMISSION_WAITING.set(self._waiting, lane=self.name)
+                try:
+                    deadline = start + self.max_wait
+                    while self._reserved + nbytes > self.budget:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            raise self._shed()
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    ADMISSION_WAITING.set(self._waiting, lane=self.name)
+            self._reserved += nbytes
+        ADMISSION_WAIT.observe(time.perf_counter() - start, lane=self.name)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._reserved -= nbytes
+                self._cond.notify_all()
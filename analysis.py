@@ -0,0 +1,82 @@
+import base64
+
+import numpy as np
+
+# ---------------- Ciphertext Analysis ----------------
+# Byte statistics come from a single np.bincount pass (plus one dot product
+# for serial correlation), and the hex and base64 previews encode only the
+# bytes they show. Levels:
+#   none  - no analysis
+#   basic - lengths, previews and entropy
+#   full  - basic plus chi-square, byte mean and serial correlation
+ANALYSIS_LEVELS = ('none', 'basic', 'full')
+PREVIEW_CHARS = 100
+_BYTE_VALUES = np.arange(256, dtype=np.float64)
+
+def _as_array(data) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.uint8)
+
+def _entropy(counts: np.ndarray, n: int) -> float:
+    p = counts[counts > 0] / n
+    return float((p * np.log2(1 / p)).sum())
+
+def calculate_entropy(data):
+    """Calculate Shannon entropy of data in bits per byte"""
+    if len(data) == 0:
+        return 0
+    return _entropy(np.bincount(_as_array(data), minlength=256), len(data))
+
+def byte_statistics(data):
+    """Entropy, chi-square against a uniform distribution, byte mean and
+    serial correlation coefficient (as computed by ent) of data"""
+    n = len(data)
+    if n == 0:
+        return {'entropy': 0, 'chi_square': 0.0, 'mean': 0.0, 'serial_correlation': 0.0}
+    values = _as_array(data)
+    counts = np.bincount(values, minlength=256)
+    expected = n / 256
+    total = float(counts @ _BYTE_VALUES)
+    squares = float(counts @ (_BYTE_VALUES * _BYTE_VALUES))
+
+    # Correlation of each byte with the next, wrapping around at the end
+    x = values.astype(np.float64)
+    products = float(x[:-1] @ x[1:] + x[-1] * x[0])
+    denominator = n * squares - total * total
+    serial = (n * products - total * total) / denominator if denominator else 1.0
+
+    return {
+        'entropy': _entropy(counts, n),
+        'chi_square': float(((counts - expected) ** 2).sum() / expected),
+        'mean': total / n,
+        'serial_correlation': serial
+    }
+
+def _hex_preview(data):
+    shown = PREVIEW_CHARS // 2
+    return data[:shown].hex() + ('...' if len(data) > shown else '')
+
+def _base64_preview(data):
+    # 3 bytes per 4 characters, so this prefix encodes to the same characters
+    return base64.b64encode(data[:PREVIEW_CHARS * 3 // 4]).decode()[:PREVIEW_CHARS] + '...'
+
+def analyze_ciphertext(ciphertext, tag, encrypted_data, level='full'):
+    """Analyze and display ciphertext information, or None for level 'none'"""
+    if level not in ANALYSIS_LEVELS:
+        raise ValueError(f"Unknown analysis level {level!r}, expected one of {', '.join(ANALYSIS_LEVELS)}")
+    if level == 'none':
+        return None
+
+    analysis = {
+        'ciphertext_length': len(ciphertext),
+        'tag_length': len(tag),
+        'nonce_length': len(encrypted_data) - len(ciphertext) - len(tag),
+        'total_encrypted_length': len(encrypted_data),
+        'ciphertext_hex': _hex_preview(ciphertext),
+        'ciphertext_base64': _base64_preview(ciphertext),
+        'tag_hex': tag.hex()
+    }
+    if level == 'basic':
+        analysis['entropy'] = calculate_entropy(ciphertext)
+    else:
+        analysis.update(byte_statistics(ciphertext))
+    return analysis
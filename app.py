@@ -1,12 +1,39 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Request, after_this_request, current_app, g, render_template, request, jsonify, send_file, Response
 import os
 import base64
+import json
 from io import BytesIO
 import tempfile
+import wave
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import wraps
+from urllib.parse import unquote
+import psutil
+from PIL import Image
 from stego_core import *
-from stego_core import extract_data_from_image_DE, extract_data_from_audio_DE
+from stego_core import extract_data_from_audio_DE
+from covercache import PayloadCache, content_digest
+from batch import (MANIFEST_NAME, BatchItem, carrier_capacity, carrier_kind, embed_item, embed_shard,
+                   extract_item, extract_shard, item_options, iter_uploads, map_bounded, read_manifest, stream_zip,
+                   summarize)
+from container import MAX_SHARDS, join_shards, split_shards
+from admission import MemoryBudget, OverBudget, Overloaded, Scheduler
+from jobs import (JobManager, QueueFull, embed_image_task, embed_audio_task,
+                  extract_image_task, extract_audio_task)
+from metrics import (REGISTRY, CONTENT_TYPE, REQUESTS, FAILURES, BYTES_IN, BYTES_OUT,
+                     REQUEST_LATENCY, PeakMemory, get_sampler, stage_timer)
+
+class SpooledUploadRequest(Request):
+    """Keeps uploaded files in memory up to SPOOL_MAX_SIZE bytes instead of
+    Werkzeug's 500KB, so only truly huge uploads touch the disk"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=current_app.config['SPOOL_MAX_SIZE'], mode='rb+')
 
 application = Flask(__name__)
+application.request_class = SpooledUploadRequest
 
 app = application
 
@@ -14,19 +41,235 @@ app.config['SECRET_KEY'] = 'hgdhsgdyegwe$##%$%#@##g24g1g1'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['DOWNLOAD_FOLDER'] = 'downloads'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+app.config['SPOOL_MAX_SIZE'] = SPOOL_MAX_SIZE  # in-memory limit for uploads and stego WAVs
+app.config['JOB_WORKERS'] = int(os.environ.get('STEGO_JOB_WORKERS', os.cpu_count() or 1))
+app.config['JOB_QUEUE_LIMIT'] = int(os.environ.get('STEGO_JOB_QUEUE_LIMIT', 32))
+app.config['JOB_TTL'] = int(os.environ.get('STEGO_JOB_TTL', 600))  # seconds a finished job is kept
+app.config['JOB_STORE_MAX_BYTES'] = int(os.environ.get('STEGO_JOB_STORE_MAX_BYTES', 256 * 1024 * 1024))
+app.config['BATCH_WORKERS'] = int(os.environ.get('STEGO_BATCH_WORKERS', os.cpu_count() or 1))
+app.config['BATCH_MAX_ITEMS'] = int(os.environ.get('STEGO_BATCH_MAX_ITEMS', 1000))
+app.config['EXTRACT_CACHE_BYTES'] = int(os.environ.get('STEGO_EXTRACT_CACHE_BYTES', 64 * 1024 * 1024))
+app.config['EXTRACT_CACHE_TTL'] = int(os.environ.get('STEGO_EXTRACT_CACHE_TTL', 600))  # seconds
+app.config['ADMISSION_HEAVY_SLOTS'] = int(os.environ.get('STEGO_ADMISSION_HEAVY_SLOTS', os.cpu_count() or 1))
+app.config['ADMISSION_LIGHT_SLOTS'] = int(os.environ.get('STEGO_ADMISSION_LIGHT_SLOTS', 4))
+app.config['ADMISSION_QUEUE_LIMIT'] = int(os.environ.get('STEGO_ADMISSION_QUEUE_LIMIT', 8))  # per lane
+app.config['ADMISSION_MAX_WAIT'] = float(os.environ.get('STEGO_ADMISSION_MAX_WAIT', 30))  # seconds
+# Requests touching at most this many carrier samples (about a 0.7 MP RGB
+# image or 45 s of stereo audio) run in the light lane
+app.config['ADMISSION_LIGHT_COST'] = int(os.environ.get('STEGO_ADMISSION_LIGHT_COST', 4 * 1024 * 1024))
+# Estimated peak bytes the requests of one worker process may hold at once
+app.config['ADMISSION_MEMORY_BUDGET'] = int(os.environ.get('STEGO_MEMORY_BUDGET', psutil.virtual_memory().total // 2))
 
 # Create directories if they don't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['DOWNLOAD_FOLDER'], exist_ok=True)
 
+# Start the CPU/RSS sampler now rather than on the first request
+get_sampler()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    REQUESTS.inc(endpoint=endpoint)
+    BYTES_IN.inc(request.content_length or 0, endpoint=endpoint)
+    BYTES_OUT.inc(response.content_length or 0, endpoint=endpoint)
+
+    # Errors are mostly reported as small {'success': False} JSON bodies
+    failed = response.status_code >= 400
+    if not failed and response.is_json and (response.content_length or 0) < 4096:
+        body = response.get_json(silent=True)
+        failed = isinstance(body, dict) and body.get('success') is False
+    if failed:
+        FAILURES.inc(endpoint=endpoint)
+
+    if 'request_start' in g:
+        REQUEST_LATENCY.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+# ---------------- Admission control ----------------
+# CPU-bound endpoints estimate their cost as the number of carrier samples
+# they will touch plus the payload bits, read from the image or WAV header
+# before any decoding, and are admitted through the scheduler's light or
+# heavy lane. Excess load is shed with 429 and Retry-After. Views that
+# declare a peak estimate also reserve it against the memory budget.
+_scheduler = None
+_memory_budget = None
+
+def _get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler(
+            light_slots=app.config['ADMISSION_LIGHT_SLOTS'],
+            heavy_slots=app.config['ADMISSION_HEAVY_SLOTS'],
+            max_queue=app.config['ADMISSION_QUEUE_LIMIT'],
+            max_wait=app.config['ADMISSION_MAX_WAIT'],
+            light_cost_limit=app.config['ADMISSION_LIGHT_COST']
+        )
+    return _scheduler
+
+def _get_memory_budget():
+    global _memory_budget
+    if _memory_budget is None:
+        _memory_budget = MemoryBudget(app.config['ADMISSION_MEMORY_BUDGET'], app.config['ADMISSION_MAX_WAIT'])
+    return _memory_budget
+
+def _overloaded(error, retry_after):
+    response = jsonify({'success': False, 'error': error})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def _header_samples(carrier, stream):
+    """Samples in an image or WAV stream from its header alone, or None.
+    The stream is rewound."""
+    try:
+        if carrier == 'image':
+            with Image.open(stream) as img:
+                return img.size[0] * img.size[1] * len(img.getbands())
+        with wave.open(stream, 'rb') as audio:
+            return audio.getnframes() * audio.getnchannels()
+    except Exception:
+        return None
+    finally:
+        stream.seek(0)
+
+def _carrier_samples(carrier, field):
+    """Samples in the uploaded carrier from its header alone, or None"""
+    upload = request.files.get(field)
+    if upload is not None:
+        return _header_samples(carrier, upload.stream)
+    if carrier == 'image' and _v2_param('cover_hash'):
+        cover = COVER_CACHE.get(_v2_param('cover_hash').lower(), count=False)
+        return None if cover is None else cover.pixels.size
+    if request.mimetype and not request.mimetype.startswith('multipart/'):
+        return _header_samples(carrier, BytesIO(request.get_data()))  # cached for the view
+    return None
+
+def _shed_heavy():
+    """429 response when the body is heavy whatever it contains and the heavy
+    lane is saturated, else None"""
+    scheduler = _get_scheduler()
+    if (request.content_length or 0) > scheduler.light_cost_limit and scheduler.heavy.saturated():
+        retry_after = scheduler.heavy.retry_after()
+        return _overloaded(f"Server busy, retry in {retry_after}s", retry_after)
+    return None
+
+def admitted(carrier=None, field=None, cheap=False, peak=None):
+    """Run the view through admission control; cheap views always use the light lane.
+
+    peak(samples, upload_bytes) estimates the view's peak allocation, which is
+    held against the memory budget while the view runs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            scheduler = _get_scheduler()
+            # Shed bodies that are heavy whatever they contain before parsing them
+            shed = None if cheap else _shed_heavy()
+            if shed is not None:
+                return shed
+
+            # /capacity takes either carrier
+            kind, name = (carrier, field) if carrier else (('image', 'image') if 'image' in request.files else ('audio', 'audio'))
+            samples = _carrier_samples(kind, name)
+            if samples is None:
+                # Unreadable header: assume a roughly 4x decode expansion and
+                # let the view report the error
+                samples = (request.content_length or 0) * 4
+            cost = samples + (len(_v2_param('secret_message').encode()) + _v2_secret_file()[1]) * 8
+            needed = peak(samples, request.content_length or 0) if peak else 0
+
+            try:
+                with scheduler.admit(cost, cheap), _get_memory_budget().reserve(needed), \
+                        PeakMemory(request.endpoint or 'unknown') as usage:
+                    g.peak_memory = usage
+                    return view(*args, **kwargs)
+            except Overloaded as e:
+                return _overloaded(str(e), e.retry_after)
+            except OverBudget as e:
+                return jsonify({'success': False, 'error': str(e)}), 413
+        return wrapper
+    return decorator
+
+def _analysis_level():
+    """Ciphertext analysis level from an analysis form field or X-Analysis header"""
+    return _v2_param('analysis').lower() or 'full'
+
+def _engine_param(carrier):
+    """Codec engine from an engine form field or X-Engine header, None for the
+    configured default"""
+    name = _v2_param('engine').lower()
+    if name and name not in engine_names(carrier):
+        raise ValueError(f"engine must be one of: {', '.join(engine_names(carrier))}")
+    return name or None
+
+def _load_cover(image_bytes):
+    """Cover for the uploaded image bytes or, when nothing was uploaded, the
+    cached cover named by a cover_hash form field or X-Cover-Hash header"""
+    return load_cover(image_bytes or None, _v2_param('cover_hash').lower() or None)
+
+def _wants_ssim():
+    """Tile SSIM is opt-in through an ssim form field or X-Ssim header"""
+    return _v2_param('ssim').lower() in ('1', 'true', 'yes', 'on')
+
+def _image_embed_peak(samples, upload_bytes):
+    return image_embed_peak_bytes(samples, upload_bytes, ssim=_wants_ssim())
+
+def _capacity_peak(samples, upload_bytes):
+    # Uploaded images are decoded and cached; WAV capacity comes from the header
+    return image_decode_peak_bytes(samples, upload_bytes) if 'image' in request.files else 0
+
+def _peak_memory_mb():
+    """Peak MB allocated by this request so far, or None when tracking is off"""
+    usage = g.get('peak_memory')
+    return None if usage is None else usage.peak_mb()
+
+# Payloads extracted from stego carriers, kept so retries with corrected
+# keys skip extraction
+_extracted = None
+
+def _extract_cache():
+    global _extracted
+    if _extracted is None:
+        _extracted = PayloadCache(app.config['EXTRACT_CACHE_BYTES'], app.config['EXTRACT_CACHE_TTL'])
+    return _extracted
+
+def _extract_cached(carrier, extract):
+    """Encrypted payload, extract time and content hash of a stego carrier
+    (bytes or a seekable stream). extract(carrier) only runs when the
+    payload is not already cached from an earlier attempt."""
+    start = time.perf_counter()
+    digest = content_digest(carrier)
+    extracted_data = _extract_cache().get(digest)
+    if extracted_data is not None:
+        return extracted_data, (time.perf_counter() - start) * 1000, digest
+    extracted_data, extract_time = extract(carrier)
+    _extract_cache().put(digest, extracted_data)
+    return extracted_data, extract_time, digest
+
+def _decrypt_message(extracted_data, aes_key):
+    """Decrypted text of a payload; hidden files are only served by /v2"""
+    plaintext, kind = decrypt_payload(extracted_data, aes_key)
+    if kind == PAYLOAD_BINARY:
+        raise ValueError("payload is a binary file, extract it with the /v2 endpoints")
+    return plaintext.decode('utf-8')
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/embed_audio', methods=['POST'])
+@admitted('audio', 'audio', peak=audio_peak_bytes)
 def embed_audio():
-    temp_audio_path = None
-    stego_audio_path = None
+    stego_audio = None
     
     try:
         # Get form data with validation
@@ -40,6 +283,15 @@ def embed_audio():
         if not secret_message:
             return jsonify({'success': False, 'error': 'Secret message cannot be empty'})
         
+        analysis = _analysis_level()
+        if analysis not in ANALYSIS_LEVELS:
+            return jsonify({'success': False, 'error': f"analysis must be one of: {', '.join(ANALYSIS_LEVELS)}"})
+        
+        try:
+            engine = _engine_param('audio')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+        
         # Check file type
         if not audio_file.filename.lower().endswith(('.wav', '.wave')):
             return jsonify({'success': False, 'error': 'Only WAV audio files are supported'})
@@ -50,19 +302,16 @@ def embed_audio():
         
         # Encrypt message
         encryption_start = time.perf_counter()
-        encrypted_data, ciphertext, tag = aes_encrypt(secret_message, aes_key)
+        with stage_timer('encrypt'):
+            encrypted_data, ciphertext, tag, compression = encrypt_message(secret_message, aes_key)
         encryption_time = (time.perf_counter() - encryption_start) * 1000
         
-        # Save audio to temporary file
-        temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        temp_audio_path = temp_audio.name
-        audio_file.save(temp_audio_path)
-        temp_audio.close()
-        
-        # Embed data in audio with capacity error handling
+        # Embed data in audio with capacity error handling; the upload
+        # stream is read in place
+        stats = DistortionStats()
         try:
-            stego_audio_path, embed_time, snr, capacity_bits, capacity_per_sample = embed_data_in_audio_DE(
-                temp_audio_path, encrypted_data
+            stego_audio, embed_time, snr, capacity_bits, capacity_per_sample = embed_data_in_audio_stream(
+                audio_file.stream, encrypted_data, app.config['SPOOL_MAX_SIZE'], stats, engine
             )
         except ValueError as e:
             if "too large" in str(e).lower():
@@ -71,14 +320,14 @@ def embed_audio():
                 raise e
         
         # Analyze ciphertext
-        ciphertext_analysis = analyze_ciphertext(ciphertext, tag, encrypted_data)
+        ciphertext_analysis = analyze_ciphertext(ciphertext, tag, encrypted_data, analysis)
         
         # Get system metrics
         cpu_percent, memory_usage = get_system_metrics()
         
         # Read stego audio as base64
-        with open(stego_audio_path, 'rb') as f:
-            stego_audio_data = base64.b64encode(f.read()).decode()
+        with stage_timer('serialize'):
+            stego_audio_data = base64.b64encode(stego_audio.read()).decode()
         
         response = {
             'success': True,
@@ -91,33 +340,36 @@ def embed_audio():
                 'embed_time': embed_time,
                 'total_time': encryption_time + embed_time,
                 'snr': snr,
+                'mse': stats.mse,
+                'changed_samples': stats.changed,
                 'capacity_bits': capacity_bits,
                 'capacity_per_sample': capacity_per_sample,
                 'cpu_usage': cpu_percent,
                 'memory_usage': memory_usage,
+                'peak_memory': _peak_memory_mb(),
                 'original_message_size': len(secret_message.encode()),
-                'encrypted_data_size': len(encrypted_data)
+                'encrypted_data_size': len(encrypted_data),
+                'compression': compression.name,
+                'compression_ratio': compression.ratio,
+                'compression_time': compression.time_ms
             },
             'ciphertext_analysis': ciphertext_analysis
         }
         
-        return jsonify(response)
+        with stage_timer('serialize'):
+            return jsonify(response)
         
     except Exception as e:
         print(f"Error in embed_audio: {str(e)}")
         return jsonify({'success': False, 'error': f"Audio embedding failed: {str(e)}"})
     
     finally:
-        # Clean up temporary files
-        if temp_audio_path and os.path.exists(temp_audio_path):
-            safe_delete_file(temp_audio_path)
-        if stego_audio_path and os.path.exists(stego_audio_path):
-            safe_delete_file(stego_audio_path)
+        if stego_audio is not None:
+            stego_audio.close()
 
 @app.route('/extract_audio', methods=['POST'])
+@admitted('audio', 'stego_audio', peak=audio_peak_bytes)
 def extract_audio():
-    temp_audio_path = None
-    
     try:
         # Get form data with validation
         audio_file = request.files.get('stego_audio')
@@ -143,14 +395,15 @@ def extract_audio():
         except (ValueError, TypeError) as e:
             return jsonify({'success': False, 'error': f'Invalid key format: {str(e)}'})
         
-        # Save audio to temporary file
-        temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        temp_audio_path = temp_audio.name
-        audio_file.save(temp_audio_path)
-        temp_audio.close()
+        try:
+            engine = _engine_param('audio')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
         
-        # Extract data from audio
-        extracted_data, extract_time = extract_data_from_audio_DE(temp_audio_path)
+        # Extract data from audio, reading the upload stream in place, unless
+        # an earlier attempt already extracted it
+        extracted_data, extract_time, carrier_hash = _extract_cached(
+            audio_file.stream, lambda stream: extract_data_from_audio_DE(stream, engine))
         
         if not extracted_data:
             return jsonify({'success': False, 'error': 'No hidden data found in the audio file or the file may be corrupted'})
@@ -158,9 +411,10 @@ def extract_audio():
         # Decrypt message
         decryption_start = time.perf_counter()
         try:
-            decrypted_message, extracted_ciphertext = aes_decrypt(extracted_data, aes_key)
+            with stage_timer('decrypt'):
+                decrypted_message = _decrypt_message(extracted_data, aes_key)
         except ValueError as e:
-            return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}'})
+            return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}', 'carrier_hash': carrier_hash})
         decryption_time = (time.perf_counter() - decryption_start) * 1000
         
         # Get system metrics
@@ -169,72 +423,86 @@ def extract_audio():
         response = {
             'success': True,
             'decrypted_message': decrypted_message,
+            'carrier_hash': carrier_hash,
             'metrics': {
                 'extract_time': extract_time,
                 'decryption_time': decryption_time,
                 'total_time': extract_time + decryption_time,
                 'cpu_usage': cpu_percent,
-                'memory_usage': memory_usage
+                'memory_usage': memory_usage,
+                'peak_memory': _peak_memory_mb()
             }
         }
         
-        return jsonify(response)
+        with stage_timer('serialize'):
+            return jsonify(response)
         
     except Exception as e:
         print(f"Error in extract_audio: {str(e)}")
         return jsonify({'success': False, 'error': f"Audio extraction failed: {str(e)}"})
-    
-    finally:
-        # Clean up temporary file
-        if temp_audio_path and os.path.exists(temp_audio_path):
-            safe_delete_file(temp_audio_path)
 
 @app.route('/embed_image', methods=['POST'])
+@admitted('image', 'image', peak=_image_embed_peak)
 def embed_image():
     try:
         # Get form data with validation
         image_file = request.files.get('image')
         secret_message = request.form.get('secret_message', '').strip()
+        has_image = image_file is not None and image_file.filename != ''
         
-        # Validate inputs
-        if not image_file or image_file.filename == '':
+        # Validate inputs; a cover_hash stands in for a re-upload
+        if not has_image and not _v2_param('cover_hash'):
             return jsonify({'success': False, 'error': 'No image file selected'})
         
         if not secret_message:
             return jsonify({'success': False, 'error': 'Secret message cannot be empty'})
         
+        analysis = _analysis_level()
+        if analysis not in ANALYSIS_LEVELS:
+            return jsonify({'success': False, 'error': f"analysis must be one of: {', '.join(ANALYSIS_LEVELS)}"})
+        
+        try:
+            engine = _engine_param('image')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+        
         # Check file type
         allowed_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif'}
-        file_ext = os.path.splitext(image_file.filename.lower())[1]
-        if file_ext not in allowed_extensions:
+        if has_image and os.path.splitext(image_file.filename.lower())[1] not in allowed_extensions:
             return jsonify({'success': False, 'error': 'Supported image formats: PNG, JPG, JPEG, BMP, TIFF'})
         
+        try:
+            cover = _load_cover(image_file.read() if has_image else None)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+        
         # Generate keys
         private_key, public_key = ecc_generate_keypair()
         aes_key = ecc_derive_shared_key(private_key, public_key)
         
         # Encrypt message
         encryption_start = time.perf_counter()
-        encrypted_data, ciphertext, tag = aes_encrypt(secret_message, aes_key)
+        with stage_timer('encrypt'):
+            encrypted_data, ciphertext, tag, compression = encrypt_message(secret_message, aes_key)
         encryption_time = (time.perf_counter() - encryption_start) * 1000
         
-        # Convert image to base64
-        image_data = base64.b64encode(image_file.read()).decode()
-        full_image_data = f"data:image/png;base64,{image_data}"
-        
-        # Embed data in image with capacity error handling
+        # Embed straight from the upload bytes; only the result is base64 encoded
+        stats = DistortionStats()
         try:
-            stego_image, embed_time, psnr, capacity_bits, capacity_per_pixel = embed_data_in_image_DE(
-                full_image_data, encrypted_data
+            stego_bytes, embed_time, psnr, capacity_bits, capacity_per_pixel = embed_data_in_image_bytes(
+                cover, encrypted_data, stats=stats, ssim=_wants_ssim(), engine=engine
             )
         except ValueError as e:
             if "too large" in str(e).lower():
                 return jsonify({'success': False, 'error': f"Message too large for selected image. {str(e)}"})
             else:
                 raise e
+        with stage_timer('serialize'):
+            stego_image = base64.b64encode(stego_bytes).decode()
+        del stego_bytes
         
         # Analyze ciphertext
-        ciphertext_analysis = analyze_ciphertext(ciphertext, tag, encrypted_data)
+        ciphertext_analysis = analyze_ciphertext(ciphertext, tag, encrypted_data, analysis)
         
         # Get system metrics
         cpu_percent, memory_usage = get_system_metrics()
@@ -242,6 +510,7 @@ def embed_image():
         response = {
             'success': True,
             'stego_image': stego_image,
+            'cover_hash': cover.digest,
             'private_key': private_key.hex(),
             'public_key': public_key.hex(),
             'aes_key': aes_key.hex(),
@@ -250,23 +519,32 @@ def embed_image():
                 'embed_time': embed_time,
                 'total_time': encryption_time + embed_time,
                 'psnr': psnr,
+                'ssim': stats.ssim,
+                'mse': stats.mse,
+                'changed_samples': stats.changed,
                 'capacity_bits': capacity_bits,
                 'capacity_per_pixel': capacity_per_pixel,
                 'cpu_usage': cpu_percent,
                 'memory_usage': memory_usage,
+                'peak_memory': _peak_memory_mb(),
                 'original_message_size': len(secret_message.encode()),
-                'encrypted_data_size': len(encrypted_data)
+                'encrypted_data_size': len(encrypted_data),
+                'compression': compression.name,
+                'compression_ratio': compression.ratio,
+                'compression_time': compression.time_ms
             },
             'ciphertext_analysis': ciphertext_analysis
         }
         
-        return jsonify(response)
+        with stage_timer('serialize'):
+            return jsonify(response)
         
     except Exception as e:
         print(f"Error in embed_image: {str(e)}")
         return jsonify({'success': False, 'error': f"Image embedding failed: {str(e)}"})
 
 @app.route('/extract_image', methods=['POST'])
+@admitted('image', 'stego_image', peak=image_extract_peak_bytes)
 def extract_image():
     try:
         # Get form data with validation
@@ -295,12 +573,14 @@ def extract_image():
         except (ValueError, TypeError) as e:
             return jsonify({'success': False, 'error': f'Invalid key format: {str(e)}'})
         
-        # Convert image to base64
-        image_data = base64.b64encode(image_file.read()).decode()
-        full_image_data = f"data:image/png;base64,{image_data}"
+        try:
+            engine = _engine_param('image')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
         
-        # Extract data from image
-        extracted_data, extract_time = extract_data_from_image_DE(full_image_data)
+        # Extract data from image, unless an earlier attempt already did
+        extracted_data, extract_time, carrier_hash = _extract_cached(
+            image_file.read(), lambda image_bytes: extract_data_from_image_bytes(image_bytes, engine=engine))
         
         if not extracted_data:
             return jsonify({'success': False, 'error': 'No hidden data found in the image or the image may be corrupted'})
@@ -308,9 +588,10 @@ def extract_image():
         # Decrypt message
         decryption_start = time.perf_counter()
         try:
-            decrypted_message, extracted_ciphertext = aes_decrypt(extracted_data, aes_key)
+            with stage_timer('decrypt'):
+                decrypted_message = _decrypt_message(extracted_data, aes_key)
         except ValueError as e:
-            return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}'})
+            return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}', 'carrier_hash': carrier_hash})
         decryption_time = (time.perf_counter() - decryption_start) * 1000
         
         # Get system metrics
@@ -319,21 +600,1117 @@ def extract_image():
         response = {
             'success': True,
             'decrypted_message': decrypted_message,
+            'carrier_hash': carrier_hash,
             'metrics': {
                 'extract_time': extract_time,
                 'decryption_time': decryption_time,
                 'total_time': extract_time + decryption_time,
                 'cpu_usage': cpu_percent,
-                'memory_usage': memory_usage
+                'memory_usage': memory_usage,
+                'peak_memory': _peak_memory_mb()
             }
         }
         
-        return jsonify(response)
+        with stage_timer('serialize'):
+            return jsonify(response)
         
     except Exception as e:
         print(f"Error in extract_image: {str(e)}")
         return jsonify({'success': False, 'error': f"Image extraction failed: {str(e)}"})
 
+# ---------------- v2 binary endpoints ----------------
+# Carriers arrive as multipart files or as a raw request body, with text
+# fields in the form or in X- headers (URL-encoded), and stego files go back
+# as binary bodies with the JSON result in the X-Stego-Result header.
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif'}
+AUDIO_EXTENSIONS = ('.wav', '.wave')
+
+def _v2_upload(field):
+    """Carrier bytes and filename from a multipart field or the raw body"""
+    upload = request.files.get(field)
+    if upload is not None:
+        return upload.read(), upload.filename
+    if request.mimetype and not request.mimetype.startswith('multipart/'):
+        return request.get_data(cache=False), None
+    return None, None
+
+def _v2_upload_stream(field):
+    """Seekable carrier stream and filename; multipart files are used in place"""
+    upload = request.files.get(field)
+    if upload is not None:
+        return upload.stream, upload.filename
+    data, filename = _v2_upload(field)
+    return (BytesIO(data) if data else None), filename
+
+def _v2_param(name):
+    value = request.form.get(name)
+    if value is None:
+        value = unquote(request.headers.get('X-' + name.replace('_', '-').title(), ''))
+    return value.strip()
+
+def _v2_file_response(data, mimetype, download_name, result):
+    stream = BytesIO(data) if isinstance(data, bytes) else data
+    with stage_timer('serialize'):
+        response = send_file(stream, mimetype=mimetype, download_name=download_name)
+        response.headers['X-Stego-Result'] = json.dumps(result)
+    response.headers['Access-Control-Expose-Headers'] = 'X-Stego-Result'
+    return response
+
+def _v2_secret_file():
+    """Seekable stream and size of a secret_file upload, or (None, 0)"""
+    upload = request.files.get('secret_file')
+    if upload is None or not upload.filename:
+        return None, 0
+    stream = upload.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return (stream, size) if size else (None, 0)
+
+def _v2_payload(aes_key):
+    """Encrypted payload, ciphertext, tag and Compression for a v2 embed.
+
+    A secret_file is sealed in chunked AES-GCM as the carrier consumes it,
+    so it is never held whole, compressed, or reported as ciphertext and tag.
+    """
+    secret_file, size = _v2_secret_file()
+    if secret_file is not None:
+        return aead_payload(secret_file, aes_key, size), None, None, Compression(COMPRESS_NONE, b'', size, 0.0)
+    return encrypt_message(_v2_param('secret_message'), aes_key)
+
+def _v2_keys():
+    private_key_hex = _v2_param('private_key')
+    public_key_hex = _v2_param('public_key')
+    if not private_key_hex or not public_key_hex:
+        raise ValueError('Private and public keys are required')
+    try:
+        return ecc_derive_shared_key(bytes.fromhex(private_key_hex), bytes.fromhex(public_key_hex))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid key format: {str(e)}')
+
+@app.route('/v2/embed_image', methods=['POST'])
+@admitted('image', 'image', peak=_image_embed_peak)
+def embed_image_v2():
+    try:
+        image_bytes, filename = _v2_upload('image')
+        secret_message = _v2_param('secret_message')
+
+        # Validate inputs; a cover_hash stands in for a re-upload
+        if not image_bytes and not _v2_param('cover_hash'):
+            return jsonify({'success': False, 'error': 'No image file selected'})
+
+        if not secret_message and _v2_secret_file()[0] is None:
+            return jsonify({'success': False, 'error': 'Secret message cannot be empty'})
+
+        analysis = _analysis_level()
+        if analysis not in ANALYSIS_LEVELS:
+            return jsonify({'success': False, 'error': f"analysis must be one of: {', '.join(ANALYSIS_LEVELS)}"})
+
+        try:
+            engine = _engine_param('image')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        if filename and os.path.splitext(filename.lower())[1] not in IMAGE_EXTENSIONS:
+            return jsonify({'success': False, 'error': 'Supported image formats: PNG, JPG, JPEG, BMP, TIFF'})
+
+        try:
+            cover = _load_cover(image_bytes)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+        del image_bytes
+
+        # Generate keys
+        private_key, public_key = ecc_generate_keypair()
+        aes_key = ecc_derive_shared_key(private_key, public_key)
+
+        # Encrypt message; a secret file is sealed while it is embedded
+        encryption_start = time.perf_counter()
+        with stage_timer('encrypt'):
+            encrypted_data, ciphertext, tag, compression = _v2_payload(aes_key)
+        encryption_time = (time.perf_counter() - encryption_start) * 1000
+
+        # Embed data in image with capacity error handling
+        stats = DistortionStats()
+        try:
+            stego_image, embed_time, psnr, capacity_bits, capacity_per_pixel = embed_data_in_image_bytes(
+                cover, encrypted_data, stats=stats, ssim=_wants_ssim(), engine=engine
+            )
+        except ValueError as e:
+            if "too large" in str(e).lower():
+                return jsonify({'success': False, 'error': f"Message too large for selected image. {str(e)}"})
+            else:
+                raise e
+
+        # Analyze ciphertext; streamed files are never held whole
+        ciphertext_analysis = analyze_ciphertext(ciphertext, tag, encrypted_data, analysis) if ciphertext is not None else None
+
+        # Get system metrics
+        cpu_percent, memory_usage = get_system_metrics()
+
+        result = {
+            'success': True,
+            'cover_hash': cover.digest,
+            'private_key': private_key.hex(),
+            'public_key': public_key.hex(),
+            'aes_key': aes_key.hex(),
+            'metrics': {
+                'encryption_time': encryption_time,
+                'embed_time': embed_time,
+                'total_time': encryption_time + embed_time,
+                'psnr': psnr,
+                'ssim': stats.ssim,
+                'mse': stats.mse,
+                'changed_samples': stats.changed,
+                'capacity_bits': capacity_bits,
+                'capacity_per_pixel': capacity_per_pixel,
+                'cpu_usage': cpu_percent,
+                'memory_usage': memory_usage,
+                'peak_memory': _peak_memory_mb(),
+                'original_message_size': compression.original_size,
+                'encrypted_data_size': len(encrypted_data),
+                'compression': compression.name,
+                'compression_ratio': compression.ratio,
+                'compression_time': compression.time_ms
+            },
+            'ciphertext_analysis': ciphertext_analysis
+        }
+
+        return _v2_file_response(stego_image, 'image/png', 'stego_image.png', result)
+
+    except Exception as e:
+        print(f"Error in embed_image_v2: {str(e)}")
+        return jsonify({'success': False, 'error': f"Image embedding failed: {str(e)}"})
+
+@app.route('/v2/extract_image', methods=['POST'])
+@admitted('image', 'stego_image', peak=image_extract_peak_bytes)
+def extract_image_v2():
+    try:
+        image_bytes, filename = _v2_upload('stego_image')
+
+        # Validate inputs
+        if not image_bytes:
+            return jsonify({'success': False, 'error': 'No image file selected'})
+
+        if filename and os.path.splitext(filename.lower())[1] not in IMAGE_EXTENSIONS:
+            return jsonify({'success': False, 'error': 'Supported image formats: PNG, JPG, JPEG, BMP, TIFF'})
+
+        try:
+            aes_key = _v2_keys()
+            engine = _engine_param('image')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        # Extract data from image, unless an earlier attempt already did
+        extracted_data, extract_time, carrier_hash = _extract_cached(
+            image_bytes, lambda data: extract_data_from_image_bytes(data, engine))
+
+        if not extracted_data:
+            return jsonify({'success': False, 'error': 'No hidden data found in the image or the image may be corrupted'})
+
+        # Decrypt message
+        decryption_start = time.perf_counter()
+        try:
+            with stage_timer('decrypt'):
+                plaintext, kind = decrypt_payload(extracted_data, aes_key)
+                decrypted_message = plaintext.decode('utf-8') if kind == PAYLOAD_TEXT else None
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}', 'carrier_hash': carrier_hash})
+        decryption_time = (time.perf_counter() - decryption_start) * 1000
+
+        # Get system metrics
+        cpu_percent, memory_usage = get_system_metrics()
+
+        result = {
+            'success': True,
+            'decrypted_message': decrypted_message,
+            'carrier_hash': carrier_hash,
+            'metrics': {
+                'extract_time': extract_time,
+                'decryption_time': decryption_time,
+                'total_time': extract_time + decryption_time,
+                'cpu_usage': cpu_percent,
+                'memory_usage': memory_usage,
+                'peak_memory': _peak_memory_mb()
+            }
+        }
+
+        # Hidden files are returned as the response body
+        if kind == PAYLOAD_BINARY:
+            return _v2_file_response(plaintext, 'application/octet-stream', 'secret.bin', result)
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Error in extract_image_v2: {str(e)}")
+        return jsonify({'success': False, 'error': f"Image extraction failed: {str(e)}"})
+
+@app.route('/v2/embed_audio', methods=['POST'])
+@admitted('audio', 'audio', peak=audio_peak_bytes)
+def embed_audio_v2():
+    stego_audio = None
+
+    try:
+        audio_stream, filename = _v2_upload_stream('audio')
+        secret_message = _v2_param('secret_message')
+
+        # Validate inputs
+        if audio_stream is None:
+            return jsonify({'success': False, 'error': 'No audio file selected'})
+
+        if not secret_message and _v2_secret_file()[0] is None:
+            return jsonify({'success': False, 'error': 'Secret message cannot be empty'})
+
+        analysis = _analysis_level()
+        if analysis not in ANALYSIS_LEVELS:
+            return jsonify({'success': False, 'error': f"analysis must be one of: {', '.join(ANALYSIS_LEVELS)}"})
+
+        try:
+            engine = _engine_param('audio')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        if filename and not filename.lower().endswith(AUDIO_EXTENSIONS):
+            return jsonify({'success': False, 'error': 'Only WAV audio files are supported'})
+
+        # Generate keys
+        private_key, public_key = ecc_generate_keypair()
+        aes_key = ecc_derive_shared_key(private_key, public_key)
+
+        # Encrypt message; a secret file is sealed while it is embedded
+        encryption_start = time.perf_counter()
+        with stage_timer('encrypt'):
+            encrypted_data, ciphertext, tag, compression = _v2_payload(aes_key)
+        encryption_time = (time.perf_counter() - encryption_start) * 1000
+
+        # Embed data in audio with capacity error handling
+        stats = DistortionStats()
+        try:
+            stego_audio, embed_time, snr, capacity_bits, capacity_per_sample = embed_data_in_audio_stream(
+                audio_stream, encrypted_data, app.config['SPOOL_MAX_SIZE'], stats, engine
+            )
+        except ValueError as e:
+            if "too large" in str(e).lower():
+                return jsonify({'success': False, 'error': f"Message too large for selected audio file. {str(e)}"})
+            else:
+                raise e
+
+        # Analyze ciphertext; streamed files are never held whole
+        ciphertext_analysis = analyze_ciphertext(ciphertext, tag, encrypted_data, analysis) if ciphertext is not None else None
+
+        # Get system metrics
+        cpu_percent, memory_usage = get_system_metrics()
+
+        result = {
+            'success': True,
+            'private_key': private_key.hex(),
+            'public_key': public_key.hex(),
+            'aes_key': aes_key.hex(),
+            'metrics': {
+                'encryption_time': encryption_time,
+                'embed_time': embed_time,
+                'total_time': encryption_time + embed_time,
+                'snr': snr,
+                'mse': stats.mse,
+                'changed_samples': stats.changed,
+                'capacity_bits': capacity_bits,
+                'capacity_per_sample': capacity_per_sample,
+                'cpu_usage': cpu_percent,
+                'memory_usage': memory_usage,
+                'peak_memory': _peak_memory_mb(),
+                'original_message_size': compression.original_size,
+                'encrypted_data_size': len(encrypted_data),
+                'compression': compression.name,
+                'compression_ratio': compression.ratio,
+                'compression_time': compression.time_ms
+            },
+            'ciphertext_analysis': ciphertext_analysis
+        }
+
+        # send_file closes the stream once the response has been sent
+        response = _v2_file_response(stego_audio, 'audio/wav', 'stego_audio.wav', result)
+        stego_audio = None
+        return response
+
+    except Exception as e:
+        print(f"Error in embed_audio_v2: {str(e)}")
+        return jsonify({'success': False, 'error': f"Audio embedding failed: {str(e)}"})
+
+    finally:
+        if stego_audio is not None:
+            stego_audio.close()
+
+@app.route('/v2/extract_audio', methods=['POST'])
+@admitted('audio', 'stego_audio', peak=audio_peak_bytes)
+def extract_audio_v2():
+    try:
+        audio_stream, filename = _v2_upload_stream('stego_audio')
+
+        # Validate inputs
+        if audio_stream is None:
+            return jsonify({'success': False, 'error': 'No audio file selected'})
+
+        if filename and not filename.lower().endswith(AUDIO_EXTENSIONS):
+            return jsonify({'success': False, 'error': 'Only WAV audio files are supported'})
+
+        try:
+            aes_key = _v2_keys()
+            engine = _engine_param('audio')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        # Extract data from audio, unless an earlier attempt already did
+        extracted_data, extract_time, carrier_hash = _extract_cached(
+            audio_stream, lambda stream: extract_data_from_audio_DE(stream, engine))
+
+        if not extracted_data:
+            return jsonify({'success': False, 'error': 'No hidden data found in the audio file or the file may be corrupted'})
+
+        # Decrypt message
+        decryption_start = time.perf_counter()
+        try:
+            with stage_timer('decrypt'):
+                plaintext, kind = decrypt_payload(extracted_data, aes_key)
+                decrypted_message = plaintext.decode('utf-8') if kind == PAYLOAD_TEXT else None
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}', 'carrier_hash': carrier_hash})
+        decryption_time = (time.perf_counter() - decryption_start) * 1000
+
+        # Get system metrics
+        cpu_percent, memory_usage = get_system_metrics()
+
+        result = {
+            'success': True,
+            'decrypted_message': decrypted_message,
+            'carrier_hash': carrier_hash,
+            'metrics': {
+                'extract_time': extract_time,
+                'decryption_time': decryption_time,
+                'total_time': extract_time + decryption_time,
+                'cpu_usage': cpu_percent,
+                'memory_usage': memory_usage,
+                'peak_memory': _peak_memory_mb()
+            }
+        }
+
+        # Hidden files are returned as the response body
+        if kind == PAYLOAD_BINARY:
+            return _v2_file_response(plaintext, 'application/octet-stream', 'secret.bin', result)
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Error in extract_audio_v2: {str(e)}")
+        return jsonify({'success': False, 'error': f"Audio extraction failed: {str(e)}"})
+
+# Decrypts a payload extracted earlier, named by the carrier_hash an extract
+# response returned, so key retries need not upload the carrier again
+@app.route('/v2/extract_cached', methods=['POST'])
+@admitted(cheap=True)
+def extract_cached_v2():
+    try:
+        carrier_hash = _v2_param('carrier_hash').lower()
+        if not carrier_hash:
+            return jsonify({'success': False, 'error': 'carrier_hash is required'})
+
+        try:
+            aes_key = _v2_keys()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        extracted_data = _extract_cache().get(carrier_hash)
+        if extracted_data is None:
+            return jsonify({'success': False, 'error': 'Unknown or expired carrier_hash, upload the carrier again'}), 404
+
+        # Decrypt message
+        decryption_start = time.perf_counter()
+        try:
+            with stage_timer('decrypt'):
+                plaintext, kind = decrypt_payload(extracted_data, aes_key)
+                decrypted_message = plaintext.decode('utf-8') if kind == PAYLOAD_TEXT else None
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}', 'carrier_hash': carrier_hash})
+        decryption_time = (time.perf_counter() - decryption_start) * 1000
+
+        result = {
+            'success': True,
+            'decrypted_message': decrypted_message,
+            'carrier_hash': carrier_hash,
+            'metrics': {
+                'decryption_time': decryption_time,
+                'total_time': decryption_time,
+                'peak_memory': _peak_memory_mb()
+            }
+        }
+
+        # Hidden files are returned as the response body
+        if kind == PAYLOAD_BINARY:
+            return _v2_file_response(plaintext, 'application/octet-stream', 'secret.bin', result)
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Error in extract_cached_v2: {str(e)}")
+        return jsonify({'success': False, 'error': f"Extraction failed: {str(e)}"})
+
+# ---------------- Async job endpoints ----------------
+# Jobs accept the same inputs as the v2 endpoints, return a job ID at once
+# and run the stego_core work in a process pool. Clients poll /jobs/<id>
+# and fetch stego files from /jobs/<id>/file.
+_jobs = None
+
+def _job_manager():
+    global _jobs
+    if _jobs is None:
+        _jobs = JobManager(
+            max_workers=app.config['JOB_WORKERS'],
+            max_pending=app.config['JOB_QUEUE_LIMIT'],
+            ttl=app.config['JOB_TTL'],
+            max_bytes=app.config['JOB_STORE_MAX_BYTES']
+        )
+    return _jobs
+
+def _submit_job(kind, task, args, finish, peak, **extra):
+    """Queue a job whose first argument is its carrier (bytes or a Cover).
+    peak(samples, upload_bytes) is held against the memory budget until the
+    job finishes, and refused like the synchronous views when it cannot be."""
+    carrier = args[0]
+    if isinstance(carrier, Cover):
+        samples, upload_bytes = carrier.pixels.size, 0
+    else:
+        upload_bytes = len(carrier)
+        samples = _header_samples(kind.split('_')[1], BytesIO(carrier)) or upload_bytes * 4
+    reservation = ExitStack()
+    try:
+        reservation.enter_context(_get_memory_budget().reserve(peak(samples, upload_bytes)))
+    except Overloaded as e:
+        return _overloaded(str(e), e.retry_after)
+    except OverBudget as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+
+    try:
+        job_id = _job_manager().submit(kind, task, args, finish, reservation.close)
+    except QueueFull as e:
+        # The pool drains at its own pace; a short fixed hint is enough
+        return _overloaded(str(e), 5)
+    return jsonify({'success': True, 'job_id': job_id, 'status_url': f'/jobs/{job_id}', **extra}), 202
+
+def _encrypt_for_job(secret_message, analysis):
+    private_key, public_key = ecc_generate_keypair()
+    aes_key = ecc_derive_shared_key(private_key, public_key)
+
+    encryption_start = time.perf_counter()
+    with stage_timer('encrypt'):
+        encrypted_data, ciphertext, tag, compression = encrypt_message(secret_message, aes_key)
+    encryption_time = (time.perf_counter() - encryption_start) * 1000
+
+    result = {
+        'success': True,
+        'private_key': private_key.hex(),
+        'public_key': public_key.hex(),
+        'aes_key': aes_key.hex(),
+        'metrics': {
+            'encryption_time': encryption_time,
+            'original_message_size': len(secret_message.encode()),
+            'encrypted_data_size': len(encrypted_data),
+            'compression': compression.name,
+            'compression_ratio': compression.ratio,
+            'compression_time': compression.time_ms
+        },
+        'ciphertext_analysis': analyze_ciphertext(ciphertext, tag, encrypted_data, analysis)
+    }
+    return encrypted_data, result
+
+def _finish_embed(result, quality_key, capacity_key, mimetype):
+    def finish(value):
+        stego_file, embed_time, quality, capacity_bits, capacity_per_unit, distortion = value
+        result['metrics'].update({
+            'embed_time': embed_time,
+            'total_time': result['metrics']['encryption_time'] + embed_time,
+            quality_key: quality,
+            'capacity_bits': capacity_bits,
+            capacity_key: capacity_per_unit,
+            **distortion
+        })
+        return result, stego_file, mimetype
+    return finish
+
+def _finish_extract(aes_key, not_found, carrier_hash):
+    def finish(value):
+        extracted_data, extract_time = value
+        if not extracted_data:
+            raise ValueError(not_found)
+        # Cached before decrypting, so a key retry can use /v2/extract_cached
+        _extract_cache().put(carrier_hash, extracted_data)
+
+        decryption_start = time.perf_counter()
+        with stage_timer('decrypt'):
+            plaintext, kind = decrypt_payload(extracted_data, aes_key)
+        decryption_time = (time.perf_counter() - decryption_start) * 1000
+
+        result = {
+            'success': True,
+            'decrypted_message': plaintext.decode('utf-8') if kind == PAYLOAD_TEXT else None,
+            'carrier_hash': carrier_hash,
+            'metrics': {
+                'extract_time': extract_time,
+                'decryption_time': decryption_time,
+                'total_time': extract_time + decryption_time
+            }
+        }
+        if kind == PAYLOAD_BINARY:
+            return result, plaintext, 'application/octet-stream'
+        return result, None, None
+    return finish
+
+@app.route('/jobs/embed_image', methods=['POST'])
+def embed_image_job():
+    try:
+        image_bytes, filename = _v2_upload('image')
+        secret_message = _v2_param('secret_message')
+
+        # Validate inputs; a cover_hash stands in for a re-upload
+        if not image_bytes and not _v2_param('cover_hash'):
+            return jsonify({'success': False, 'error': 'No image file selected'})
+
+        if not secret_message:
+            return jsonify({'success': False, 'error': 'Secret message cannot be empty'})
+
+        analysis = _analysis_level()
+        if analysis not in ANALYSIS_LEVELS:
+            return jsonify({'success': False, 'error': f"analysis must be one of: {', '.join(ANALYSIS_LEVELS)}"})
+
+        try:
+            engine = _engine_param('image')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        if filename and os.path.splitext(filename.lower())[1] not in IMAGE_EXTENSIONS:
+            return jsonify({'success': False, 'error': 'Supported image formats: PNG, JPG, JPEG, BMP, TIFF'})
+
+        # Uploads are decoded by the worker; a cached cover is sent as pixels
+        cover = None
+        if not image_bytes:
+            try:
+                cover = _load_cover(None)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)})
+
+        encrypted_data, result = _encrypt_for_job(secret_message, analysis)
+        if cover is not None:
+            result['cover_hash'] = cover.digest
+        return _submit_job('embed_image', embed_image_task, (cover or image_bytes, encrypted_data, _wants_ssim(), engine),
+                           _finish_embed(result, 'psnr', 'capacity_per_pixel', 'image/png'), _image_embed_peak)
+
+    except Exception as e:
+        print(f"Error in embed_image_job: {str(e)}")
+        return jsonify({'success': False, 'error': f"Image embedding failed: {str(e)}"})
+
+@app.route('/jobs/embed_audio', methods=['POST'])
+def embed_audio_job():
+    try:
+        audio_bytes, filename = _v2_upload('audio')
+        secret_message = _v2_param('secret_message')
+
+        # Validate inputs
+        if not audio_bytes:
+            return jsonify({'success': False, 'error': 'No audio file selected'})
+
+        if not secret_message:
+            return jsonify({'success': False, 'error': 'Secret message cannot be empty'})
+
+        analysis = _analysis_level()
+        if analysis not in ANALYSIS_LEVELS:
+            return jsonify({'success': False, 'error': f"analysis must be one of: {', '.join(ANALYSIS_LEVELS)}"})
+
+        try:
+            engine = _engine_param('audio')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        if filename and not filename.lower().endswith(AUDIO_EXTENSIONS):
+            return jsonify({'success': False, 'error': 'Only WAV audio files are supported'})
+
+        encrypted_data, result = _encrypt_for_job(secret_message, analysis)
+        return _submit_job('embed_audio', embed_audio_task, (audio_bytes, encrypted_data, engine),
+                           _finish_embed(result, 'snr', 'capacity_per_sample', 'audio/wav'), audio_peak_bytes)
+
+    except Exception as e:
+        print(f"Error in embed_audio_job: {str(e)}")
+        return jsonify({'success': False, 'error': f"Audio embedding failed: {str(e)}"})
+
+@app.route('/jobs/extract_image', methods=['POST'])
+def extract_image_job():
+    try:
+        image_bytes, filename = _v2_upload('stego_image')
+
+        # Validate inputs
+        if not image_bytes:
+            return jsonify({'success': False, 'error': 'No image file selected'})
+
+        if filename and os.path.splitext(filename.lower())[1] not in IMAGE_EXTENSIONS:
+            return jsonify({'success': False, 'error': 'Supported image formats: PNG, JPG, JPEG, BMP, TIFF'})
+
+        try:
+            aes_key = _v2_keys()
+            engine = _engine_param('image')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        carrier_hash = content_digest(image_bytes)
+        return _submit_job('extract_image', extract_image_task, (image_bytes, engine),
+                           _finish_extract(aes_key, 'No hidden data found in the image or the image may be corrupted', carrier_hash),
+                           image_extract_peak_bytes, carrier_hash=carrier_hash)
+
+    except Exception as e:
+        print(f"Error in extract_image_job: {str(e)}")
+        return jsonify({'success': False, 'error': f"Image extraction failed: {str(e)}"})
+
+@app.route('/jobs/extract_audio', methods=['POST'])
+def extract_audio_job():
+    try:
+        audio_bytes, filename = _v2_upload('stego_audio')
+
+        # Validate inputs
+        if not audio_bytes:
+            return jsonify({'success': False, 'error': 'No audio file selected'})
+
+        if filename and not filename.lower().endswith(AUDIO_EXTENSIONS):
+            return jsonify({'success': False, 'error': 'Only WAV audio files are supported'})
+
+        try:
+            aes_key = _v2_keys()
+            engine = _engine_param('audio')
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        carrier_hash = content_digest(audio_bytes)
+        return _submit_job('extract_audio', extract_audio_task, (audio_bytes, engine),
+                           _finish_extract(aes_key, 'No hidden data found in the audio file or the file may be corrupted', carrier_hash),
+                           audio_peak_bytes, carrier_hash=carrier_hash)
+
+    except Exception as e:
+        print(f"Error in extract_audio_job: {str(e)}")
+        return jsonify({'success': False, 'error': f"Audio extraction failed: {str(e)}"})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = _job_manager().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    job['success'] = True
+    if job['has_file']:
+        job['file_url'] = f'/jobs/{job_id}/file'
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/file', methods=['GET'])
+def job_file(job_id):
+    data, mimetype = _job_manager().get_file(job_id)
+    if data is None:
+        return jsonify({'success': False, 'error': 'No file for this job'}), 404
+    extension = '.png' if mimetype == 'image/png' else '.wav'
+    return send_file(BytesIO(data), mimetype=mimetype, download_name=f'stego_{job_id}{extension}')
+
+# ---------------- Batch endpoints ----------------
+# /batch/embed and /batch/extract take carriers as one or more multipart
+# 'carriers' files, ZIP archives included, and answer with a ZIP streamed
+# as items finish: the stego carriers (or extracted files) plus a
+# manifest.json of per-item keys, metrics and errors. Items run on a thread
+# pool shared by all batches; each batch keeps at most two items per worker
+# in flight, so memory stays bounded however many carriers it holds.
+# The work outlives the view, so each item goes through admission control on
+# its own before it is handed to the pool: it takes a lane slot by its
+# sample count and reserves its peak against the memory budget until it is
+# done. A batch waits for room item by item, and items still refused once
+# the wait runs out are reported as failed in the manifest.
+BATCH_EMBED_PEAKS = {'image': image_embed_peak_bytes, 'audio': audio_peak_bytes}
+BATCH_EXTRACT_PEAKS = {'image': image_extract_peak_bytes, 'audio': audio_peak_bytes}
+
+_batch_pool = None
+
+def _batch_executor():
+    global _batch_pool
+    if _batch_pool is None:
+        _batch_pool = ThreadPoolExecutor(max_workers=app.config['BATCH_WORKERS'], thread_name_prefix='batch')
+    return _batch_pool
+
+def _batch_request():
+    """(filename, stream) carrier uploads and per-item options of a batch request.
+
+    Options come from an items form field or X-Items header holding a JSON
+    object keyed by file name, over those in any archive's manifest.json.
+    Raises ValueError for a missing upload, bad JSON or an unreadable ZIP.
+    """
+    uploads = [upload for upload in request.files.getlist('carriers') if upload.filename]
+    if not uploads:
+        raise ValueError('No carriers uploaded')
+
+    items = {}
+    try:
+        for upload in uploads:
+            if upload.filename.lower().endswith('.zip'):
+                with zipfile.ZipFile(upload.stream) as archive:
+                    items.update(read_manifest(archive))
+                upload.stream.seek(0)
+        options = json.loads(_v2_param('items') or '{}')
+    except zipfile.BadZipFile as e:
+        raise ValueError(f'Invalid ZIP archive: {str(e)}')
+    except json.JSONDecodeError as e:
+        raise ValueError(f'Invalid items JSON: {str(e)}')
+    if not isinstance(options, dict):
+        raise ValueError('items must be a JSON object keyed by file name')
+    items.update(options)
+
+    # The request closes its files when the view returns, before the response
+    # is streamed, so the streams are detached and closed by iter_uploads
+    carriers = []
+    for upload in uploads:
+        carriers.append((upload.filename, upload.stream))
+        upload.stream = BytesIO()
+    return carriers, items
+
+def _batch_engines():
+    return {'image': _engine_param('image'), 'audio': _engine_param('audio')}
+
+def _admit_items(items, peaks):
+    """(item, admission) pairs, admission being an ExitStack that holds the
+    item's lane slot and memory reservation. Admission is taken here, in the
+    thread feeding the pool, so pool threads never wait for it. A refused
+    item carries the refusal as its error instead of its data."""
+    for item in items:
+        admission = ExitStack()
+        kind = carrier_kind(item.name)
+        if item.error or kind is None:
+            yield item, admission
+            continue
+        samples = _header_samples(kind, BytesIO(item.data)) or len(item.data) * 4
+        try:
+            admission.enter_context(_get_scheduler().admit(samples))
+            admission.enter_context(_get_memory_budget().reserve(peaks[kind](samples, len(item.data))))
+        except (Overloaded, OverBudget) as e:
+            admission.close()
+            item = item._replace(data=None, error=str(e))
+        yield item, admission
+
+def _batch_map(process, items, peaks=None):
+    """process over items on the batch pool, in order, two per worker in flight.
+    With peaks, a {carrier: peak(samples, upload_bytes)} map, every item is
+    admitted before it runs."""
+    window = 2 * app.config['BATCH_WORKERS']
+    if peaks is None:
+        return map_bounded(_batch_executor(), process, items, window)
+
+    def run(job):
+        item, admission = job
+        with admission:
+            return process(item)
+    return map_bounded(_batch_executor(), run, _admit_items(items, peaks), window)
+
+def _zip_response(results, download_name, summary=summarize):
+    response = Response(stream_zip(results, summary), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+    return response
+
+def _batch_response(uploads, process, download_name, peaks):
+    items = iter_uploads(uploads, app.config['MAX_CONTENT_LENGTH'], app.config['BATCH_MAX_ITEMS'])
+    return _zip_response(_batch_map(process, items, peaks), download_name)
+
+@app.route('/batch/embed', methods=['POST'])
+def batch_embed():
+    shed = _shed_heavy()
+    if shed is not None:
+        return shed
+    try:
+        try:
+            uploads, items = _batch_request()
+            engine = _batch_engines()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+        default_message = _v2_param('secret_message')
+
+        def process(item: BatchItem):
+            message = item_options(items, item.name).get('secret_message', default_message)
+            return embed_item(item, message.strip(), engine, app.config['SPOOL_MAX_SIZE'])
+
+        return _batch_response(uploads, process, 'stego_batch.zip', BATCH_EMBED_PEAKS)
+
+    except Exception as e:
+        print(f"Error in batch_embed: {str(e)}")
+        return jsonify({'success': False, 'error': f"Batch embedding failed: {str(e)}"})
+
+@app.route('/batch/extract', methods=['POST'])
+def batch_extract():
+    shed = _shed_heavy()
+    if shed is not None:
+        return shed
+    try:
+        try:
+            uploads, items = _batch_request()
+            engine = _batch_engines()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+        defaults = {'private_key': _v2_param('private_key'), 'public_key': _v2_param('public_key')}
+
+        def process(item: BatchItem):
+            options = {**defaults, **item_options(items, item.name)}
+            keys = (options['private_key'].strip(), options['public_key'].strip())
+            return extract_item(item, keys, engine, _extract_cached)
+
+        return _batch_response(uploads, process, 'extracted_batch.zip', BATCH_EXTRACT_PEAKS)
+
+    except Exception as e:
+        print(f"Error in batch_extract: {str(e)}")
+        return jsonify({'success': False, 'error': f"Batch extraction failed: {str(e)}"})
+
+# ---------------- Sharded endpoints ----------------
+# /shard/embed stripes one encrypted payload over every uploaded carrier,
+# sizing each shard by its carrier's capacity so all are filled to the same
+# fraction, and answers like /batch/embed with the set's keys in the
+# manifest summary. /shard/extract takes the carriers in any order and
+# reassembles and decrypts the payload. Both run on the batch pool.
+# A set succeeds or fails whole, so it is admitted whole: one heavy-lane
+# slot costed at the samples of every carrier, and a memory reservation of
+# the carriers' summed peaks, since embedding holds every decoded carrier
+# while capacities are gathered. Extraction only holds the items in flight.
+# The admission is held until the response has been sent.
+SHARD_EMBED_PEAKS = {'image': image_embed_peak_bytes, 'audio': audio_peak_bytes}
+SHARD_EXTRACT_PEAKS = {'image': image_extract_peak_bytes, 'audio': audio_peak_bytes}
+
+def _shard_limit():
+    return min(app.config['BATCH_MAX_ITEMS'], MAX_SHARDS)
+
+def _upload_headers(uploads):
+    """(carrier, samples, upload bytes) of each usable carrier in (filename,
+    stream) uploads, reading only headers; samples is None if unreadable"""
+    for filename, stream in uploads:
+        if filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(stream) as archive:
+                for info in archive.infolist():
+                    kind = carrier_kind(info.filename)
+                    if info.is_dir() or info.filename == MANIFEST_NAME or kind is None:
+                        continue
+                    with archive.open(info) as member:
+                        yield kind, _header_samples(kind, member), info.file_size
+            stream.seek(0)
+        elif carrier_kind(filename):
+            size = stream.seek(0, os.SEEK_END)
+            stream.seek(0)
+            yield carrier_kind(filename), _header_samples(carrier_kind(filename), stream), size
+
+def _admit_set(uploads, peaks, in_flight=None):
+    """ExitStack holding a heavy-lane slot and the memory budget for a carrier
+    set. The reservation sums peaks[carrier](samples, upload_bytes) over every
+    carrier, or over the in_flight largest. Raises Overloaded or OverBudget."""
+    cost = 0
+    needed = []
+    for kind, samples, size in _upload_headers(uploads):
+        samples = samples or size * 4
+        cost += samples
+        needed.append(peaks[kind](samples, size))
+    needed.sort(reverse=True)
+
+    admission = ExitStack()
+    try:
+        admission.enter_context(_get_scheduler().heavy.admit(cost))
+        admission.enter_context(_get_memory_budget().reserve(sum(needed[:in_flight])))
+    except BaseException:
+        admission.close()
+        raise
+    return admission
+
+def _hold_until_sent(admission):
+    """Release admission once the response, streamed or not, has been sent"""
+    @after_this_request
+    def release(response):
+        response.call_on_close(admission.close)
+        return response
+
+@app.route('/shard/embed', methods=['POST'])
+def shard_embed():
+    try:
+        try:
+            uploads, _ = _batch_request()
+            engine = _batch_engines()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        if not _v2_param('secret_message') and _v2_secret_file()[0] is None:
+            return jsonify({'success': False, 'error': 'Secret message cannot be empty'})
+
+        try:
+            admission = _admit_set(uploads, SHARD_EMBED_PEAKS)
+        except Overloaded as e:
+            return _overloaded(str(e), e.retry_after)
+        except OverBudget as e:
+            return jsonify({'success': False, 'error': str(e)}), 413
+        _hold_until_sent(admission)
+
+        # Every carrier's capacity is needed before the payload can be split
+        items = list(iter_uploads(uploads, app.config['MAX_CONTENT_LENGTH'], _shard_limit()))
+        try:
+            carriers = list(_batch_executor().map(carrier_capacity, items))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        # Generate keys
+        private_key, public_key = ecc_generate_keypair()
+        aes_key = ecc_derive_shared_key(private_key, public_key)
+
+        # Encrypt message or secret file, then split it over the carriers
+        encryption_start = time.perf_counter()
+        with stage_timer('encrypt'):
+            encrypted_data, _, _, compression = _v2_payload(aes_key)
+            if isinstance(encrypted_data, ChunkedPayload):
+                encrypted_data = b''.join(encrypted_data)
+        encryption_time = (time.perf_counter() - encryption_start) * 1000
+
+        set_id = get_random_bytes(8)
+        try:
+            shards = split_shards(encrypted_data, [capacity for _, capacity in carriers], set_id)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        def summary(entries):
+            return {
+                **summarize(entries),
+                'set_id': set_id.hex(),
+                'shards': len(shards),
+                'private_key': private_key.hex(),
+                'public_key': public_key.hex(),
+                'aes_key': aes_key.hex(),
+                'metrics': {
+                    'encryption_time': encryption_time,
+                    'original_message_size': compression.original_size,
+                    'encrypted_data_size': len(encrypted_data),
+                    'compression': compression.name,
+                    'compression_ratio': compression.ratio,
+                    'compression_time': compression.time_ms
+                }
+            }
+
+        def process(job):
+            item, (carrier, _), shard = job
+            return embed_shard(item, carrier, shard, engine, app.config['SPOOL_MAX_SIZE'])
+
+        return _zip_response(_batch_map(process, zip(items, carriers, shards)), 'stego_shards.zip', summary)
+
+    except Exception as e:
+        print(f"Error in shard_embed: {str(e)}")
+        return jsonify({'success': False, 'error': f"Sharded embedding failed: {str(e)}"})
+
+@app.route('/shard/extract', methods=['POST'])
+def shard_extract():
+    try:
+        try:
+            uploads, _ = _batch_request()
+            aes_key = _v2_keys()
+            engine = _batch_engines()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        try:
+            admission = _admit_set(uploads, SHARD_EXTRACT_PEAKS, 2 * app.config['BATCH_WORKERS'])
+        except Overloaded as e:
+            return _overloaded(str(e), e.retry_after)
+        except OverBudget as e:
+            return jsonify({'success': False, 'error': str(e)}), 413
+        _hold_until_sent(admission)
+
+        # Extract every carrier's shard in parallel, in whatever order they came
+        extract_start = time.perf_counter()
+        items = iter_uploads(uploads, app.config['MAX_CONTENT_LENGTH'], _shard_limit())
+        found = list(_batch_map(lambda item: extract_shard(item, engine, _extract_cached), items))
+        extract_time = (time.perf_counter() - extract_start) * 1000
+        entries = [entry for entry, _ in found]
+        shards = [shard for _, shard in found if shard is not None]
+
+        try:
+            encrypted_data = join_shards(shards)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e), 'shards': entries})
+
+        # Decrypt message
+        decryption_start = time.perf_counter()
+        try:
+            with stage_timer('decrypt'):
+                plaintext, kind = decrypt_payload(encrypted_data, aes_key)
+                decrypted_message = plaintext.decode('utf-8') if kind == PAYLOAD_TEXT else None
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Decryption failed: {str(e)}', 'shards': entries})
+        decryption_time = (time.perf_counter() - decryption_start) * 1000
+
+        result = {
+            'success': True,
+            'decrypted_message': decrypted_message,
+            'set_id': shards[0][0].set_id.hex(),
+            'shards': entries,
+            'metrics': {
+                'extract_time': extract_time,
+                'decryption_time': decryption_time,
+                'total_time': extract_time + decryption_time,
+                'encrypted_data_size': len(encrypted_data)
+            }
+        }
+
+        # Hidden files are returned as the response body
+        if kind == PAYLOAD_BINARY:
+            return _v2_file_response(plaintext, 'application/octet-stream', 'secret.bin', result)
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Error in shard_extract: {str(e)}")
+        return jsonify({'success': False, 'error': f"Sharded extraction failed: {str(e)}"})
+
+@app.route('/capacity', methods=['POST'])
+@admitted(cheap=True, peak=_capacity_peak)
+def capacity():
+    try:
+        # Get form data with validation
+        image_file = request.files.get('image')
+        audio_file = request.files.get('audio')
+        secret_message = request.form.get('secret_message', '')
+        has_image = image_file is not None and image_file.filename != ''
+        cover = None
+
+        if has_image or _v2_param('cover_hash'):
+            if has_image and os.path.splitext(image_file.filename.lower())[1] not in IMAGE_EXTENSIONS:
+                return jsonify({'success': False, 'error': 'Supported image formats: PNG, JPG, JPEG, BMP, TIFF'})
+
+            # Decoding caches the cover, so an embed can follow by cover_hash
+            try:
+                cover = _load_cover(image_file.read() if has_image else None)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)})
+            capacity_bits, max_payload_bytes, shape = image_capacity(cover)
+            carrier = 'image'
+            total_units = shape[0] * shape[1]
+        elif audio_file and audio_file.filename != '':
+            if not audio_file.filename.lower().endswith(AUDIO_EXTENSIONS):
+                return jsonify({'success': False, 'error': 'Only WAV audio files are supported'})
+
+            capacity_bits, max_payload_bytes = audio_capacity(audio_file.stream)
+            carrier = 'audio'
+            total_units = capacity_bits
+        else:
+            return jsonify({'success': False, 'error': 'No image or audio file selected'})
+
+        # Encrypted payload is the message plus the AES nonce and tag
+        max_message_bytes = max(0, max_payload_bytes - AES_OVERHEAD)
+        message_size = len(secret_message.strip().encode())
+
+        return jsonify({
+            'success': True,
+            'carrier': carrier,
+            'capacity_bits': capacity_bits,
+            'capacity_per_unit': capacity_bits / total_units if total_units > 0 else 0,
+            'max_payload_bytes': max_payload_bytes,
+            'max_message_bytes': max_message_bytes,
+            'message_size': message_size,
+            'fits': message_size <= max_message_bytes,
+            'cover_hash': cover.digest if cover is not None else None
+        })
+
+    except Exception as e:
+        print(f"Error in capacity: {str(e)}")
+        return jsonify({'success': False, 'error': f"Capacity check failed: {str(e)}"})
+
 # Error handlers
 @app.errorhandler(413)
 def too_large(e):
@@ -0,0 +1,364 @@
+import json
+import os
+import shutil
+import time
+import zipfile
+from collections import deque
+from io import BytesIO, RawIOBase
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import stego_core
+from container import SHARD_HEADER_SIZE, ShardHeader, parse_shard
+
+# ---------------- Batch Items ----------------
+# A batch is a ZIP archive or a multipart list of carriers. Per-item
+# messages or keys come from an items JSON object keyed by file name (or a
+# manifest.json inside the archive), falling back to the batch-wide fields.
+# Carriers are read one at a time as the worker pool takes them, so only
+# the items in flight are ever held in memory.
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif'}
+AUDIO_EXTENSIONS = {'.wav', '.wave'}
+MANIFEST_NAME = 'manifest.json'
+
+class BatchItem(NamedTuple):
+    index: int
+    name: str
+    data: Optional[bytes]
+    error: Optional[str] = None  # set instead of data when the item cannot be read
+
+def carrier_kind(name: str) -> Optional[str]:
+    ext = os.path.splitext(name.lower())[1]
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    if ext in AUDIO_EXTENSIONS:
+        return 'audio'
+    return None
+
+def item_options(items: Dict[str, object], name: str) -> dict:
+    """Per-item options for name, looked up by full name then base name; a
+    bare string is shorthand for a secret_message"""
+    options = items.get(name, items.get(os.path.basename(name), {}))
+    return {'secret_message': options} if isinstance(options, str) else dict(options)
+
+def read_manifest(archive: zipfile.ZipFile) -> Dict[str, object]:
+    if MANIFEST_NAME not in archive.namelist():
+        return {}
+    with archive.open(MANIFEST_NAME) as f:
+        return json.load(f)
+
+def _unread(index: int, name: str, size: int, max_size: int, max_items: int) -> Optional[BatchItem]:
+    """Error item for a carrier that must not be read, or None"""
+    if index >= max_items:
+        return BatchItem(index, name, None, f"Batch is limited to {max_items} items")
+    if size > max_size:
+        return BatchItem(index, name, None, f"Item larger than {max_size} bytes")
+    return None
+
+def iter_archive(archive: zipfile.ZipFile, max_size: int, max_items: int, start: int = 0) -> Iterator[BatchItem]:
+    """Carriers in a ZIP archive, skipping directories and the manifest.
+    Members over max_size once inflated, or past max_items, are reported
+    rather than read."""
+    index = start
+    for info in archive.infolist():
+        if info.is_dir() or info.filename == MANIFEST_NAME:
+            continue
+        yield _unread(index, info.filename, info.file_size, max_size, max_items) or \
+            BatchItem(index, info.filename, archive.read(info))
+        index += 1
+
+def iter_uploads(uploads: List[Tuple[str, object]], max_size: int, max_items: int) -> Iterator[BatchItem]:
+    """Carriers from (filename, stream) uploads, closing each stream once it
+    has been read; .zip uploads are expanded in place"""
+    index = 0
+    try:
+        for filename, stream in uploads:
+            if filename.lower().endswith('.zip'):
+                with zipfile.ZipFile(stream) as archive:
+                    for item in iter_archive(archive, max_size, max_items, index):
+                        yield item
+                        index = item.index + 1
+            else:
+                yield _unread(index, filename, 0, max_size, max_items) or BatchItem(index, filename, stream.read())
+                index += 1
+            stream.close()
+    finally:
+        for _, stream in uploads:
+            stream.close()
+
+# ---------------- Worker Pool ----------------
+def map_bounded(executor, fn: Callable, items: Iterable, window: int) -> Iterator:
+    """executor.map(fn, items) in order, with at most window items submitted
+    but not yet consumed, so a long batch never sits in memory at once"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# ---------------- Streamed ZIP ----------------
+class _ZipBuffer(RawIOBase):
+    """Write-only sink that hands back what zipfile wrote since the last drain.
+    It is not seekable, so entries are written with data descriptors."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class BatchResult(NamedTuple):
+    entry: dict  # manifest entry
+    output: Optional[Tuple[str, object]]  # (suggested archive name, bytes or a readable stream to close)
+
+def _output_name(name: str, used: set) -> str:
+    """Unique archive name for an output, with no absolute or parent paths"""
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.', '..')]
+    stem, suffix = os.path.splitext('/'.join(parts) or 'item')
+    candidate = stem + suffix
+    count = 1
+    while candidate in used:
+        count += 1
+        candidate = f"{stem}_{count}{suffix}"
+    used.add(candidate)
+    return candidate
+
+def stream_zip(results: Iterable[BatchResult], summary: Callable[[List[dict]], dict]) -> Iterator[bytes]:
+    """ZIP of every result's output followed by manifest.json, yielded entry
+    by entry. Stego carriers are already compressed or incompressible noise,
+    so they are stored; only the manifest is deflated."""
+    buffer = _ZipBuffer()
+    entries = []
+    used = {MANIFEST_NAME}
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for result in results:
+            if result.output is not None:
+                name, data = result.output
+                name = result.entry['output'] = _output_name(name, used)
+                if isinstance(data, bytes):
+                    archive.writestr(name, data)
+                else:
+                    with data, archive.open(zipfile.ZipInfo(name, time.localtime()[:6]), 'w', force_zip64=True) as dest:
+                        shutil.copyfileobj(data, dest, 1 << 20)
+            entries.append(result.entry)
+            yield buffer.drain()
+        manifest = {'summary': summary(entries), 'items': entries}
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2), zipfile.ZIP_DEFLATED)
+    yield buffer.drain()
+
+def summarize(entries: List[dict]) -> dict:
+    succeeded = sum(1 for entry in entries if entry['success'])
+    return {'items': len(entries), 'succeeded': succeeded, 'failed': len(entries) - succeeded}
+
+# ---------------- Item Processing ----------------
+def _failed(item: BatchItem, error: str, **fields) -> BatchResult:
+    return BatchResult({'index': item.index, 'name': item.name, 'success': False, 'error': error, **fields}, None)
+
+def _renamed(name: str, suffix: str) -> str:
+    return os.path.splitext(name)[0] + suffix
+
+UNSUPPORTED = 'Unsupported carrier, expected PNG, JPG, JPEG, BMP, TIFF or WAV'
+
+def _embed(kind: str, carrier, payload: bytes, engine: Dict[str, Optional[str]],
+           spool_max_size: int) -> Tuple[object, str, dict]:
+    """Stego file (bytes or a stream), its suffix and embedding metrics.
+    carrier is the encoded file, or a Cover from load_cover for images."""
+    stats = stego_core.DistortionStats()
+    if kind == 'image':
+        stego, embed_time, quality, capacity_bits, capacity_per_unit = stego_core.embed_data_in_image_bytes(
+            carrier, payload, stats=stats, engine=engine['image']
+        )
+        quality_key, capacity_key, suffix = 'psnr', 'capacity_per_pixel', '.png'
+    else:
+        stego, embed_time, quality, capacity_bits, capacity_per_unit = stego_core.embed_data_in_audio_stream(
+            BytesIO(carrier), payload, spool_max_size, stats, engine['audio']
+        )
+        quality_key, capacity_key, suffix = 'snr', 'capacity_per_sample', '.wav'
+    metrics = {
+        'embed_time': embed_time,
+        quality_key: quality,
+        'mse': stats.mse,
+        'changed_samples': stats.changed,
+        'capacity_bits': capacity_bits,
+        capacity_key: capacity_per_unit
+    }
+    return stego, suffix, metrics
+
+def embed_item(item: BatchItem, message: str, engine: Dict[str, Optional[str]], spool_max_size: int) -> BatchResult:
+    """Encrypt message under a fresh key pair and embed it into one carrier"""
+    kind = carrier_kind(item.name)
+    if item.error:
+        return _failed(item, item.error, carrier=kind)
+    if kind is None:
+        return _failed(item, UNSUPPORTED)
+    if not message:
+        return _failed(item, 'Secret message cannot be empty', carrier=kind)
+
+    try:
+        private_key, public_key = stego_core.ecc_generate_keypair()
+        aes_key = stego_core.ecc_derive_shared_key(private_key, public_key)
+        encryption_start = time.perf_counter()
+        encrypted_data, _, _, compression = stego_core.encrypt_message(message, aes_key)
+        encryption_time = (time.perf_counter() - encryption_start) * 1000
+        stego, suffix, metrics = _embed(kind, item.data, encrypted_data, engine, spool_max_size)
+    except Exception as e:
+        print(f"Batch embed: {item.name} failed: {str(e)}")
+        return _failed(item, str(e), carrier=kind)
+
+    entry = {
+        'index': item.index,
+        'name': item.name,
+        'success': True,
+        'carrier': kind,
+        'private_key': private_key.hex(),
+        'public_key': public_key.hex(),
+        'aes_key': aes_key.hex(),
+        'metrics': {
+            'encryption_time': encryption_time,
+            **metrics,
+            'total_time': encryption_time + metrics['embed_time'],
+            'original_message_size': len(message.encode()),
+            'encrypted_data_size': len(encrypted_data),
+            'compression': compression.name,
+            'compression_ratio': compression.ratio,
+            'compression_time': compression.time_ms
+        }
+    }
+    return BatchResult(entry, (_renamed(item.name, suffix), stego))
+
+def extract_item(item: BatchItem, keys: Tuple[str, str], engine: Dict[str, Optional[str]],
+                 extract_cached: Callable) -> BatchResult:
+    """Extract and decrypt one carrier. Text goes into the manifest and hidden
+    files into the archive. extract_cached(carrier, extract) is the app's
+    extraction cache."""
+    kind = carrier_kind(item.name)
+    if item.error:
+        return _failed(item, item.error, carrier=kind)
+    if kind is None:
+        return _failed(item, UNSUPPORTED)
+    private_key_hex, public_key_hex = keys
+    if not private_key_hex or not public_key_hex:
+        return _failed(item, 'Private and public keys are required', carrier=kind)
+
+    try:
+        aes_key = stego_core.ecc_derive_shared_key(bytes.fromhex(private_key_hex), bytes.fromhex(public_key_hex))
+    except (ValueError, TypeError) as e:
+        return _failed(item, f'Invalid key format: {str(e)}', carrier=kind)
+
+    try:
+        if kind == 'image':
+            extract = lambda data: stego_core.extract_data_from_image_bytes(data, engine['image'])
+        else:
+            extract = lambda data: stego_core.extract_data_from_audio_DE(BytesIO(data), engine['audio'])
+        extracted_data, extract_time, carrier_hash = extract_cached(item.data, extract)
+    except Exception as e:
+        print(f"Batch extract: {item.name} failed: {str(e)}")
+        return _failed(item, str(e), carrier=kind)
+    if not extracted_data:
+        return _failed(item, 'No hidden data found in the carrier or the carrier may be corrupted',
+                       carrier=kind, carrier_hash=carrier_hash)
+
+    decryption_start = time.perf_counter()
+    try:
+        plaintext, payload_kind = stego_core.decrypt_payload(extracted_data, aes_key)
+    except ValueError as e:
+        return _failed(item, f'Decryption failed: {str(e)}', carrier=kind, carrier_hash=carrier_hash)
+    decryption_time = (time.perf_counter() - decryption_start) * 1000
+
+    entry = {
+        'index': item.index,
+        'name': item.name,
+        'success': True,
+        'carrier': kind,
+        'carrier_hash': carrier_hash,
+        'decrypted_message': plaintext.decode('utf-8') if payload_kind == stego_core.PAYLOAD_TEXT else None,
+        'metrics': {
+            'extract_time': extract_time,
+            'decryption_time': decryption_time,
+            'total_time': extract_time + decryption_time
+        }
+    }
+    if payload_kind == stego_core.PAYLOAD_BINARY:
+        return BatchResult(entry, (_renamed(item.name, '.bin'), plaintext))
+    return BatchResult(entry, None)
+
+# ---------------- Sharded Payloads ----------------
+# One encrypted payload striped over several carriers (see container.py for
+# the shard header). Every carrier's capacity is needed before the payload
+# can be split, so a sharded set is held whole; images are decoded once,
+# for the capacity check, and embedded from that Cover.
+
+def carrier_capacity(item: BatchItem) -> Tuple[object, int]:
+    """Carrier ready to embed into and the payload bytes it can hold.
+    Raises ValueError for carriers that cannot be used."""
+    kind = carrier_kind(item.name)
+    if item.error or kind is None:
+        raise ValueError(f"{item.name}: {item.error or UNSUPPORTED}")
+    try:
+        if kind == 'image':
+            cover = stego_core.load_cover(item.data)
+            return cover, stego_core.image_capacity(cover)[1]
+        return item.data, stego_core.audio_capacity(BytesIO(item.data))[1]
+    except Exception as e:
+        raise ValueError(f"{item.name}: {str(e)}")
+
+def embed_shard(item: BatchItem, carrier, shard: bytes, engine: Dict[str, Optional[str]],
+                spool_max_size: int) -> BatchResult:
+    """Embed one shard, as returned by split_shards, into its carrier"""
+    kind = carrier_kind(item.name)
+    header = parse_shard(shard)[0]
+    try:
+        stego, suffix, metrics = _embed(kind, carrier, shard, engine, spool_max_size)
+    except Exception as e:
+        print(f"Shard embed: {item.name} failed: {str(e)}")
+        return _failed(item, str(e), carrier=kind, shard=header.index)
+
+    entry = {
+        'index': item.index,
+        'name': item.name,
+        'success': True,
+        'carrier': kind,
+        'shard': header.index,
+        'shard_size': len(shard) - SHARD_HEADER_SIZE,
+        'metrics': metrics
+    }
+    return BatchResult(entry, (_renamed(item.name, suffix), stego))
+
+def extract_shard(item: BatchItem, engine: Dict[str, Optional[str]],
+                  extract_cached: Callable) -> Tuple[dict, Optional[Tuple[ShardHeader, bytes]]]:
+    """Manifest entry and (header, data) of the shard a carrier holds, or None"""
+    kind = carrier_kind(item.name)
+    entry = {'index': item.index, 'name': item.name, 'success': False, 'carrier': kind}
+    if item.error or kind is None:
+        entry['error'] = item.error or UNSUPPORTED
+        return entry, None
+
+    if kind == 'image':
+        extract = lambda data: stego_core.extract_data_from_image_bytes(data, engine['image'])
+    else:
+        extract = lambda data: stego_core.extract_data_from_audio_DE(BytesIO(data), engine['audio'])
+    try:
+        extracted_data, extract_time, entry['carrier_hash'] = extract_cached(item.data, extract)
+    except Exception as e:
+        print(f"Shard extract: {item.name} failed: {str(e)}")
+        entry['error'] = str(e)
+        return entry, None
+
+    shard = parse_shard(extracted_data) if extracted_data else None
+    if shard is None:
+        entry['error'] = 'No shard found in the carrier'
+        return entry, None
+    entry.update(success=True, shard=shard[0].index, shard_size=len(shard[1]),
+                 metrics={'extract_time': extract_time})
+    return entry, shard
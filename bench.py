@@ -0,0 +1,353 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import wave
+from contextlib import redirect_stdout
+from io import BytesIO
+from typing import Callable, List, NamedTuple
+
+import numpy as np
+
+import stego_core
+
+# ---------------- Benchmark Suite ----------------
+# Reproducible timings of the stego_core codecs on synthetic carriers, so no
+# test data is needed. Every case is run once to warm up (worker pools,
+# lookup tables), then timed --repeat times, then once more under
+# tracemalloc for its peak allocation. Results are printed as a table and
+# optionally written as JSON; with --baseline, cases whose median latency or
+# peak memory grew by more than --threshold, or whose PSNR/SNR changed, are
+# reported as regressions and the exit status is 1.
+
+# Carrier size ladder: image (height, width) and audio samples
+IMAGE_SIZES = {'small': (64, 96), 'medium': (256, 384), 'large': (1024, 1536)}
+AUDIO_SIZES = {'small': 1 << 16, 'medium': 1 << 19, 'large': 1 << 22}
+MESSAGE_SIZES = {'small': 1 << 10, 'medium': 1 << 16, 'large': 1 << 20}
+IMAGE_PATTERNS = ('noise', 'gradient', 'flat')
+AUDIO_PATTERNS = ('noise', 'tone')
+
+# The pure-Python engines take seconds per megapixel, so they stop here
+REFERENCE_MAX_SAMPLES = 256 * 384 * 3
+LEGACY_REFERENCE_MAX_SAMPLES = 64 * 96 * 3
+
+PAYLOAD_FILL = 0.5     # share of the carrier's capacity used by the payload
+MEMORY_SLACK = 1 << 20  # peak memory changes below this are noise
+QUALITY_TOLERANCE = 0.01  # dB
+
+class Case(NamedTuple):
+    name: str
+    prepare: Callable  # () -> (run, bits, quality); quality(output) is PSNR/SNR or None
+
+# ---------------- Synthetic Carriers ----------------
+def synthetic_image(pattern: str, height: int, width: int, seed: int = 0) -> np.ndarray:
+    """Deterministic BGR image: uniform noise, smooth gradients, or flat
+    regions with one-level sensor noise"""
+    rng = np.random.default_rng(seed)
+    if pattern == 'noise':
+        return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    y, x = np.mgrid[0:height, 0:width]
+    if pattern == 'gradient':
+        channels = (x * 255 // max(1, width - 1), y * 255 // max(1, height - 1),
+                    (x + y) * 255 // max(1, width + height - 2))
+        return np.stack(channels, axis=-1).astype(np.uint8)
+    if pattern == 'flat':
+        levels = np.array([[30, 128], [200, 245]])
+        base = levels[(y * 2 // height), (x * 2 // width)]
+        return (base[..., None] + rng.integers(0, 2, (height, width, 3))).astype(np.uint8)
+    raise ValueError(f"Unknown image pattern {pattern}")
+
+def synthetic_audio(pattern: str, samples: int, seed: int = 0, rate: int = 44100) -> np.ndarray:
+    """Deterministic mono 16-bit samples: white noise or a 440 Hz tone"""
+    if pattern == 'noise':
+        return np.random.default_rng(seed).integers(-8000, 8000, samples, dtype=np.int16)
+    if pattern == 'tone':
+        return (12000 * np.sin(2 * np.pi * 440 * np.arange(samples) / rate)).astype(np.int16)
+    raise ValueError(f"Unknown audio pattern {pattern}")
+
+def wav_bytes(frames: np.ndarray, rate: int = 44100) -> bytes:
+    output = BytesIO()
+    with wave.open(output, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        audio.writeframes(frames.tobytes())
+    return output.getvalue()
+
+def wav_frames(data: bytes) -> np.ndarray:
+    with wave.open(BytesIO(data), 'rb') as audio:
+        return np.frombuffer(audio.readframes(audio.getnframes()), dtype=np.int16)
+
+def payload_bytes(size: int, seed: int = 1) -> bytes:
+    return np.random.default_rng(seed).integers(0, 256, max(1, size), dtype=np.uint8).tobytes()
+
+def message_text(size: int, seed: int = 2) -> str:
+    """English-like text: random words from a small vocabulary"""
+    words = np.array('the of and to in is that for it as with was on be by this are from at or an'.split())
+    picked = np.random.default_rng(seed).integers(0, len(words), size // 3 + 1)
+    return ' '.join(words[picked])[:size]
+
+# ---------------- Cases ----------------
+def _finite(value):
+    return None if value is None or math.isinf(value) else value
+
+def _image_embed_case(engine, pattern, size):
+    def prepare():
+        cover = synthetic_image(pattern, *IMAGE_SIZES[size])
+        if engine.startswith('legacy'):
+            capacity = stego_core.pvd_capacity(cover, legacy=True)[1]
+            payload = payload_bytes(int(capacity * PAYLOAD_FILL) // 8 - 4)
+            store = stego_core.pvd_store if engine == 'legacy-reference' else stego_core.pvd_store_vectorized
+            run = lambda: store(cover, payload)
+            bits = 32 + len(payload) * 8
+        else:
+            capacity = stego_core.pvd_capacity(cover)[1]
+            payload = payload_bytes(int(stego_core.pvd_max_payload_bytes(capacity) * PAYLOAD_FILL))
+            run = lambda: stego_core.pvd_embed(cover, payload, engine=engine)
+            bits = stego_core.pvd_payload_bits(payload)
+        return run, bits, lambda stego: _finite(stego_core.calculate_psnr(cover, stego))
+    return Case(f'image/embed/{engine}/{pattern}/{size}', prepare)
+
+def _image_extract_case(engine, pattern, size):
+    def prepare():
+        cover = synthetic_image(pattern, *IMAGE_SIZES[size])
+        if engine.startswith('legacy'):
+            capacity = stego_core.pvd_capacity(cover, legacy=True)[1]
+            payload = payload_bytes(int(capacity * PAYLOAD_FILL) // 8 - 4)
+            stego = stego_core.pvd_store_vectorized(cover, payload)
+            unstore = stego_core.pvd_unstore if engine == 'legacy-reference' else stego_core.pvd_unstore_vectorized
+            run = lambda: unstore(stego)
+            bits = 32 + len(payload) * 8
+        else:
+            capacity = stego_core.pvd_capacity(cover)[1]
+            payload = payload_bytes(int(stego_core.pvd_max_payload_bytes(capacity) * PAYLOAD_FILL))
+            stego = stego_core.pvd_embed(cover, payload, engine='vectorized')
+            run = lambda: stego_core.pvd_extract(stego, engine=engine)
+            bits = stego_core.pvd_payload_bits(payload)
+        return run, bits, None
+    return Case(f'image/extract/{engine}/{pattern}/{size}', prepare)
+
+def _audio_embed_case(engine, pattern, size):
+    def prepare():
+        frames = synthetic_audio(pattern, AUDIO_SIZES[size])
+        cover = wav_bytes(frames)
+        payload = payload_bytes(int(len(frames) * PAYLOAD_FILL) // 8 - stego_core.HEADER_SIZE)
+
+        def run():
+            stego_stream, *_ = stego_core.embed_data_in_audio_stream(BytesIO(cover), payload, engine=engine)
+            with stego_stream:
+                return stego_stream.read()
+        bits = stego_core.HEADER_BITS + len(payload) * 8
+        return run, bits, lambda stego: _finite(stego_core.calculate_snr(frames, wav_frames(stego)))
+    return Case(f'audio/embed/{engine}/{pattern}/{size}', prepare)
+
+def _audio_extract_case(engine, pattern, size):
+    def prepare():
+        frames = synthetic_audio(pattern, AUDIO_SIZES[size])
+        payload = payload_bytes(int(len(frames) * PAYLOAD_FILL) // 8 - stego_core.HEADER_SIZE)
+        stego_stream, *_ = stego_core.embed_data_in_audio_stream(BytesIO(wav_bytes(frames)), payload, engine='vectorized')
+        with stego_stream:
+            stego = stego_stream.read()
+        run = lambda: stego_core.extract_data_from_audio_DE(BytesIO(stego), engine)
+        return run, stego_core.HEADER_BITS + len(payload) * 8, None
+    return Case(f'audio/extract/{engine}/{pattern}/{size}', prepare)
+
+def _crypto_cases(size):
+    key = bytes(range(32))
+    message = message_text(MESSAGE_SIZES[size])
+    bits = len(message.encode()) * 8
+
+    def encrypt(name, function):
+        return Case(f'crypto/{name}/text/{size}', lambda: (lambda: function(message, key), bits, None))
+
+    def decrypt(name, encrypt_function, decrypt_function):
+        def prepare():
+            encrypted_data = encrypt_function(message, key)[0]
+            return lambda: decrypt_function(encrypted_data, key), bits, None
+        return Case(f'crypto/{name}/text/{size}', prepare)
+
+    return [
+        encrypt('aes_encrypt', stego_core.aes_encrypt),
+        decrypt('aes_decrypt', stego_core.aes_encrypt, stego_core.aes_decrypt),
+        encrypt('encrypt_message', stego_core.encrypt_message),
+        decrypt('decrypt_payload', stego_core.encrypt_message, stego_core.decrypt_payload),
+    ]
+
+def _metric_cases(size):
+    def image_pair():
+        cover = synthetic_image('noise', *IMAGE_SIZES[size])
+        payload = payload_bytes(int(stego_core.pvd_max_payload_bytes(stego_core.pvd_capacity(cover)[1]) * PAYLOAD_FILL))
+        return cover, stego_core.pvd_embed(cover, payload, engine='vectorized')
+
+    def psnr():
+        cover, stego = image_pair()
+        return lambda: stego_core.calculate_psnr(cover, stego), cover.size * 8, None
+
+    def tile_ssim():
+        cover, stego = image_pair()
+        return lambda: stego_core.calculate_tile_ssim(cover, stego), cover.size * 8, None
+
+    def snr():
+        frames = synthetic_audio('noise', AUDIO_SIZES[size])
+        stego = frames ^ np.int16(1)
+        return lambda: stego_core.calculate_snr(frames, stego), len(frames) * 16, None
+
+    def byte_statistics():
+        data = payload_bytes(MESSAGE_SIZES[size])
+        return lambda: stego_core.byte_statistics(data), len(data) * 8, None
+
+    return [
+        Case(f'metrics/calculate_psnr/noise/{size}', psnr),
+        Case(f'metrics/calculate_tile_ssim/noise/{size}', tile_ssim),
+        Case(f'metrics/calculate_snr/noise/{size}', snr),
+        Case(f'metrics/byte_statistics/random/{size}', byte_statistics),
+    ]
+
+def build_cases(sizes: List[str]) -> List[Case]:
+    cases = []
+    for size in sizes:
+        height, width = IMAGE_SIZES[size]
+        image_engines = [name for name in stego_core.ENGINES['image']
+                         if name != stego_core.REFERENCE_ENGINE or height * width * 3 <= REFERENCE_MAX_SAMPLES]
+        image_engines.append('legacy-vectorized')
+        if height * width * 3 <= LEGACY_REFERENCE_MAX_SAMPLES:
+            image_engines.append('legacy-reference')
+        for pattern in IMAGE_PATTERNS:
+            for engine in image_engines:
+                cases.append(_image_embed_case(engine, pattern, size))
+                cases.append(_image_extract_case(engine, pattern, size))
+
+        audio_engines = [name for name in stego_core.ENGINES['audio']
+                         if name != stego_core.REFERENCE_ENGINE or AUDIO_SIZES[size] <= REFERENCE_MAX_SAMPLES]
+        for pattern in AUDIO_PATTERNS:
+            for engine in audio_engines:
+                cases.append(_audio_embed_case(engine, pattern, size))
+                cases.append(_audio_extract_case(engine, pattern, size))
+
+        cases.extend(_crypto_cases(size))
+        cases.extend(_metric_cases(size))
+    return cases
+
+# ---------------- Measurement ----------------
+def measure(case: Case, repeat: int) -> dict:
+    run, bits, quality = case.prepare()
+    output = run()  # warm-up
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = run()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        run()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        'bits': bits,
+        'latency_ms': {'p50': p50, 'p90': p90, 'p99': p99, 'mean': float(np.mean(latencies)), 'min': min(latencies)},
+        'throughput_bps': bits / (p50 / 1000) if p50 > 0 else None,
+        'peak_memory_bytes': max(0, peak),
+        'quality_db': quality(output) if quality else None
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Regressions of results against baseline, one message per problem"""
+    problems = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        ratio = current['latency_ms']['p50'] / max(previous['latency_ms']['p50'], 1e-9)
+        if ratio > 1 + threshold:
+            problems.append(f"{name}: p50 latency {previous['latency_ms']['p50']:.2f} -> "
+                            f"{current['latency_ms']['p50']:.2f} ms ({ratio:.2f}x)")
+        grown = current['peak_memory_bytes'] - previous['peak_memory_bytes']
+        if grown > MEMORY_SLACK and current['peak_memory_bytes'] > previous['peak_memory_bytes'] * (1 + threshold):
+            problems.append(f"{name}: peak memory {previous['peak_memory_bytes'] / 1e6:.1f} -> "
+                            f"{current['peak_memory_bytes'] / 1e6:.1f} MB")
+        before, after = previous.get('quality_db'), current.get('quality_db')
+        if before != after and (before is None or after is None or abs(before - after) > QUALITY_TOLERANCE):
+            problems.append(f"{name}: quality {before} -> {after} dB")
+    return problems
+
+def _format_row(name: str, result: dict) -> str:
+    latency = result['latency_ms']
+    throughput = result['throughput_bps']
+    quality = result['quality_db']
+    return (f"{name:<48} {latency['p50']:>10.2f} {latency['p90']:>10.2f} {latency['p99']:>10.2f} "
+            f"{(throughput or 0) / 1e6:>10.2f} {result['peak_memory_bytes'] / 1e6:>9.1f} "
+            f"{'' if quality is None else f'{quality:.2f}':>8}")
+
+# ---------------- Command Line ----------------
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark stego_core codecs on synthetic carriers")
+    parser.add_argument('--sizes', default='small,medium',
+                        help=f"comma-separated carrier sizes from {', '.join(IMAGE_SIZES)} (default: small,medium)")
+    parser.add_argument('-k', '--filter', default='', help="only run cases whose name contains this text")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per case (default: 5)")
+    parser.add_argument('-o', '--output', help="write results as JSON to this path")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed fractional growth of p50 latency and peak memory (default: 0.2)")
+    parser.add_argument('--list', action='store_true', help="list the selected cases and exit")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in IMAGE_SIZES]
+    if unknown:
+        print(f"Unknown sizes: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    cases = [case for case in build_cases(sizes) if args.filter in case.name]
+    if args.list:
+        print('\n'.join(case.name for case in cases))
+        return 0
+
+    print(f"{'case':<48} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'Mbit/s':>10} {'peak MB':>9} {'dB':>8}")
+    results = {}
+    for case in cases:
+        # Keep the codecs' progress logging, and the legacy reference's
+        # deliberate uint8 wrap-around warnings, out of the table
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), np.errstate(all='ignore'):
+            results[case.name] = measure(case, args.repeat)
+        print(_format_row(case.name, results[case.name]), flush=True)
+
+    if args.output:
+        report = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'pvd_workers': stego_core.PVD_WORKERS,
+                'repeat': args.repeat
+            },
+            'results': results
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        problems = compare(results, baseline, args.threshold)
+        if problems:
+            print(f"\n{len(problems)} regression(s) against {args.baseline}:")
+            print('\n'.join(f"  {problem}" for problem in problems))
+            return 1
+        print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import numpy as np
+from typing import Iterable, Iterator, Optional, Union
+
+# ---------------- Bit Stream ----------------
+# Payload bits as a np.uint8 array holding one 0/1 value per element, with
+# vectorized reads and writes of variable-width (1-7 bit) big-endian fields
+# as used by PVD. The legacy_pvd flag reproduces the string conversions of
+# pvd_store/pvd_unstore: bin(int.from_bytes(...)) drops leading zero bits and
+# re-pads to a whole byte, and a short final byte is read right-aligned.
+
+MAX_FIELD_WIDTH = 7
+
+class BitStream:
+    def __init__(self, bits: Optional[np.ndarray] = None):
+        self._chunks = [] if bits is None else [np.asarray(bits, dtype=np.uint8)]
+        self._bits = None
+        self.pos = 0
+
+    # ---------------- Construction ----------------
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, bytearray, memoryview, np.ndarray], legacy_pvd: bool = False) -> 'BitStream':
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        if legacy_pvd:
+            ones = np.flatnonzero(bits)
+            bits = bits[ones[0]:] if len(ones) else np.zeros(1, dtype=np.uint8)
+            bits = np.concatenate((np.zeros(8 - len(bits) % 8, dtype=np.uint8), bits))
+        return cls(bits)
+
+    @property
+    def bits(self) -> np.ndarray:
+        if self._bits is None:
+            self._bits = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.uint8)
+            self._chunks = [self._bits]
+        return self._bits
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    @property
+    def remaining(self) -> int:
+        return max(0, len(self) - self.pos)
+
+    # ---------------- Writing ----------------
+    def write_bits(self, bits: np.ndarray) -> None:
+        self._chunks.append(np.asarray(bits, dtype=np.uint8))
+        self._bits = None
+
+    def write_bytes(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        self.write_bits(np.unpackbits(np.frombuffer(data, dtype=np.uint8)))
+
+    def write_uint(self, value: int, width: int) -> None:
+        """Append value as a big-endian field of exactly width bits"""
+        shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+        self.write_bits((np.uint64(value) >> shifts) & np.uint64(1))
+
+    def write_fields(self, values: np.ndarray, widths: np.ndarray) -> None:
+        """Append each value as a big-endian field of its own width (0-7 bits)"""
+        shifts = np.asarray(widths, dtype=np.int32)[:, None] - 1 - np.arange(MAX_FIELD_WIDTH)
+        bits = (np.asarray(values, dtype=np.int32)[:, None] >> np.maximum(shifts, 0)) & 1
+        self.write_bits(bits[shifts >= 0])
+
+    # ---------------- Reading ----------------
+    def read_bits(self, n: int) -> np.ndarray:
+        out = self.bits[self.pos:self.pos + n]
+        self.pos += n
+        return out
+
+    def read_uint(self, width: int) -> int:
+        return _bits_to_int(self.read_bits(width))
+
+    def read_fields(self, widths: np.ndarray) -> np.ndarray:
+        """Read consecutive fields of the given widths (0-7 bits); bits past the end read as 0"""
+        widths = np.asarray(widths, dtype=np.int32)
+        total = int(widths.sum())
+        window = np.packbits(self.read_bits(total))
+        # Every field lies inside the big-endian 16-bit word at its first byte
+        packed = np.zeros(total // 8 + 2, dtype=np.uint8)
+        packed[:len(window)] = window
+
+        offsets = np.cumsum(widths, dtype=np.int64) - widths
+        first = offsets >> 3
+        words = (packed[first].astype(np.int32) << 8) | packed[first + 1]
+        return (words >> (16 - (offsets & 7).astype(np.int32) - widths)) & ((1 << widths) - 1)
+
+    # ---------------- Conversion ----------------
+    def to_bytes(self, legacy_pvd: bool = False) -> bytes:
+        """Pack all bits into bytes. A partial final byte is zero-padded on the
+        right, or read right-aligned like bin_to_bytes_readable with legacy_pvd"""
+        bits = self.bits
+        if not legacy_pvd:
+            return np.packbits(bits).tobytes()
+        full = len(bits) - len(bits) % 8
+        out = np.packbits(bits[:full]).tobytes()
+        if full < len(bits):
+            out += bytes([_bits_to_int(bits[full:])])
+        return out
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    value = 0
+    for bit in bits.tolist():
+        value = (value << 1) | bit
+    return value
+
+# ---------------- Chunked Sources ----------------
+class ChunkedPayload:
+    """Payload bytes produced as an iterable of chunks, with the total length
+    known up front so it can be declared in a container header. Iterating
+    raises ValueError if the chunks do not add up to length."""
+
+    def __init__(self, chunks: Iterable[bytes], length: int):
+        self._chunks = chunks
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[bytes]:
+        total = 0
+        for chunk in self._chunks:
+            total += len(chunk)
+            if total > self.length:
+                raise ValueError(f"Payload is longer than its declared {self.length} bytes")
+            yield chunk
+        if total != self.length:
+            raise ValueError(f"Payload ended after {total} of its declared {self.length} bytes")
+
+class ChunkedBitReader:
+    """Read-only BitStream over bytes arriving as an iterable of chunks.
+
+    Only the bytes between the read position and the furthest bit read so far
+    are buffered, and they stay packed, so a payload is never expanded to one
+    byte per bit. Bits past nbits read as 0.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], nbits: int):
+        self._chunks = iter(chunks)
+        self._nbits = nbits
+        self._buffer = bytearray()
+        self._base = 0  # bit offset of _buffer[0], a multiple of 8
+        self.pos = 0
+
+    def __len__(self) -> int:
+        return self._nbits
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self._nbits - self.pos)
+
+    def _window(self, n: int) -> np.ndarray:
+        """Bytes from the one holding bit pos through bit pos + n, plus two zero bytes"""
+        consumed = (self.pos - self._base) >> 3
+        if consumed:
+            del self._buffer[:consumed]
+            self._base += consumed * 8
+        size = (self.pos - self._base + n + 7) >> 3
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        window = np.zeros(size + 2, dtype=np.uint8)
+        available = min(size, len(self._buffer), (self._nbits - self._base + 7) >> 3)
+        if available > 0:
+            window[:available] = np.frombuffer(self._buffer, dtype=np.uint8, count=available)
+        return window
+
+    def read_bits(self, n: int) -> np.ndarray:
+        window = self._window(n)
+        shift = self.pos - self._base
+        bits = np.unpackbits(window)[shift:shift + n]
+        self.pos += n
+        return bits
+
+    def read_uint(self, width: int) -> int:
+        return _bits_to_int(self.read_bits(width))
+
+    def read_fields(self, widths: np.ndarray) -> np.ndarray:
+        """Read consecutive fields of the given widths (0-7 bits), as BitStream.read_fields"""
+        widths = np.asarray(widths, dtype=np.int32)
+        total = int(widths.sum())
+        packed = self._window(total)
+        shift = self.pos - self._base
+        self.pos += total
+
+        offsets = shift + np.cumsum(widths, dtype=np.int64) - widths
+        first = offsets >> 3
+        words = (packed[first].astype(np.int32) << 8) | packed[first + 1]
+        return (words >> (16 - (offsets & 7).astype(np.int32) - widths)) & ((1 << widths) - 1)
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+
+import stego_core
+from stego_core import (PAYLOAD_TEXT, RASTER_EXTENSIONS, VIDEO_EXTENSIONS, DistortionStats, decrypt_payload,
+                        ecc_derive_shared_key, ecc_generate_keypair, encrypt_message)
+
+# ---------------- Command Line ----------------
+# Embed, extract and capacity checks for image and video carriers.
+# Uncompressed BMP, TIFF and .npy rasters are streamed stripe by stripe from
+# a memory map, and videos frame by frame, so both can be far larger than
+# RAM; other image formats are decoded in memory and written out as PNG.
+# Results are printed as JSON on stdout and the core's progress logging goes
+# to stderr.
+
+def _is_raster(path):
+    return os.path.splitext(path.lower())[1] in RASTER_EXTENSIONS
+
+def _is_video(path):
+    return os.path.splitext(path.lower())[1] in VIDEO_EXTENSIONS
+
+def _read_message(args):
+    if args.message_file:
+        with open(args.message_file, encoding='utf-8') as f:
+            return f.read()
+    return args.message
+
+def _aes_key(args):
+    return ecc_derive_shared_key(bytes.fromhex(args.private_key), bytes.fromhex(args.public_key))
+
+def embed(args):
+    secret_message = _read_message(args)
+    if not secret_message:
+        raise ValueError("Secret message cannot be empty")
+    if args.in_place:
+        if not _is_raster(args.cover):
+            raise ValueError("--in-place needs an uncompressed BMP, TIFF or .npy cover")
+        output = None
+    elif not args.output:
+        raise ValueError("An output path is required unless --in-place is given")
+    else:
+        output = args.output
+
+    private_key, public_key = ecc_generate_keypair()
+    aes_key = ecc_derive_shared_key(private_key, public_key)
+    encrypted_data, _, _, compression = encrypt_message(secret_message, aes_key)
+
+    stats = DistortionStats()
+    if _is_video(args.cover):
+        if os.path.splitext(output.lower())[1] not in ('.avi', '.mkv'):
+            raise ValueError("A stego video is written losslessly; use .avi or .mkv for the output")
+        embed_time, psnr, capacity_bits, capacity_per_pixel = stego_core.embed_data_in_video(
+            args.cover, encrypted_data, output, stats=stats
+        )
+    elif _is_raster(args.cover):
+        if output and os.path.splitext(output.lower())[1] != os.path.splitext(args.cover.lower())[1]:
+            raise ValueError("A streamed raster is written in its own format; use the cover's extension for the output")
+        embed_time, psnr, capacity_bits, capacity_per_pixel = stego_core.embed_data_in_raster(
+            args.cover, encrypted_data, output, stats=stats
+        )
+    else:
+        with open(args.cover, 'rb') as f:
+            image_bytes = f.read()
+        stego_bytes, embed_time, psnr, capacity_bits, capacity_per_pixel = stego_core.embed_data_in_image_bytes(
+            image_bytes, encrypted_data, stats=stats, in_place=True
+        )
+        with open(output, 'wb') as f:
+            f.write(stego_bytes)
+
+    return {
+        'success': True,
+        'output': output or args.cover,
+        'private_key': private_key.hex(),
+        'public_key': public_key.hex(),
+        'metrics': {
+            'embed_time': embed_time,
+            'psnr': psnr,
+            'mse': stats.mse,
+            'changed_samples': stats.changed,
+            'capacity_bits': capacity_bits,
+            'capacity_per_pixel': capacity_per_pixel,
+            'encrypted_data_size': len(encrypted_data),
+            'compression': compression.name,
+            'compression_ratio': compression.ratio,
+            'compression_time': compression.time_ms
+        }
+    }
+
+def extract(args):
+    aes_key = _aes_key(args)
+    if _is_video(args.stego):
+        extracted_data, extract_time = stego_core.extract_data_from_video(args.stego)
+    elif _is_raster(args.stego):
+        extracted_data, extract_time = stego_core.extract_data_from_raster(args.stego)
+    else:
+        with open(args.stego, 'rb') as f:
+            extracted_data, extract_time = stego_core.extract_data_from_image_bytes(f.read())
+    if not extracted_data:
+        raise ValueError("No hidden data found in the image or the file may be corrupted")
+
+    plaintext, kind = decrypt_payload(extracted_data, aes_key)
+    if kind != PAYLOAD_TEXT:
+        raise ValueError("The hidden payload is a binary file, not a message")
+    return {
+        'success': True,
+        'decrypted_message': plaintext.decode('utf-8'),
+        'metrics': {'extract_time': extract_time}
+    }
+
+def capacity(args):
+    if _is_video(args.cover):
+        capacity_bits, max_payload_bytes, shape = stego_core.video_capacity(args.cover)
+    elif _is_raster(args.cover):
+        capacity_bits, max_payload_bytes, shape = stego_core.raster_capacity(args.cover)
+    else:
+        with open(args.cover, 'rb') as f:
+            capacity_bits, max_payload_bytes, shape = stego_core.image_capacity(f.read())
+    return {
+        'success': True,
+        'shape': list(shape),
+        'capacity_bits': capacity_bits,
+        'max_payload_bytes': max_payload_bytes,
+        'max_message_bytes': max(0, max_payload_bytes - stego_core.AES_OVERHEAD)
+    }
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="PVD image and video steganography with AES-encrypted payloads")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('embed', help="hide a message in an image or video")
+    p.add_argument('cover', help="cover image or video; .bmp, .tif/.tiff, .npy and videos are streamed")
+    p.add_argument('output', nargs='?', help="stego image (PNG unless the cover is streamed), or .avi/.mkv video")
+    message = p.add_mutually_exclusive_group(required=True)
+    message.add_argument('-m', '--message', help="secret message")
+    message.add_argument('-f', '--message-file', help="read the secret message from a UTF-8 file")
+    p.add_argument('--in-place', action='store_true', help="overwrite a streamed cover instead of writing a copy")
+    p.set_defaults(handler=embed)
+
+    p = commands.add_parser('extract', help="recover a message from a stego image or video")
+    p.add_argument('stego', help="stego image or video")
+    p.add_argument('--private-key', required=True, help="hex private key printed by embed")
+    p.add_argument('--public-key', required=True, help="hex public key printed by embed")
+    p.set_defaults(handler=extract)
+
+    p = commands.add_parser('capacity', help="report how much an image or video can hold")
+    p.add_argument('cover', help="cover image or video")
+    p.set_defaults(handler=capacity)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        with redirect_stdout(sys.stderr):
+            result = args.handler(args)
+    except (OSError, ValueError) as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
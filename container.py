@@ -0,0 +1,146 @@
+import binascii
+import struct
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# ---------------- Stego Container ----------------
+# Payloads are prefixed with a fixed 11-byte header:
+#   magic (2) | version (1) | codec (1) | flags (1) | length (4) | CRC-16 (2)
+# The CRC covers the preceding nine bytes. A carrier without a valid header
+# is rejected after reading HEADER_BITS bits, and the declared length bounds
+# how much of the carrier is decoded.
+
+MAGIC = b'SG'
+VERSION = 1
+
+CODEC_PVD = 1      # PVD over RGB pixel pairs
+CODEC_WAV_LSB = 2  # one bit per 16-bit PCM sample
+CODEC_VIDEO_PVD = 3  # PVD over the RGB pixel pairs of successive frames
+
+_FIELDS = struct.Struct('>2sBBBI')
+HEADER_SIZE = _FIELDS.size + 2
+HEADER_BITS = HEADER_SIZE * 8
+
+class ContainerHeader(NamedTuple):
+    version: int
+    codec: int
+    flags: int
+    length: int
+
+def _crc(data: bytes) -> int:
+    return binascii.crc_hqx(data, 0xFFFF)
+
+def pack_header(codec: int, length: int, flags: int = 0) -> bytes:
+    fields = _FIELDS.pack(MAGIC, VERSION, codec, flags, length)
+    return fields + struct.pack('>H', _crc(fields))
+
+def parse_header(data: bytes) -> Optional[ContainerHeader]:
+    """Header at the start of data, or None if the magic or CRC do not match"""
+    if len(data) < HEADER_SIZE or data[:len(MAGIC)] != MAGIC:
+        return None
+    fields = bytes(data[:_FIELDS.size])
+    (crc,) = struct.unpack_from('>H', data, _FIELDS.size)
+    if crc != _crc(fields):
+        return None
+    _, version, codec, flags, length = _FIELDS.unpack(fields)
+    return ContainerHeader(version, codec, flags, length)
+
+def check_header(header: ContainerHeader, codec: int, capacity_bits: int) -> Optional[str]:
+    """Reason a parsed header cannot be read from this carrier, or None"""
+    if header.version > VERSION:
+        return f"unsupported container version {header.version}"
+    if header.codec != codec:
+        return f"container codec {header.codec} does not match carrier codec {codec}"
+    if HEADER_BITS + header.length * 8 > capacity_bits:
+        return f"declared length {header.length} bytes exceeds carrier capacity"
+    return None
+
+# ---------------- Shards ----------------
+# A payload too large for one carrier is split into shards, each embedded as
+# an ordinary container payload that starts with a 26-byte shard header:
+#   magic (4) | set ID (8) | index (2) | count (2) | total length (4) |
+#   CRC-32 of the shard data (4) | CRC-16 (2)
+# The CRC-16 covers the preceding 24 bytes, so the header is recognised
+# without knowing in advance that a carrier holds a shard.
+
+SHARD_MAGIC = b'SGS1'
+MAX_SHARDS = 0xFFFF
+
+_SHARD_FIELDS = struct.Struct('>4s8sHHII')
+SHARD_HEADER_SIZE = _SHARD_FIELDS.size + 2
+
+class ShardHeader(NamedTuple):
+    set_id: bytes
+    index: int
+    count: int
+    total_length: int
+    checksum: int
+
+def pack_shard(set_id: bytes, index: int, count: int, total_length: int, data: bytes) -> bytes:
+    fields = _SHARD_FIELDS.pack(SHARD_MAGIC, set_id, index, count, total_length, binascii.crc32(data))
+    return fields + struct.pack('>H', _crc(fields)) + data
+
+def parse_shard(payload: bytes) -> Optional[Tuple[ShardHeader, bytes]]:
+    """Shard header and data of a payload, or None if it is not a shard"""
+    if len(payload) < SHARD_HEADER_SIZE or payload[:len(SHARD_MAGIC)] != SHARD_MAGIC:
+        return None
+    fields = bytes(payload[:_SHARD_FIELDS.size])
+    (crc,) = struct.unpack_from('>H', payload, _SHARD_FIELDS.size)
+    if crc != _crc(fields):
+        return None
+    _, set_id, index, count, total_length, checksum = _SHARD_FIELDS.unpack(fields)
+    return ShardHeader(set_id, index, count, total_length, checksum), payload[SHARD_HEADER_SIZE:]
+
+def shard_sizes(capacities: Sequence[int], length: int) -> List[int]:
+    """Bytes of a length-byte payload to put in each carrier, proportional to
+    the payload bytes each can hold so every carrier is filled to the same
+    fraction. Raises ValueError if the carriers cannot hold it together."""
+    if not 0 < len(capacities) <= MAX_SHARDS:
+        raise ValueError(f"Sharding needs between 1 and {MAX_SHARDS} carriers")
+    usable = [max(0, capacity - SHARD_HEADER_SIZE) for capacity in capacities]
+    total = sum(usable)
+    if length > total:
+        raise ValueError(f"Message too large for carriers. Max: {total} bytes, Required: {length} bytes")
+
+    sizes = [room * length // total if total else 0 for room in usable]
+    # Rounding down leaves fewer bytes than carriers, each fitting in a carrier with room
+    remainder = length - sum(sizes)
+    for i, room in enumerate(usable):
+        if remainder == 0:
+            break
+        if sizes[i] < room:
+            sizes[i] += 1
+            remainder -= 1
+    return sizes
+
+def split_shards(payload: bytes, capacities: Sequence[int], set_id: bytes) -> List[bytes]:
+    """Shard payloads for carriers with these payload capacities, in order"""
+    sizes = shard_sizes(capacities, len(payload))
+    shards = []
+    offset = 0
+    for index, size in enumerate(sizes):
+        shards.append(pack_shard(set_id, index, len(sizes), len(payload), payload[offset:offset + size]))
+        offset += size
+    return shards
+
+def join_shards(shards: Iterable[Tuple[ShardHeader, bytes]]) -> bytes:
+    """Payload reassembled from the shards of one set, in any order.
+    Raises ValueError for mixed sets, corrupt or missing shards."""
+    by_index = {}
+    first = None
+    for header, data in shards:
+        first = first or header
+        if (header.set_id, header.count, header.total_length) != (first.set_id, first.count, first.total_length):
+            raise ValueError("Carriers hold shards of more than one payload")
+        if binascii.crc32(data) != header.checksum:
+            raise ValueError(f"Shard {header.index + 1} of {header.count} is corrupt")
+        by_index[header.index] = data
+    if first is None:
+        raise ValueError("No shards found")
+
+    missing = [index + 1 for index in range(first.count) if index not in by_index]
+    if missing:
+        raise ValueError(f"Missing shard(s) {', '.join(map(str, missing))} of {first.count}")
+    payload = b''.join(by_index[index] for index in range(first.count))
+    if len(payload) != first.total_length:
+        raise ValueError(f"Shards hold {len(payload)} bytes, expected {first.total_length}")
+    return payload
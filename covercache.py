@@ -0,0 +1,168 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from metrics import COVER_CACHE_BYTES, COVER_CACHE_REQUESTS, EXTRACT_CACHE_BYTES, EXTRACT_CACHE_REQUESTS
+
+# ---------------- Cover Cache ----------------
+# Decoded cover images keyed by the SHA-256 of their encoded bytes, together
+# with the cumulative PVD capacity of their rows, so embedding several
+# messages into one cover decodes and scans it once. Entries are evicted
+# least recently used first once their pixels and capacity maps exceed
+# max_bytes. The cache is process-local: each gunicorn worker keeps its own.
+
+class Cover(NamedTuple):
+    digest: str
+    pixels: np.ndarray
+    row_bits: np.ndarray  # bits the rows up to and including each row can carry
+    shared: bool  # held by the cache, so the pixels must not be written
+
+    @property
+    def nbytes(self) -> int:
+        return self.pixels.nbytes + self.row_bits.nbytes
+
+def content_digest(data) -> str:
+    """SHA-256 of bytes, or of a seekable stream read in chunks and rewound"""
+    if not hasattr(data, 'read'):
+        return hashlib.sha256(data).hexdigest()
+    digest = hashlib.sha256()
+    start = data.tell()
+    for chunk in iter(lambda: data.read(1 << 20), b''):
+        digest.update(chunk)
+    data.seek(start)
+    return digest.hexdigest()
+
+class CoverCache:
+    """Byte-bounded LRU map of content hash to Cover; max_bytes=0 disables it"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._covers: 'OrderedDict[str, Cover]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest: str, count: bool = True) -> Optional[Cover]:
+        """Cached cover for digest, or None. Lookups with count=False (such as
+        admission peeking at a cover's size) leave the hit/miss counts alone."""
+        if not self.max_bytes:
+            return None
+        with self._lock:
+            cover = self._covers.get(digest)
+            if cover is not None:
+                self._covers.move_to_end(digest)
+            if count:
+                if cover is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                COVER_CACHE_REQUESTS.inc(result='hit' if cover is not None else 'miss')
+            return cover
+
+    def put(self, cover: Cover) -> Cover:
+        """Cache cover and return it marked shared, or unchanged if it is
+        larger than the whole cache"""
+        if cover.nbytes > self.max_bytes:
+            return cover
+        cover.pixels.flags.writeable = False
+        cover = cover._replace(shared=True)
+        with self._lock:
+            old = self._covers.pop(cover.digest, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._covers[cover.digest] = cover
+            self._bytes += cover.nbytes
+            self._evict()
+        return cover
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes:
+            _, cover = self._covers.popitem(last=False)
+            self._bytes -= cover.nbytes
+        COVER_CACHE_BYTES.set(self._bytes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._covers),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+# ---------------- Extraction Cache ----------------
+# Encrypted payloads extracted from stego carriers, keyed by the carrier's
+# content hash. Extraction does not depend on the keys, so a retry with
+# corrected keys only derives the key and decrypts. Plaintext is never
+# stored. Entries expire ttl seconds after extraction, and the least
+# recently used go first once the payloads exceed max_bytes.
+
+class PayloadCache:
+    """TTL- and byte-bounded LRU map of carrier hash to extracted payload"""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = self.misses = 0
+        self._payloads: 'OrderedDict[str, Tuple[bytes, float]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[bytes]:
+        if not self.max_bytes:
+            return None
+        with self._lock:
+            self._evict()
+            entry = self._payloads.get(digest)
+            if entry is not None:
+                self._payloads.move_to_end(digest)
+                self.hits += 1
+            else:
+                self.misses += 1
+            EXTRACT_CACHE_REQUESTS.inc(result='hit' if entry is not None else 'miss')
+            return None if entry is None else entry[0]
+
+    def put(self, digest: str, payload: bytes) -> None:
+        if not payload or len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(digest)
+            self._payloads[digest] = (payload, time.monotonic() + self.ttl)
+            self._bytes += len(payload)
+            self._evict()
+
+    def _drop(self, digest: str) -> None:
+        entry = self._payloads.pop(digest, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def _evict(self) -> None:
+        """Drop expired payloads, then the least recently used while over max_bytes"""
+        now = time.monotonic()
+        for digest, (_, expires) in list(self._payloads.items()):
+            if expires <= now:
+                self._drop(digest)
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._payloads)))
+        EXTRACT_CACHE_BYTES.set(self._bytes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._payloads),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
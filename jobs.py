@@ -0,0 +1,211 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import stego_core
+from container import HEADER_BITS
+from metrics import PeakMemory
+
+# ---------------- Worker Side ----------------
+# Each job owns a slot in a shared int64 array holding (running, bits_done,
+# bits_total), which workers update as they go and the web process reads
+# when polled.
+SLOT_FIELDS = 3
+_progress = None
+
+def _init_worker(progress):
+    global _progress
+    _progress = progress
+    # Covers are cached in the web process, which ships cached pixels to
+    # jobs that name a cover by hash
+    stego_core.COVER_CACHE.resize(0)
+
+def _reporter(slot):
+    def report(done, total):
+        _progress[SLOT_FIELDS * slot + 1] = done
+        _progress[SLOT_FIELDS * slot + 2] = total
+    return report
+
+def _run(task, slot, *args):
+    _progress[SLOT_FIELDS * slot] = 1
+    return task(slot, *args)
+
+def _quality(stats, usage):
+    return {'ssim': stats.ssim, 'mse': stats.mse, 'changed_samples': stats.changed, 'peak_memory': usage.peak_mb()}
+
+def embed_image_task(slot, image_bytes, data_bytes, ssim=False, engine=None):
+    report = _reporter(slot)
+    report(0, stego_core.pvd_payload_bits(data_bytes))
+    stats = stego_core.DistortionStats()
+    with PeakMemory('embed_image_job') as usage:
+        result = stego_core.embed_data_in_image_bytes(image_bytes, data_bytes, report, stats, ssim, engine=engine)
+    return result + (_quality(stats, usage),)
+
+def embed_audio_task(slot, audio_bytes, data_bytes, engine=None):
+    report = _reporter(slot)
+    total = HEADER_BITS + len(data_bytes) * 8
+    report(0, total)
+    stats = stego_core.DistortionStats()
+    with PeakMemory('embed_audio_job') as usage:
+        stego_stream, embed_time, snr, capacity_bits, capacity_per_sample = stego_core.embed_data_in_audio_stream(
+            BytesIO(audio_bytes), data_bytes, stats=stats, engine=engine
+        )
+        with stego_stream:
+            stego_audio = stego_stream.read()
+    report(total, total)
+    quality = _quality(stats, usage)
+    del quality['ssim']
+    return stego_audio, embed_time, snr, capacity_bits, capacity_per_sample, quality
+
+def extract_image_task(slot, image_bytes, engine=None):
+    extracted_data, extract_time = stego_core.extract_data_from_image_bytes(image_bytes, engine)
+    _reporter(slot)(len(extracted_data) * 8, len(extracted_data) * 8)
+    return extracted_data, extract_time
+
+def extract_audio_task(slot, audio_bytes, engine=None):
+    extracted_data, extract_time = stego_core.extract_data_from_audio_DE(BytesIO(audio_bytes), engine)
+    _reporter(slot)(len(extracted_data) * 8, len(extracted_data) * 8)
+    return extracted_data, extract_time
+
+# ---------------- Job Manager ----------------
+class QueueFull(Exception):
+    pass
+
+class JobManager:
+    """Runs stego_core work in a bounded process pool and keeps finished
+    results in a TTL-evicted store capped at max_bytes of output files.
+
+    Jobs live in the web process that accepted them, so with several
+    gunicorn workers clients must poll the same worker (or run one worker).
+    """
+
+    def __init__(self, max_workers=None, max_pending=32, ttl=600, max_bytes=256 * 1024 * 1024):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending
+        # spawn rather than fork: the web process runs threads
+        self._context = multiprocessing.get_context('spawn')
+        self._progress = self._context.Array('q', SLOT_FIELDS * max_pending, lock=False)
+        self._free_slots = list(range(max_pending))
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._stored_bytes = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=self._context,
+                initializer=_init_worker, initargs=(self._progress,)
+            )
+        return self._executor
+
+    def submit(self, kind, task, args, finish, release=None):
+        """Queue task(slot, *args). finish(value) turns the worker's return
+        value into (result_dict, file_bytes, file_mimetype) in this process.
+        release(), if given, is called once the job has finished, or before
+        submit raises."""
+        with self._lock:
+            self._evict()
+            if not self._free_slots:
+                if release is not None:
+                    release()
+                raise QueueFull(f"Job queue is full ({self.max_pending} pending jobs)")
+            slot = self._free_slots.pop()
+            for i in range(SLOT_FIELDS):
+                self._progress[SLOT_FIELDS * slot + i] = 0
+
+            job_id = uuid.uuid4().hex
+            job = {
+                'id': job_id, 'kind': kind, 'status': 'queued', 'slot': slot,
+                'created': time.time(), 'finished': None,
+                'result': None, 'error': None, 'file': None, 'file_mimetype': None
+            }
+            self._jobs[job_id] = job
+
+        try:
+            future = self._get_executor().submit(_run, task, slot, *args)
+        except Exception:
+            with self._lock:
+                self._free_slots.append(self._jobs.pop(job_id)['slot'])
+            if release is not None:
+                release()
+            raise
+        future.add_done_callback(lambda f: self._complete(job_id, f, finish, release))
+        return job_id
+
+    def _complete(self, job_id, future, finish, release=None):
+        try:
+            result, file_bytes, file_mimetype = finish(future.result())
+            update = {'status': 'done', 'result': result, 'file': file_bytes, 'file_mimetype': file_mimetype}
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            update = {'status': 'failed', 'error': str(e)}
+        finally:
+            if release is not None:
+                release()
+
+        with self._lock:
+            job = self._jobs[job_id]
+            job['progress'] = self._read_progress(job['slot'])
+            self._free_slots.append(job.pop('slot'))
+            job.update(update, finished=time.time())
+            self._stored_bytes += len(job['file'] or b'')
+            self._evict()
+
+    def _read_progress(self, slot):
+        base = SLOT_FIELDS * slot
+        return {'bits_done': self._progress[base + 1], 'bits_total': self._progress[base + 2]}
+
+    def _evict(self):
+        """Drop expired results, then the oldest finished ones while over max_bytes"""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job['finished'] is not None and now - job['finished'] > self.ttl:
+                self._drop(job_id)
+        for job_id, job in list(self._jobs.items()):
+            if self._stored_bytes <= self.max_bytes:
+                break
+            if job['finished'] is not None:
+                self._drop(job_id)
+
+    def _drop(self, job_id):
+        job = self._jobs.pop(job_id)
+        self._stored_bytes -= len(job['file'] or b'')
+
+    def get(self, job_id):
+        """Status snapshot of a job, or None if unknown or evicted"""
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if 'slot' in job:
+                progress = self._read_progress(job['slot'])
+                if job['status'] == 'queued' and self._progress[SLOT_FIELDS * job['slot']]:
+                    job['status'] = 'running'
+            else:
+                progress = job['progress']
+            return {
+                'job_id': job['id'],
+                'kind': job['kind'],
+                'status': job['status'],
+                'progress': progress,
+                'result': job['result'],
+                'error': job['error'],
+                'has_file': job['file'] is not None,
+                'created': job['created'],
+                'finished': job['finished']
+            }
+
+    def get_file(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['file'] is None:
+                return None, None
+            return job['file'], job['file_mimetype']
@@ -0,0 +1,324 @@
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import psutil
+
+# ---------------- Instrumentation ----------------
+# Process-local counters, gauges and histograms rendered in the Prometheus
+# text exposition format. Each gunicorn worker keeps its own values.
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        self._values = {}
+        super().__init__(*args, **kwargs)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, total + value)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REQUESTS = Counter('stego_requests_total', 'HTTP requests handled', ('endpoint',))
+FAILURES = Counter('stego_request_failures_total', 'HTTP requests that returned an error', ('endpoint',))
+BYTES_IN = Counter('stego_bytes_in_total', 'Request body bytes received', ('endpoint',))
+BYTES_OUT = Counter('stego_bytes_out_total', 'Response body bytes sent', ('endpoint',))
+PAYLOAD_BITS = Counter('stego_payload_bits_total', 'Payload bits embedded into carriers', ('carrier',))
+ENGINE_RUNS = Counter('stego_engine_runs_total', 'Codec engine selections', ('carrier', 'engine'))
+ENGINE_MISMATCHES = Counter('stego_engine_mismatches_total', 'Verified calls whose output differed from the reference engine', ('carrier', 'engine'))
+COVER_CACHE_REQUESTS = Counter('stego_cover_cache_requests_total', 'Decoded cover cache lookups', ('result',))
+COVER_CACHE_BYTES = Gauge('stego_cover_cache_bytes', 'Bytes held by the decoded cover cache')
+EXTRACT_CACHE_REQUESTS = Counter('stego_extract_cache_requests_total', 'Extracted payload cache lookups', ('result',))
+EXTRACT_CACHE_BYTES = Gauge('stego_extract_cache_bytes', 'Bytes held by the extracted payload cache')
+REQUEST_LATENCY = Histogram('stego_request_duration_seconds', 'End-to-end request latency', ('endpoint',))
+STAGE_LATENCY = Histogram('stego_stage_duration_seconds', 'Latency of individual pipeline stages', ('stage',))
+CPU_PERCENT = Gauge('stego_process_cpu_percent', 'Sampled process CPU usage in percent')
+RSS_BYTES = Gauge('stego_process_resident_memory_bytes', 'Sampled process resident set size')
+ADMISSION_WAITING = Gauge('stego_admission_waiting', 'Requests queued for an admission slot', ('lane',))
+ADMISSION_REJECTED = Counter('stego_admission_rejected_total', 'Requests shed with 429 by admission control', ('lane',))
+ADMISSION_WAIT = Histogram('stego_admission_wait_seconds', 'Time spent queued before admission', ('lane',))
+MEMORY_BUCKETS = tuple(float(mb << 20) for mb in (1, 4, 16, 32, 64, 128, 256, 512, 1024, 2048))
+PEAK_MEMORY = Histogram('stego_request_peak_memory_bytes', 'Peak bytes allocated while handling a request', ('endpoint',), MEMORY_BUCKETS)
+
+@contextmanager
+def stage_timer(stage: str):
+    """Record the duration of a pipeline stage (decode, encrypt, embed, ...)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+
+# ---------------- System Sampler ----------------
+SAMPLE_INTERVAL = float(os.environ.get('STEGO_METRICS_SAMPLE_INTERVAL', 1.0))
+
+class SystemSampler(threading.Thread):
+    """Background thread refreshing the CPU and RSS gauges, so requests
+    read the last sample instead of blocking in psutil.cpu_percent"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name='stego-metrics-sampler', daemon=True)
+        self.interval = interval
+        self.pid = os.getpid()
+        self.process = psutil.Process(self.pid)
+        self.cpu_percent = 0.0
+        self.memory_usage = self.process.memory_info().rss / 1e6  # MB
+        psutil.cpu_percent(interval=None)  # prime the non-blocking counter
+
+    def sample(self) -> None:
+        self.cpu_percent = psutil.cpu_percent(interval=None)
+        rss = self.process.memory_info().rss
+        self.memory_usage = rss / 1e6
+        CPU_PERCENT.set(self.cpu_percent)
+        RSS_BYTES.set(rss)
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.sample()
+            except Exception:
+                pass
+            time.sleep(self.interval)
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+def get_sampler() -> SystemSampler:
+    """Sampler for the current process, started on first use (and again after a fork)"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None or _sampler.pid != os.getpid():
+            _sampler = SystemSampler()
+            _sampler.start()
+        return _sampler
+
+def system_metrics() -> Tuple[float, float]:
+    """Last sampled CPU percent and RSS in MB; never blocks"""
+    sampler = get_sampler()
+    return sampler.cpu_percent, sampler.memory_usage
+
+# ---------------- Peak Memory ----------------
+# STEGO_MEMORY_TRACKING picks how a request's peak allocation is measured:
+#   rss          highest resident set above the one at entry, polled every
+#                STEGO_RSS_PEAK_INTERVAL seconds while any request is measured;
+#                the resident set is process-wide, so overlapping requests
+#                are counted in each other's peak, and spikes shorter than
+#                the interval can be missed
+#   tracemalloc  peak traced allocations (numpy buffers included); the peak is
+#                process-wide, so overlapping requests see each other's, and
+#                tracing slows pure-Python code several times over while any
+#                request is measured
+#   off          no measurement
+MEMORY_TRACKING = os.environ.get('STEGO_MEMORY_TRACKING', 'rss').lower()
+RSS_PEAK_INTERVAL = float(os.environ.get('STEGO_RSS_PEAK_INTERVAL', 0.005))
+
+_tracking = 0
+_tracking_started = False  # tracing was started here, so it is stopped here too
+_tracking_lock = threading.Lock()
+
+class RssPeakSampler(threading.Thread):
+    """Background thread polling the resident set while PeakMemory blocks are
+    open and raising each one's high-water mark; idle otherwise"""
+
+    def __init__(self, interval: float = RSS_PEAK_INTERVAL):
+        super().__init__(name='stego-rss-peak-sampler', daemon=True)
+        self.interval = interval
+        self.pid = os.getpid()
+        self.process = psutil.Process(self.pid)
+        self._trackers = set()
+        self._cond = threading.Condition()
+
+    def add(self, tracker: 'PeakMemory') -> None:
+        with self._cond:
+            self._trackers.add(tracker)
+            self._cond.notify()
+
+    def discard(self, tracker: 'PeakMemory') -> None:
+        with self._cond:
+            self._trackers.discard(tracker)
+
+    def observe(self) -> int:
+        """Read the resident set now and raise every open tracker's mark"""
+        rss = self.process.memory_info().rss
+        with self._cond:
+            for tracker in self._trackers:
+                if rss > tracker._high:
+                    tracker._high = rss
+        return rss
+
+    def run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._trackers:
+                    self._cond.wait()
+            try:
+                self.observe()
+            except Exception:
+                pass
+            time.sleep(self.interval)
+
+_rss_peak_sampler = None
+
+def get_rss_peak_sampler() -> RssPeakSampler:
+    """RSS peak sampler for the current process, started on first use (and again after a fork)"""
+    global _rss_peak_sampler
+    with _sampler_lock:
+        if _rss_peak_sampler is None or _rss_peak_sampler.pid != os.getpid():
+            _rss_peak_sampler = RssPeakSampler()
+            _rss_peak_sampler.start()
+        return _rss_peak_sampler
+
+class PeakMemory:
+    """Peak bytes allocated since the block was entered: traced allocations
+    under tracemalloc, the resident set's high-water mark above its entry
+    value under rss"""
+
+    def __init__(self, endpoint: str = '', mode: str = MEMORY_TRACKING):
+        self.endpoint = endpoint
+        self.mode = mode
+        self._baseline = 0
+        self._high = 0
+
+    def __enter__(self) -> 'PeakMemory':
+        global _tracking, _tracking_started
+        if self.mode == 'tracemalloc':
+            with _tracking_lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracking_started = True
+                # Only restart the peak when no other request is measuring
+                if _tracking == 0:
+                    tracemalloc.reset_peak()
+                _tracking += 1
+                self._baseline = tracemalloc.get_traced_memory()[0]
+        elif self.mode == 'rss':
+            sampler = get_rss_peak_sampler()
+            self._baseline = self._high = sampler.process.memory_info().rss
+            sampler.add(self)
+        return self
+
+    def peak(self) -> Optional[int]:
+        """Peak so far in bytes, or None when tracking is off"""
+        if self.mode == 'tracemalloc':
+            return max(0, tracemalloc.get_traced_memory()[1] - self._baseline)
+        if self.mode == 'rss':
+            get_rss_peak_sampler().observe()
+            return max(0, self._high - self._baseline)
+        return None
+
+    def peak_mb(self) -> Optional[float]:
+        peak = self.peak()
+        return None if peak is None else peak / 1e6
+
+    def __exit__(self, *exc) -> None:
+        global _tracking, _tracking_started
+        peak = self.peak()
+        if self.mode == 'tracemalloc':
+            with _tracking_lock:
+                _tracking -= 1
+                # Stop tracing between requests, unless someone else started it
+                if _tracking == 0 and _tracking_started:
+                    tracemalloc.stop()
+                    _tracking_started = False
+        elif self.mode == 'rss':
+            get_rss_peak_sampler().discard(self)
+        if peak is not None:
+            PEAK_MEMORY.observe(peak, endpoint=self.endpoint)
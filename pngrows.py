@@ -0,0 +1,95 @@
+import struct
+import zlib
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+# ---------------- Incremental PNG Rows ----------------
+# PNG scanlines are stored top to bottom in one zlib stream, and each
+# filtered row refers only to the rows above it. The first k rows can
+# therefore be decoded by inflating just enough IDAT data for k scanlines
+# and wrapping them in a k-row PNG with the original header chunks (PLTE,
+# tRNS, ...). OpenCV then unfilters that PNG in C and applies exactly the
+# colour conversion it would apply to the whole image.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # by colour type
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+class PNGRows:
+    """First rows of a non-interlaced PNG, decoded on demand as BGR like
+    cv2.imdecode(..., cv2.IMREAD_COLOR).
+
+    Raises ValueError for data that is not a PNG or is interlaced, which
+    needs a full decode.
+    """
+
+    def __init__(self, data: bytes):
+        if data[:len(PNG_SIGNATURE)] != PNG_SIGNATURE:
+            raise ValueError("Not a PNG image")
+        view = memoryview(data)
+        pos = len(PNG_SIGNATURE)
+        ihdr = None
+        header_chunks: List[bytes] = []
+        self._idat: List[memoryview] = []
+        while pos + 8 <= len(data):
+            length, kind = struct.unpack_from('>I4s', data, pos)
+            body = view[pos + 8:pos + 8 + length]
+            if kind == b'IHDR':
+                ihdr = bytes(body)
+            elif kind == b'IDAT':
+                self._idat.append(body)
+            elif kind == b'IEND':
+                break
+            elif not self._idat:
+                # Ancillary and palette chunks ahead of the pixels
+                header_chunks.append(bytes(view[pos:pos + 12 + length]))
+            pos += 12 + length
+        if ihdr is None or len(ihdr) != 13 or not self._idat:
+            raise ValueError("Malformed PNG image")
+
+        width, height, depth, colour, _, _, interlace = struct.unpack('>IIBBBBB', ihdr)
+        if interlace:
+            raise ValueError("Interlaced PNG images need a full decode")
+        if colour not in _CHANNELS:
+            raise ValueError(f"Unsupported PNG colour type {colour}")
+
+        self._ihdr = ihdr
+        self._header_chunks = b''.join(header_chunks)
+        self.shape: Tuple[int, int, int] = (height, width, 3)
+        self._row_bytes = 1 + (width * _CHANNELS[colour] * depth + 7) // 8
+        self._inflater = zlib.decompressobj()
+        self._next_idat = 0
+        self._raw = bytearray()
+
+    def _inflate(self, size: int) -> None:
+        """Inflate IDAT data until size filtered bytes are available or the stream ends"""
+        while len(self._raw) < size:
+            if self._inflater.unconsumed_tail:
+                data = self._inflater.unconsumed_tail
+            elif self._next_idat < len(self._idat):
+                data = self._idat[self._next_idat]
+                self._next_idat += 1
+            else:
+                break
+            self._raw += self._inflater.decompress(data, size - len(self._raw))
+
+    def read(self, rows: int) -> np.ndarray:
+        """The first rows rows, fewer if the image or its data ends first"""
+        rows = min(rows, self.shape[0])
+        self._inflate(rows * self._row_bytes)
+        rows = min(rows, len(self._raw) // self._row_bytes)
+        if rows == 0:
+            return np.zeros((0,) + self.shape[1:], dtype=np.uint8)
+
+        ihdr = self._ihdr[:4] + struct.pack('>I', rows) + self._ihdr[8:]
+        scanlines = zlib.compress(memoryview(self._raw)[:rows * self._row_bytes], 0)
+        png = (PNG_SIGNATURE + _chunk(b'IHDR', ihdr) + self._header_chunks +
+               _chunk(b'IDAT', scanlines) + _chunk(b'IEND', b''))
+        img = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Failed to decode PNG rows")
+        return img
@@ -1,25 +1,25 @@
 // Image Embed Form Handler
 document.getElementById('imageEmbedForm').addEventListener('submit', async function(e) {
     e.preventDefault();
-    await processForm(this, '/embed_image', 'imageResults');
+    await processForm(this, '/v2/embed_image', 'imageResults');
 });
 
 // Image Extract Form Handler
 document.getElementById('imageExtractForm').addEventListener('submit', async function(e) {
     e.preventDefault();
-    await processForm(this, '/extract_image', 'imageResults');
+    await processForm(this, '/v2/extract_image', 'imageResults');
 });
 
 // Audio Embed Form Handler
 document.getElementById('audioEmbedForm').addEventListener('submit', async function(e) {
     e.preventDefault();
-    await processForm(this, '/embed_audio', 'audioResults');
+    await processForm(this, '/v2/embed_audio', 'audioResults');
 });
 
 // Audio Extract Form Handler
 document.getElementById('audioExtractForm').addEventListener('submit', async function(e) {
     e.preventDefault();
-    await processForm(this, '/extract_audio', 'audioResults');
+    await processForm(this, '/v2/extract_audio', 'audioResults');
 });
 
 // Copy to clipboard function
@@ -79,7 +79,7 @@ async function processForm(form, url, resultsDiv) {
             body: formData
         });
 
-        const data = await response.json();
+        const data = await readResponse(response, resultsDiv);
 
         if (data.success) {
             displayResults(data, resultsContainer, url.includes('embed'));
@@ -91,6 +91,31 @@ async function processForm(form, url, resultsDiv) {
     }
 }
 
+// Blob URLs currently shown in each results panel
+const stegoBlobUrls = {};
+
+async function readResponse(response, resultsDiv) {
+    const contentType = response.headers.get('Content-Type') || '';
+    if (contentType.includes('application/json')) {
+        return response.json();
+    }
+
+    // Binary stego file: the JSON result travels in a header
+    const data = JSON.parse(response.headers.get('X-Stego-Result'));
+    if (stegoBlobUrls[resultsDiv]) {
+        URL.revokeObjectURL(stegoBlobUrls[resultsDiv]);
+    }
+    const blobUrl = URL.createObjectURL(await response.blob());
+    stegoBlobUrls[resultsDiv] = blobUrl;
+
+    if (contentType.startsWith('image/')) {
+        data.stego_image_url = blobUrl;
+    } else {
+        data.stego_audio_url = blobUrl;
+    }
+    return data;
+}
+
 function displayResults(data, container, isEmbed) {
     if (isEmbed) {
         container.innerHTML = createEmbedResultsHTML(data);
@@ -120,25 +145,29 @@ function createEmbedResultsHTML(data) {
             <h6><i class="fas fa-check-circle"></i> Message Embedded Successfully!</h6>
         </div>
 
-        ${data.stego_image ? `
+        ${data.stego_image_url ? `
         <div class="mb-3">
             <h6><i class="fas fa-image"></i> Stego Image</h6>
-            <img src="data:image/png;base64,${data.stego_image}" class="stego-image img-fluid">
+            <img src="${data.stego_image_url}" class="stego-image img-fluid">
             <div class="mt-2">
-                <small class="text-muted">Right-click and "Save image as" to download</small>
+                <a href="${data.stego_image_url}" download="stego_image.png" class="btn btn-sm btn-outline-primary">
+                    <i class="fas fa-download"></i> Download PNG
+                </a>
             </div>
         </div>
         ` : ''}
 
-        ${data.stego_audio ? `
+        ${data.stego_audio_url ? `
         <div class="mb-3">
             <h6><i class="fas fa-music"></i> Stego Audio</h6>
             <audio controls class="w-100">
-                <source src="data:audio/wav;base64,${data.stego_audio}" type="audio/wav">
+                <source src="${data.stego_audio_url}" type="audio/wav">
                 Your browser does not support the audio element.
             </audio>
             <div class="mt-2">
-                <small class="text-muted">Right-click and "Save audio as" to download</small>
+                <a href="${data.stego_audio_url}" download="stego_audio.wav" class="btn btn-sm btn-outline-primary">
+                    <i class="fas fa-download"></i> Download WAV
+                </a>
             </div>
         </div>
         ` : ''}
@@ -249,6 +278,14 @@ function createEmbedResultsHTML(data) {
                     </div>
                 </div>
                 ` : ''}
+                ${data.metrics.ssim ? `
+                <div class="col-md-6">
+                    <div class="metric-card">
+                        <div class="metric-value">${data.metrics.ssim.toFixed(4)}</div>
+                        <div class="metric-label">SSIM</div>
+                    </div>
+                </div>
+                ` : ''}
                 <div class="col-md-6">
                     <div class="metric-card">
                         <div class="metric-value">${data.metrics.capacity_bits}</div>
@@ -271,6 +308,14 @@ function createEmbedResultsHTML(data) {
                     </div>
                 </div>
                 ` : ''}
+                ${data.metrics.compression && data.metrics.compression !== 'none' ? `
+                <div class="col-md-6">
+                    <div class="metric-card">
+                        <div class="metric-value">${data.metrics.compression_ratio.toFixed(2)}x</div>
+                        <div class="metric-label">Compression (${data.metrics.compression})</div>
+                    </div>
+                </div>
+                ` : ''}
                 <div class="col-md-6">
                     <div class="metric-card">
                         <div class="metric-value">${data.metrics.cpu_usage.toFixed(1)}%</div>
@@ -283,6 +328,14 @@ function createEmbedResultsHTML(data) {
                         <div class="metric-label">Memory (MB)</div>
                     </div>
                 </div>
+                ${data.metrics.peak_memory != null ? `
+                <div class="col-md-6">
+                    <div class="metric-card">
+                        <div class="metric-value">${data.metrics.peak_memory.toFixed(1)}</div>
+                        <div class="metric-label">Peak Memory (MB)</div>
+                    </div>
+                </div>
+                ` : ''}
             </div>
         </div>
 
@@ -326,6 +379,14 @@ function createExtractResultsHTML(data) {
                         <div class="metric-label">Memory (MB)</div>
                     </div>
                 </div>
+                ${data.metrics.peak_memory != null ? `
+                <div class="col-md-6">
+                    <div class="metric-card">
+                        <div class="metric-value">${data.metrics.peak_memory.toFixed(1)}</div>
+                        <div class="metric-label">Peak Memory (MB)</div>
+                    </div>
+                </div>
+                ` : ''}
             </div>
         </div>
     `;
@@ -348,25 +409,29 @@ function createEmbedResultsHTML(data) {
             <h6><i class="fas fa-check-circle"></i> Message Embedded Successfully!</h6>
         </div>
 
-        ${data.stego_image ? `
+        ${data.stego_image_url ? `
         <div class="mb-3">
             <h6><i class="fas fa-image"></i> Stego Image</h6>
-            <img src="data:image/png;base64,${data.stego_image}" class="stego-image img-fluid">
+            <img src="${data.stego_image_url}" class="stego-image img-fluid">
             <div class="mt-2">
-                <small class="text-muted">Right-click and "Save image as" to download</small>
+                <a href="${data.stego_image_url}" download="stego_image.png" class="btn btn-sm btn-outline-primary">
+                    <i class="fas fa-download"></i> Download PNG
+                </a>
             </div>
         </div>
         ` : ''}
 
-        ${data.stego_audio ? `
+        ${data.stego_audio_url ? `
         <div class="mb-3">
             <h6><i class="fas fa-music"></i> Stego Audio</h6>
             <audio controls class="w-100">
-                <source src="data:audio/wav;base64,${data.stego_audio}" type="audio/wav">
+                <source src="${data.stego_audio_url}" type="audio/wav">
                 Your browser does not support the audio element.
             </audio>
             <div class="mt-2">
-                <small class="text-muted">Right-click and "Save audio as" to download</small>
+                <a href="${data.stego_audio_url}" download="stego_audio.wav" class="btn btn-sm btn-outline-primary">
+                    <i class="fas fa-download"></i> Download WAV
+                </a>
             </div>
         </div>
         ` : ''}
@@ -498,6 +563,14 @@ function createEmbedResultsHTML(data) {
                     </div>
                 </div>
                 ` : ''}
+                ${data.metrics.ssim ? `
+                <div class="col-md-6">
+                    <div class="metric-card">
+                        <div class="metric-value">${data.metrics.ssim.toFixed(4)}</div>
+                        <div class="metric-label">SSIM</div>
+                    </div>
+                </div>
+                ` : ''}
 
                 <!-- Capacity Metrics -->
                 <div class="col-md-12 mb-2 mt-2">
@@ -525,6 +598,14 @@ function createEmbedResultsHTML(data) {
                     </div>
                 </div>
                 ` : ''}
+                ${data.metrics.compression && data.metrics.compression !== 'none' ? `
+                <div class="col-md-4">
+                    <div class="metric-card">
+                        <div class="metric-value">${data.metrics.compression_ratio.toFixed(2)}x</div>
+                        <div class="metric-label">Compression (${data.metrics.compression}, ${data.metrics.compression_time.toFixed(2)} ms)</div>
+                    </div>
+                </div>
+                ` : ''}
 
                 <!-- Size Metrics -->
                 <div class="col-md-12 mb-2 mt-2">
@@ -559,6 +640,14 @@ function createEmbedResultsHTML(data) {
                         <div class="metric-label">Memory (MB)</div>
                     </div>
                 </div>
+                ${data.metrics.peak_memory != null ? `
+                <div class="col-md-6">
+                    <div class="metric-card">
+                        <div class="metric-value">${data.metrics.peak_memory.toFixed(1)}</div>
+                        <div class="metric-label">Peak Memory (MB)</div>
+                    </div>
+                </div>
+                ` : ''}
             </div>
         </div>
 
@@ -623,6 +712,14 @@ function createExtractResultsHTML(data) {
                         <div class="metric-label">Memory (MB)</div>
                     </div>
                 </div>
+                ${data.metrics.peak_memory != null ? `
+                <div class="col-md-6">
+                    <div class="metric-card">
+                        <div class="metric-value">${data.metrics.peak_memory.toFixed(1)}</div>
+                        <div class="metric-label">Peak Memory (MB)</div>
+                    </div>
+                </div>
+                ` : ''}
             </div>
         </div>
     `;
@@ -1,9 +1,16 @@
 import base64
 import tempfile
 import os
+import shutil
 import time
 import math
+import atexit
+import itertools
+import multiprocessing
+import random
 import struct
+import lzma
+import zlib
 import numpy as np
 from PIL import Image
 import wave
@@ -14,7 +21,17 @@ import psutil
 from io import BytesIO
 import cv2
 import bisect
-from typing import Tuple
+from collections import deque
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from analysis import ANALYSIS_LEVELS, analyze_ciphertext, byte_statistics, calculate_entropy
+from bitstream import BitStream, ChunkedBitReader, ChunkedPayload
+from covercache import Cover, CoverCache, PayloadCache, content_digest
+from container import (CODEC_PVD, CODEC_VIDEO_PVD, CODEC_WAV_LSB, HEADER_BITS, HEADER_SIZE, check_header,
+                       pack_header, parse_header, parse_shard)
+from metrics import ENGINE_MISMATCHES, ENGINE_RUNS, PAYLOAD_BITS, stage_timer, system_metrics
+from pngrows import PNG_SIGNATURE, PNGRows
 
 # ---------------- PVD Steganography Functions ----------------
 def embending(n: int) -> Tuple[int, int, int]:
@@ -153,6 +170,895 @@ def pvd_unstore(img_array: np.ndarray) -> bytes:
     
     return b''
 
+# ---------------- Vectorized PVD Engine ----------------
+# Array implementation of pvd_store/pvd_unstore. With legacy=True it
+# reproduces the reference functions bit for bit, including the uint8
+# wrap-around of change_diff when it is fed numpy scalars, so images written
+# by either engine read back identically.
+#
+# That wrap-around can move a pair into another range, so legacy images do
+# not always read back. Container payloads (legacy=False) use anchored pairs
+# instead: a pair keeps q = min + dif // 2 and becomes
+# (q - new_dif // 2, q - new_dif // 2 + new_dif), and is used only if the top
+# of its range fits in 0..255. q and the range survive embedding, so the
+# extractor sees the same pair widths as the embedder.
+PVD_RANGES = (0, 2, 4, 8, 12, 16, 24, 32, 48, 64, 96, 128, 192, 256)
+PVD_BAND_PAIRS = 1 << 18  # pixel pairs processed per row band
+
+def _build_pvd_range_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    ranges = np.array(PVD_RANGES, dtype=np.int32)
+    idx = np.searchsorted(ranges, np.arange(256), side='right') - 1
+    lower = ranges[idx]
+    upper = ranges[idx + 1]
+    width = np.log2(upper - lower).astype(np.int32)
+    return lower, width, upper - 1
+
+PVD_LOWER, PVD_WIDTH, PVD_MAXR = _build_pvd_range_tables()
+
+def _change_diff_vec(diff: np.ndarray, first: np.ndarray, second: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized change_diff with the reference's uint8 semantics"""
+    diff = diff & 255
+    swap = first > second
+    l = np.minimum(first, second)
+    r = np.maximum(first, second)
+
+    ost = diff & 1
+    floor = diff >> 1
+    l = (l - floor) & 255
+    r = (r + floor) & 255
+
+    ok = ~((ost > 0) & (l == 0) & (r == 255))
+
+    take_l = (ost > 0) & (l > 255 - r)
+    l = np.where(take_l, l - ost, l)
+    r = np.where(take_l, r, (r + ost) & 255)
+
+    return ok, np.where(swap, r, l), np.where(swap, l, r)
+
+def _build_pvd_pair_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """256x256 range, width and feasibility tables indexed by (first, second) pixel value"""
+    first, second = np.meshgrid(np.arange(256), np.arange(256), indexing='ij')
+    dif = np.abs(first - second)
+    ok, _, _ = _change_diff_vec(PVD_MAXR[dif] - dif, first, second)
+    return PVD_LOWER[dif].astype(np.uint8), np.where(ok, PVD_WIDTH[dif], 0).astype(np.uint8), ok
+
+PVD_PAIR_LOWER, PVD_PAIR_WIDTH, PVD_PAIR_OK = _build_pvd_pair_tables()
+
+def _anchor_pair_values(new_dif: np.ndarray, first: np.ndarray, second: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pixel values giving new_dif around the pair's anchor, in the original order"""
+    anchor = np.minimum(first, second) + np.abs(first - second) // 2
+    low = anchor - new_dif // 2
+    high = low + new_dif
+    swap = first > second
+    return np.where(swap, high, low), np.where(swap, low, high)
+
+def _build_pvd_anchor_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """256x256 width and feasibility tables of anchored pairs"""
+    first, second = np.meshgrid(np.arange(256), np.arange(256), indexing='ij')
+    dif = np.abs(first - second)
+    low, high = _anchor_pair_values(PVD_MAXR[dif], np.minimum(first, second), np.maximum(first, second))
+    ok = (low >= 0) & (high <= 255)
+    return np.where(ok, PVD_WIDTH[dif], 0).astype(np.uint8), ok
+
+PVD_ANCHOR_WIDTH, PVD_ANCHOR_OK = _build_pvd_anchor_tables()
+
+def _pvd_payload_stream(secret_data: bytes) -> BitStream:
+    """Bits written by pvd_store: 32-bit length header followed by the payload"""
+    body = BitStream.from_bytes(secret_data, legacy_pvd=True)
+    stream = BitStream()
+    stream.write_uint(len(body), 32)
+    stream.write_bits(body.bits)
+    return stream
+
+def _pvd_band_views(img: np.ndarray, r0: int, r1: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    return img[r0:r1, 0:width:2, :3], img[r0:r1, 1:width:2, :3]
+
+def _pvd_pair_usage(first: np.ndarray, second: np.ndarray, legacy: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Difference, bit width and feasibility for each pixel pair"""
+    widths, ok = (PVD_PAIR_WIDTH, PVD_PAIR_OK) if legacy else (PVD_ANCHOR_WIDTH, PVD_ANCHOR_OK)
+    dif = np.abs(first - second)
+    pair = (first << 8) | second
+    return dif, np.take(widths.ravel(), pair).astype(np.int32), np.take(ok.ravel(), pair)
+
+def pvd_store_vectorized(img_array: np.ndarray, secret_data: bytes, progress=None, workers: Optional[int] = None) -> np.ndarray:
+    """Vectorized PVD embedding, bit-identical to pvd_store.
+
+    progress, if given, is called as progress(bits_embedded, bits_total) after
+    each row band. Large payloads go to pvd_store_parallel when workers (or
+    STEGO_PVD_WORKERS) is above 1.
+    """
+    return _pvd_store_stream(img_array, _pvd_payload_stream(secret_data), True, progress, workers)
+
+def _pvd_store_stream(img_array: np.ndarray, data: BitStream, legacy: bool, progress=None,
+                      workers: Optional[int] = None, stats: Optional['DistortionStats'] = None,
+                      in_place: bool = False) -> np.ndarray:
+    workers = workers or PVD_WORKERS
+    if stats is not None:
+        stats.samples += img_array.size
+    if workers > 1 and len(data) >= PVD_PARALLEL_MIN_BITS:
+        return _pvd_store_parallel(img_array, data, legacy, workers, progress, stats, in_place)
+
+    img = img_array if in_place else img_array.copy()
+    height, width = img.shape[0], img.shape[1]
+    width -= width % 2
+    if width == 0:
+        return img
+
+    _pvd_embed_rows(img, 0, height, width, data, legacy, progress, stats)
+    return img
+
+def _pvd_embed_rows(img: np.ndarray, row: int, height: int, width: int, data: BitStream, legacy: bool,
+                    progress=None, stats: Optional['DistortionStats'] = None) -> None:
+    """Embed data into rows row..height of img in place, in bands, stopping
+    at the pair that consumes the last bit of data. Changes are added to
+    stats if given."""
+    pairs_per_row = (width // 2) * 3
+    total = len(data)
+    band_rows = max(1, PVD_BAND_PAIRS // pairs_per_row)
+    capacity = 0
+    while row < height and capacity < total:
+        # Every usable pair carries at least one bit, so this many rows is
+        # usually enough to finish the payload
+        needed_rows = -(-(total - capacity) // pairs_per_row)
+        end = min(height, row + min(band_rows, needed_rows))
+        view_a, view_b = _pvd_band_views(img, row, end, width)
+        first = view_a.astype(np.int32).ravel()
+        second = view_b.astype(np.int32).ravel()
+
+        dif, n, ok = _pvd_pair_usage(first, second, legacy)
+        offsets = capacity + np.cumsum(n) - n
+
+        # Stop at the pair that consumes the last payload bit
+        used = len(n)
+        done = np.flatnonzero(offsets + n >= total)
+        if len(done):
+            used = done[0] + 1
+
+        # The last field is zero-padded on the right, as in the reference
+        values = data.read_fields(n[:used])
+
+        new_dif = PVD_LOWER[dif[:used]] + values
+        if legacy:
+            success, new_a, new_b = _change_diff_vec(new_dif - dif[:used], first[:used], second[:used])
+            success &= ok[:used]
+        else:
+            success = ok[:used]
+            new_a, new_b = _anchor_pair_values(new_dif, first[:used], second[:used])
+
+        new_a = np.where(success, new_a, first[:used])
+        new_b = np.where(success, new_b, second[:used])
+        if stats is not None:
+            stats.add(first[:used], new_a)
+            stats.add(second[:used], new_b)
+            stats.rows = max(stats.rows, end)
+        first[:used] = new_a
+        second[:used] = new_b
+        view_a[...] = first.reshape(view_a.shape)
+        view_b[...] = second.reshape(view_b.shape)
+
+        capacity = data.pos
+        row = end
+        if progress is not None:
+            progress(min(capacity, total), total)
+
+def pvd_unstore_vectorized(img_array: np.ndarray, workers: Optional[int] = None) -> bytes:
+    """Vectorized PVD extraction, byte-identical to pvd_unstore.
+
+    Reads the 32-bit length header from the first pairs, then decodes only the
+    rows needed to cover the declared payload. Large payloads go to
+    pvd_unstore_parallel when workers (or STEGO_PVD_WORKERS) is above 1.
+    """
+    workers = workers or PVD_WORKERS
+    if workers > 1 and (_pvd_read_header(img_array) or 0) >= PVD_PARALLEL_MIN_BITS:
+        return pvd_unstore_parallel(img_array, workers)
+
+    img = img_array
+    height, width = img.shape[0], img.shape[1]
+    width -= width % 2
+    pairs_per_row = (width // 2) * 3
+    if pairs_per_row == 0:
+        return b''
+
+    band_rows = max(1, PVD_BAND_PAIRS // pairs_per_row)
+    values, widths = [], []
+    have = 0
+    header_pair = capacity = None
+    target = 32
+    row = 0
+
+    while row < height:
+        end = min(height, row + min(band_rows, -(-max(target - have, 1) // pairs_per_row)))
+        first, second = (v.astype(np.int32).ravel() for v in _pvd_band_views(img, row, end, width))
+        row = end
+
+        dif, n, ok = _pvd_pair_usage(first, second, True)
+        values.append((dif - PVD_LOWER[dif])[ok].astype(np.uint8))
+        widths.append(n[ok].astype(np.uint8))
+        have += int(n.sum())
+
+        if header_pair is None:
+            if have < 32:
+                continue
+            all_widths = np.concatenate(widths)
+            header_pair = int(np.searchsorted(np.cumsum(all_widths), 32))
+            header = BitStream()
+            header.write_fields(np.concatenate(values)[:header_pair + 1], all_widths[:header_pair + 1])
+            capacity = header.read_uint(32)
+            print(f"PVD Extraction: Data length from header: {capacity} bits")
+            target = capacity + 32
+
+        if have < target:
+            continue
+
+        # The reference finishes on the first pair after the header pair that
+        # brings the body up to the declared length
+        all_values = np.concatenate(values)
+        all_widths = np.concatenate(widths)
+        cum = np.cumsum(all_widths, dtype=np.int64)
+        last = header_pair + 1 + int(np.searchsorted(cum[header_pair + 1:], target))
+        if last >= len(cum):
+            continue
+
+        stream = BitStream()
+        stream.write_fields(all_values[:last], all_widths[:last])
+        body_len = int(cum[last - 1]) - 32
+        if cum[last] - 32 > capacity:
+            # Final field: leading zeros stripped, then zero-filled to the remainder
+            tail = int(all_values[last])
+            width = max(tail.bit_length(), capacity - body_len)
+        else:
+            tail, width = int(all_values[last]), int(all_widths[last])
+        stream.write_uint(tail, width)
+
+        stream.pos = 32
+        extracted_bytes = BitStream(stream.read_bits(capacity)).to_bytes(legacy_pvd=True)
+        print(f"PVD Extraction: Successfully extracted {len(extracted_bytes)} bytes")
+        return extracted_bytes
+
+    return b''
+
+# ---------------- Parallel PVD Engine ----------------
+# A pair's capacity depends only on its own pixel values, so per-row
+# capacities prefix-summed over the rows give every row band its exact bit
+# offset into the payload. Bands are then embedded or decoded independently
+# by a process pool working on the image in shared memory. Output is
+# identical to the sequential engine.
+PVD_WORKERS = int(os.environ.get('STEGO_PVD_WORKERS', 1))
+PVD_PARALLEL_MIN_BITS = 1 << 20  # smaller payloads stay on the sequential path
+
+_pvd_pool = None
+_pvd_pool_workers = 0
+
+def _get_pvd_pool(workers: int) -> ProcessPoolExecutor:
+    global _pvd_pool, _pvd_pool_workers
+    if _pvd_pool is None or _pvd_pool_workers != workers:
+        if _pvd_pool is not None:
+            _pvd_pool.shutdown(wait=False)
+        # spawn rather than fork: the web process runs threads
+        _pvd_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        _pvd_pool_workers = workers
+    return _pvd_pool
+
+@atexit.register
+def _shutdown_pvd_pool():
+    if _pvd_pool is not None:
+        _pvd_pool.shutdown(wait=False, cancel_futures=True)
+
+def _split_rows(start: int, stop: int, parts: int) -> List[Tuple[int, int]]:
+    bounds = np.linspace(start, stop, max(1, min(parts, stop - start)) + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+def _attach_image(shm_name: str, shape: Tuple[int, ...]) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    return shm, np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+def _pvd_row_capacity_task(shm_name: str, shape: Tuple[int, ...], r0: int, r1: int, legacy: bool) -> np.ndarray:
+    shm, img = _attach_image(shm_name, shape)
+    try:
+        return pvd_row_capacity(img[r0:r1], legacy)
+    finally:
+        del img
+        shm.close()
+
+def _pvd_row_offsets(pool: ProcessPoolExecutor, shm_name: str, shape: Tuple[int, ...], legacy: bool, workers: int) -> np.ndarray:
+    """Bit offset of the start of every row, plus the total capacity at the end"""
+    chunks = _split_rows(0, shape[0], workers)
+    futures = [pool.submit(_pvd_row_capacity_task, shm_name, shape, r0, r1, legacy) for r0, r1 in chunks]
+    row_bits = np.concatenate([f.result() for f in futures])
+    return np.concatenate(([0], np.cumsum(row_bits)))
+
+def _pvd_store_band_task(shm_name: str, shape: Tuple[int, ...], payload_offset: int, legacy: bool,
+                         r0: int, r1: int, bit_start: int, bit_end: int) -> Tuple[int, int, int, int]:
+    shm, img = _attach_image(shm_name, shape)
+    try:
+        # Unpack only this band's slice of the packed payload
+        lo, hi = bit_start // 8, -(-bit_end // 8)
+        packed = np.ndarray(hi - lo, dtype=np.uint8, buffer=shm.buf, offset=payload_offset + lo)
+        bits = np.unpackbits(packed)[bit_start - lo * 8:bit_end - lo * 8]
+        stats = DistortionStats()
+        _pvd_embed_rows(img, r0, r1, shape[1] - shape[1] % 2, BitStream(bits), legacy, stats=stats)
+        return len(bits), stats.changed, stats.sse, stats.rows
+    finally:
+        del img
+        shm.close()
+
+def pvd_store_parallel(img_array: np.ndarray, secret_data: bytes, workers: Optional[int] = None, progress=None) -> np.ndarray:
+    """pvd_store_vectorized spread over a pool of worker processes"""
+    return _pvd_store_parallel(img_array, _pvd_payload_stream(secret_data), True, workers or PVD_WORKERS, progress)
+
+def _pvd_store_parallel(img_array: np.ndarray, data: BitStream, legacy: bool, workers: int,
+                        progress=None, stats: Optional['DistortionStats'] = None, in_place: bool = False) -> np.ndarray:
+    height, width = img_array.shape[0], img_array.shape[1]
+    if width - width % 2 == 0:
+        return img_array if in_place else img_array.copy()
+
+    total = len(data)
+    packed = np.packbits(data.bits)
+    img = np.ascontiguousarray(img_array)
+    shm = shared_memory.SharedMemory(create=True, size=img.nbytes + len(packed))
+    try:
+        shared = np.ndarray(img.shape, dtype=np.uint8, buffer=shm.buf)
+        shared[...] = img
+        shm.buf[img.nbytes:img.nbytes + len(packed)] = packed.tobytes()
+
+        pool = _get_pvd_pool(workers)
+        offsets = _pvd_row_offsets(pool, shm.name, img.shape, legacy, workers)
+        # Rows past the one holding the last payload bit are left untouched
+        last_row = min(height, int(np.searchsorted(offsets, total)))
+        futures = [
+            pool.submit(_pvd_store_band_task, shm.name, img.shape, img.nbytes, legacy,
+                        r0, r1, int(offsets[r0]), int(min(offsets[r1], total)))
+            for r0, r1 in _split_rows(0, last_row, workers * 4)
+        ]
+        done = 0
+        for future in futures:
+            bits, changed, sse, rows = future.result()
+            done += bits
+            if stats is not None:
+                stats.record(changed, sse)
+                stats.rows = max(stats.rows, rows)
+            if progress is not None:
+                progress(min(done, total), total)
+
+        if in_place:
+            img_array[:last_row] = shared[:last_row]
+            result = img_array
+        else:
+            result = shared.copy()
+        del shared
+        return result
+    finally:
+        shm.close()
+        shm.unlink()
+
+def _pvd_unstore_band_task(shm_name: str, shape: Tuple[int, ...], out_name: str, out_bits: int, legacy: bool,
+                           r0: int, r1: int, bit_offset: int) -> None:
+    shm, img = _attach_image(shm_name, shape)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    try:
+        views = _pvd_band_views(img, r0, r1, shape[1] - shape[1] % 2)
+        first, second = (v.astype(np.int32).ravel() for v in views)
+        dif, n, ok = _pvd_pair_usage(first, second, legacy)
+        stream = BitStream()
+        stream.write_fields((dif - PVD_LOWER[dif])[ok], n[ok])
+        out = np.ndarray(out_bits, dtype=np.uint8, buffer=out_shm.buf)
+        out[bit_offset:bit_offset + len(stream)] = stream.bits
+        del out
+    finally:
+        del img, views
+        shm.close()
+        out_shm.close()
+
+def _pvd_decode_rows_parallel(img_array: np.ndarray, nbits: int, legacy: bool, workers: int) -> Optional[Tuple[np.ndarray, np.ndarray, int]]:
+    """Bits of every row up to the one holding bit nbits - 1, decoded in the
+    pool, with the row bit offsets and that row count; None if the image
+    carries fewer than nbits bits"""
+    img = np.ascontiguousarray(img_array)
+    shm = shared_memory.SharedMemory(create=True, size=img.nbytes)
+    out_shm = None
+    try:
+        shared = np.ndarray(img.shape, dtype=np.uint8, buffer=shm.buf)
+        shared[...] = img
+        del shared
+
+        pool = _get_pvd_pool(workers)
+        offsets = _pvd_row_offsets(pool, shm.name, img.shape, legacy, workers)
+        if offsets[-1] < nbits:
+            return None
+        rows = int(np.searchsorted(offsets, nbits))
+        out_bits = int(offsets[rows])
+        out_shm = shared_memory.SharedMemory(create=True, size=out_bits)
+        futures = [
+            pool.submit(_pvd_unstore_band_task, shm.name, img.shape, out_shm.name, out_bits, legacy,
+                        r0, r1, int(offsets[r0]))
+            for r0, r1 in _split_rows(0, rows, workers * 4)
+        ]
+        for future in futures:
+            future.result()
+        return np.ndarray(out_bits, dtype=np.uint8, buffer=out_shm.buf).copy(), offsets, rows
+    finally:
+        shm.close()
+        shm.unlink()
+        if out_shm is not None:
+            out_shm.close()
+            out_shm.unlink()
+
+def _pvd_read_bits(img_array: np.ndarray, nbits: int, legacy: bool, workers: int = 1) -> Optional[np.ndarray]:
+    """First nbits bits carried by the image, or None if it carries fewer"""
+    if workers > 1 and nbits >= PVD_PARALLEL_MIN_BITS:
+        decoded = _pvd_decode_rows_parallel(img_array, nbits, legacy, workers)
+        return None if decoded is None else decoded[0][:nbits]
+
+    height, width = img_array.shape[0], img_array.shape[1]
+    width -= width % 2
+    pairs_per_row = (width // 2) * 3
+    if pairs_per_row == 0:
+        return None
+
+    band_rows = max(1, PVD_BAND_PAIRS // pairs_per_row)
+    stream = BitStream()
+    have = row = 0
+    while have < nbits and row < height:
+        end = min(height, row + min(band_rows, -(-(nbits - have) // pairs_per_row)))
+        first, second = (v.astype(np.int32).ravel() for v in _pvd_band_views(img_array, row, end, width))
+        dif, n, ok = _pvd_pair_usage(first, second, legacy)
+        stream.write_fields((dif - PVD_LOWER[dif])[ok], n[ok])
+        have += int(n.sum())
+        row = end
+    return stream.bits[:nbits] if have >= nbits else None
+
+def _pvd_read_header(img_array: np.ndarray) -> Optional[int]:
+    """Legacy 32-bit length header of a PVD stego image, or None if the image is too small"""
+    bits = _pvd_read_bits(img_array, 32, True)
+    return None if bits is None else BitStream(bits).read_uint(32)
+
+def pvd_unstore_parallel(img_array: np.ndarray, workers: Optional[int] = None) -> bytes:
+    """pvd_unstore_vectorized spread over a pool of worker processes"""
+    workers = workers or PVD_WORKERS
+    width = img_array.shape[1] - img_array.shape[1] % 2
+    capacity = _pvd_read_header(img_array) if width else None
+    if capacity is None:
+        return b''
+    if capacity <= int(PVD_PAIR_WIDTH.max()):
+        # Payload ends inside the header pair's neighbourhood
+        return pvd_unstore_vectorized(img_array, workers=1)
+    print(f"PVD Extraction: Data length from header: {capacity} bits")
+    target = capacity + 32
+
+    decoded = _pvd_decode_rows_parallel(img_array, target, True, workers)
+    if decoded is None:
+        return b''
+    bits, offsets, rows = decoded
+
+    # Locate the field that crosses the declared length, as pvd_unstore does
+    first, second = (v.astype(np.int32).ravel() for v in _pvd_band_views(img_array, rows - 1, rows, width))
+    dif, n, ok = _pvd_pair_usage(first, second, True)
+    field_values, field_widths = (dif - PVD_LOWER[dif])[ok], n[ok]
+    ends = int(offsets[rows - 1]) + np.cumsum(field_widths)
+    last = int(np.searchsorted(ends, target))
+    end = int(ends[last])
+    start = end - int(field_widths[last])
+
+    stream = BitStream(bits[32:start])
+    tail = int(field_values[last])
+    if end - 32 > capacity:
+        # Final field: leading zeros stripped, then zero-filled to the remainder
+        stream.write_uint(tail, max(tail.bit_length(), capacity - (start - 32)))
+    else:
+        stream.write_uint(tail, end - start)
+
+    extracted_bytes = BitStream(stream.read_bits(capacity)).to_bytes(legacy_pvd=True)
+    print(f"PVD Extraction: Successfully extracted {len(extracted_bytes)} bytes")
+    return extracted_bytes
+
+# ---------------- Reference PVD Engine ----------------
+# Pair-by-pair implementation of the container codec (anchored pairs) in
+# plain Python, written for clarity rather than speed. It is the oracle the
+# vectorized and parallel engines are checked against.
+def _anchored_pair(a: int, b: int) -> Optional[Tuple[int, int, int]]:
+    """Anchor, range lower bound and bit width of a pair, or None if the top
+    of its range does not fit around the anchor"""
+    dif = abs(a - b)
+    lower, n, maxr = embending(dif)
+    anchor = min(a, b) + dif // 2
+    low = anchor - maxr // 2
+    if low < 0 or low + maxr > 255:
+        return None
+    return anchor, lower, n
+
+def pvd_store_reference(img_array: np.ndarray, data, progress=None,
+                        stats: Optional['DistortionStats'] = None, in_place: bool = False) -> np.ndarray:
+    """Embed the bits of data (a BitStream or ChunkedBitReader) as the
+    vectorized engine does with legacy=False"""
+    img = img_array if in_place else img_array.copy()
+    height, width = img.shape[0], img.shape[1]
+    width -= width % 2
+    total = len(data)
+    changed = sse = 0
+    if stats is not None:
+        stats.samples += img.size
+
+    i = 0
+    while i < height and data.remaining:
+        row = img[i].tolist()
+        for j in range(0, width, 2):
+            for k in range(3):  # RGB channels
+                a, b = row[j][k], row[j + 1][k]
+                pair = _anchored_pair(a, b)
+                if pair is None:
+                    continue
+                anchor, lower, n = pair
+
+                # The last field is zero-padded on the right
+                take = min(n, data.remaining)
+                new_dif = lower + (data.read_uint(take) << (n - take))
+                low = anchor - new_dif // 2
+                new_a, new_b = (low + new_dif, low) if a > b else (low, low + new_dif)
+
+                changed += (new_a != a) + (new_b != b)
+                sse += (new_a - a) ** 2 + (new_b - b) ** 2
+                row[j][k], row[j + 1][k] = new_a, new_b
+                if not data.remaining:
+                    break
+            if not data.remaining:
+                break
+        img[i] = row
+        i += 1
+        if progress is not None:
+            progress(total - data.remaining, total)
+
+    if stats is not None:
+        stats.record(changed, sse)
+        stats.rows = max(stats.rows, i)
+    return img
+
+def pvd_read_bits_reference(img_array: np.ndarray, nbits: int) -> Optional[np.ndarray]:
+    """First nbits container bits carried by the image, or None if it carries fewer"""
+    height, width = img_array.shape[0], img_array.shape[1]
+    width -= width % 2
+    bits = []
+    for i in range(height):
+        if len(bits) >= nbits:
+            break
+        row = img_array[i].tolist()
+        for j in range(0, width, 2):
+            for k in range(3):  # RGB channels
+                a, b = row[j][k], row[j + 1][k]
+                pair = _anchored_pair(a, b)
+                if pair is None:
+                    continue
+                _, lower, n = pair
+                value = abs(a - b) - lower
+                bits.extend((value >> shift) & 1 for shift in range(n - 1, -1, -1))
+    return np.array(bits[:nbits], dtype=np.uint8) if len(bits) >= nbits else None
+
+# ---------------- Codec Engines ----------------
+# Each carrier codec has interchangeable engines that must produce identical
+# output:
+#   image: reference (pure Python), vectorized, parallel (process pool)
+#   audio: reference (pure Python), vectorized
+# The engine is chosen per call, else by STEGO_IMAGE_ENGINE or
+# STEGO_AUDIO_ENGINE. 'auto' picks the parallel image engine only for
+# payloads of PVD_PARALLEL_MIN_BITS or more on carriers tall enough to split
+# between the workers, and the vectorized engine otherwise. When
+# STEGO_ENGINE_VERIFY is a fraction above 0, that share of calls is re-run
+# on the reference engine and any difference raises EngineMismatch.
+# Streamed payloads can only be read once, so they are never re-run and
+# engines that need the whole payload fall back to the vectorized one.
+REFERENCE_ENGINE = 'reference'
+IMAGE_ENGINE = os.environ.get('STEGO_IMAGE_ENGINE', 'auto')
+AUDIO_ENGINE = os.environ.get('STEGO_AUDIO_ENGINE', 'auto')
+ENGINE_VERIFY_RATE = float(os.environ.get('STEGO_ENGINE_VERIFY', 0))
+
+class CodecEngine(NamedTuple):
+    name: str
+    embed: Callable
+    read: Callable
+    streams: bool  # embed accepts a ChunkedBitReader or ChunkedPayload
+
+class EngineMismatch(AssertionError):
+    pass
+
+ENGINES: Dict[str, Dict[str, CodecEngine]] = {'image': {}, 'audio': {}}
+
+def register_engine(carrier: str, name: str, embed: Callable, read: Callable, streams: bool = False) -> None:
+    """Add an engine for carrier ('image' or 'audio'); image engines take
+    embed(img, data, progress, stats, in_place, workers) and
+    read(img, nbits, workers), audio engines embed(samples, chunks) and
+    read(samples)"""
+    ENGINES[carrier][name] = CodecEngine(name, embed, read, streams)
+
+def engine_names(carrier: str) -> Tuple[str, ...]:
+    return ('auto',) + tuple(ENGINES[carrier])
+
+def _parallel_workers(workers: Optional[int] = None) -> int:
+    workers = workers or PVD_WORKERS
+    return workers if workers > 1 else max(2, os.cpu_count() or 1)
+
+def select_engine(carrier: str, name: Optional[str] = None, payload_bits: int = 0, carrier_size: int = 0,
+                  streamed: bool = False, workers: Optional[int] = None) -> CodecEngine:
+    """Engine for a call; name None uses the configured default. carrier_size
+    is in image rows or audio samples."""
+    name = name or (IMAGE_ENGINE if carrier == 'image' else AUDIO_ENGINE)
+    if name == 'auto':
+        workers = workers or PVD_WORKERS
+        parallel = (carrier == 'image' and not streamed and workers > 1 and
+                    payload_bits >= PVD_PARALLEL_MIN_BITS and carrier_size >= 2 * workers)
+        name = 'parallel' if parallel else 'vectorized'
+    engine = ENGINES[carrier].get(name)
+    if engine is None:
+        raise ValueError(f"Unknown {carrier} engine '{name}', expected one of: {', '.join(engine_names(carrier))}")
+    if streamed and not engine.streams:
+        engine = ENGINES[carrier]['vectorized']
+    ENGINE_RUNS.inc(carrier=carrier, engine=engine.name)
+    return engine
+
+def _verify_sampled(engine: CodecEngine) -> bool:
+    return engine.name != REFERENCE_ENGINE and ENGINE_VERIFY_RATE > 0 and random.random() < ENGINE_VERIFY_RATE
+
+def _check_engine(carrier: str, engine: CodecEngine, op: str, matches: bool) -> None:
+    if not matches:
+        ENGINE_MISMATCHES.inc(carrier=carrier, engine=engine.name)
+        print(f"Engine check: {carrier} engine '{engine.name}' {op} output differs from the reference engine")
+        raise EngineMismatch(f"{carrier} engine '{engine.name}' {op} output differs from the reference engine")
+
+def _pvd_vectorized_embed(img, data, progress=None, stats=None, in_place=False, workers=None):
+    return _pvd_store_stream(img, data, False, progress, 1, stats, in_place)
+
+def _pvd_parallel_embed(img, data, progress=None, stats=None, in_place=False, workers=None):
+    if stats is not None:
+        stats.samples += img.size
+    return _pvd_store_parallel(img, data, False, _parallel_workers(workers), progress, stats, in_place)
+
+def _pvd_reference_embed(img, data, progress=None, stats=None, in_place=False, workers=None):
+    return pvd_store_reference(img, data, progress, stats, in_place)
+
+def _pvd_parallel_read(img, nbits, workers=None):
+    decoded = _pvd_decode_rows_parallel(img, nbits, False, _parallel_workers(workers))
+    return None if decoded is None else decoded[0][:nbits]
+
+register_engine('image', REFERENCE_ENGINE, _pvd_reference_embed,
+                lambda img, nbits, workers=None: pvd_read_bits_reference(img, nbits), streams=True)
+register_engine('image', 'vectorized', _pvd_vectorized_embed,
+                lambda img, nbits, workers=None: _pvd_read_bits(img, nbits, False), streams=True)
+register_engine('image', 'parallel', _pvd_parallel_embed, _pvd_parallel_read)
+
+def _pvd_engine_read(img_array: np.ndarray, nbits: int, engine: Optional[str] = None,
+                     workers: Optional[int] = None) -> Optional[np.ndarray]:
+    """_pvd_read_bits of container bits through the selected engine"""
+    chosen = select_engine('image', engine, nbits, img_array.shape[0], workers=workers)
+    bits = chosen.read(img_array, nbits, workers)
+    if _verify_sampled(chosen):
+        expected = ENGINES['image'][REFERENCE_ENGINE].read(img_array, nbits)
+        _check_engine('image', chosen, 'extract', (bits is None and expected is None) or
+                      (bits is not None and expected is not None and np.array_equal(bits, expected)))
+    return bits
+
+# ---------------- Stego Container ----------------
+# New payloads are written as a container header followed by the payload
+# bits, with no padding quirks. Extraction reads the header first and falls
+# back to the legacy formats only when no container is found.
+def _pvd_max_bits(img_array: np.ndarray) -> int:
+    """Upper bound on the bits an image can carry, from its shape alone"""
+    return _pvd_max_bits_for(img_array.shape)
+
+def _pvd_max_bits_for(shape: Tuple[int, ...]) -> int:
+    pairs = shape[0] * (shape[1] // 2) * min(3, shape[2])
+    return pairs * int(PVD_PAIR_WIDTH.max())
+
+def pvd_embed(img_array: np.ndarray, payload: bytes, progress=None, workers: Optional[int] = None,
+              stats: Optional['DistortionStats'] = None, in_place: bool = False,
+              engine: Optional[str] = None) -> np.ndarray:
+    """Embed payload in a stego container with the selected PVD engine.
+    Distortion is accumulated into stats if given. With in_place=True the
+    pixels of img_array are overwritten instead of copied. A ChunkedPayload
+    is pulled band by band on a streaming engine."""
+    streamed = isinstance(payload, ChunkedPayload)
+    if streamed:
+        chunks = itertools.chain([pack_header(CODEC_PVD, len(payload))], payload)
+        data = ChunkedBitReader(chunks, HEADER_BITS + len(payload) * 8)
+    else:
+        data = BitStream()
+        data.write_bytes(pack_header(CODEC_PVD, len(payload)))
+        data.write_bytes(payload)
+
+    chosen = select_engine('image', engine, len(data), img_array.shape[0], streamed, workers)
+    verify = not streamed and _verify_sampled(chosen)
+    cover = img_array.copy() if verify and in_place else img_array
+    stego = chosen.embed(img_array, data, progress, stats, in_place, workers)
+    if verify:
+        expected = ENGINES['image'][REFERENCE_ENGINE].embed(cover, BitStream(data.bits))
+        _check_engine('image', chosen, 'embed', np.array_equal(stego, expected))
+    return stego
+
+def pvd_extract(img_array: np.ndarray, workers: Optional[int] = None, engine: Optional[str] = None) -> bytes:
+    """Payload of a PVD stego image: container first, then the legacy format.
+
+    Carriers holding neither are rejected after decoding HEADER_BITS bits.
+    """
+    workers = workers or PVD_WORKERS
+    max_bits = _pvd_max_bits(img_array)
+    head = _pvd_read_bits(img_array, HEADER_BITS, False)
+    if head is None:
+        return b''
+
+    header = parse_header(np.packbits(head).tobytes())
+    if header is not None:
+        problem = check_header(header, CODEC_PVD, max_bits)
+        if problem:
+            print(f"PVD Extraction: Rejected container, {problem}")
+            return b''
+        print(f"PVD Extraction: Container v{header.version} with {header.length} bytes")
+        bits = _pvd_engine_read(img_array, HEADER_BITS + header.length * 8, engine, workers)
+        if bits is None:
+            print("PVD Extraction: Image ends before the declared payload")
+            return b''
+        return np.packbits(bits[HEADER_BITS:]).tobytes()
+
+    # Legacy images start with a 32-bit length of a whole number of bytes
+    legacy_bits = _pvd_read_header(img_array) or 0
+    if legacy_bits == 0 or legacy_bits % 8 or 32 + legacy_bits > max_bits:
+        print("PVD Extraction: No stego container or legacy payload found")
+        return b''
+    return pvd_unstore_vectorized(img_array, workers)
+
+def pvd_extract_rows(load_rows, shape: Tuple[int, ...], workers: Optional[int] = None,
+                     engine: Optional[str] = None) -> Optional[bytes]:
+    """pvd_extract over an image whose rows are decoded on demand.
+
+    load_rows(k) returns the first k rows, fewer only where the image ends.
+    Prefixes grow until they cover the container's declared length, so the
+    rows below the payload are never decoded. Returns None for carriers
+    without a container, which need the full-image legacy path.
+    """
+    workers = workers or PVD_WORKERS
+    height = shape[0]
+    pairs_per_row = (shape[1] // 2) * 3
+    if pairs_per_row == 0:
+        return b''
+    max_bits = _pvd_max_bits_for(shape)
+    rows = -(-HEADER_BITS // pairs_per_row)
+    needed = HEADER_BITS
+    header = None
+    while True:
+        img = load_rows(rows)
+        if header is None:
+            bits = _pvd_read_bits(img, needed, False)
+        else:
+            bits = _pvd_engine_read(img, needed, engine, workers)
+        if bits is not None and header is None:
+            header = parse_header(np.packbits(bits).tobytes())
+            if header is None:
+                return None
+            problem = check_header(header, CODEC_PVD, max_bits)
+            if problem:
+                print(f"PVD Extraction: Rejected container, {problem}")
+                return b''
+            print(f"PVD Extraction: Container v{header.version} with {header.length} bytes")
+            needed = HEADER_BITS + header.length * 8
+            bits = _pvd_engine_read(img, needed, engine, workers)
+        if bits is not None:
+            print(f"PVD Extraction: Decoded {img.shape[0]} of {height} rows")
+            return np.packbits(bits[HEADER_BITS:]).tobytes()
+
+        if img.shape[0] < rows or rows >= height:
+            if header is not None:
+                print("PVD Extraction: Image ends before the declared payload")
+            return b''
+        # Grow the prefix by its observed bits per row, at least doubling
+        have = max(1, int(pvd_row_capacity(img).sum()))
+        rows = min(height, max(2 * rows, int(rows * needed / have * 1.05) + 1))
+
+# ---------------- Capacity ----------------
+def pvd_capacity(img_array: np.ndarray, legacy: bool = False) -> Tuple[np.ndarray, int]:
+    """Per-pair bit capacity map (rows x pairs x channels) and total capacity in
+    bits, for container payloads or with legacy=True for the legacy format"""
+    width = img_array.shape[1] - img_array.shape[1] % 2
+    pair = (img_array[:, 0:width:2, :3].astype(np.uint16) << 8) | img_array[:, 1:width:2, :3]
+    capacity_map = np.take((PVD_PAIR_WIDTH if legacy else PVD_ANCHOR_WIDTH).ravel(), pair)
+    return capacity_map, int(capacity_map.sum(dtype=np.int64))
+
+def pvd_row_capacity(img_array: np.ndarray, legacy: bool = False, limit: Optional[int] = None) -> np.ndarray:
+    """Bits each image row can carry, computed in row bands to bound temporaries.
+    With limit, rows after the band where the total reaches limit are left at 0."""
+    height, width = img_array.shape[0], img_array.shape[1]
+    width -= width % 2
+    pairs_per_row = (width // 2) * 3
+    rows = np.zeros(height, dtype=np.int64)
+    if pairs_per_row == 0:
+        return rows
+
+    table = (PVD_PAIR_WIDTH if legacy else PVD_ANCHOR_WIDTH).ravel()
+    band_rows = max(1, PVD_BAND_PAIRS // pairs_per_row)
+    total = 0
+    for r0 in range(0, height, band_rows):
+        r1 = min(height, r0 + band_rows)
+        first, second = _pvd_band_views(img_array, r0, r1, width)
+        pair = first.astype(np.uint16)
+        pair <<= 8
+        pair |= second
+        rows[r0:r1] = np.take(table, pair).sum(axis=(1, 2), dtype=np.int64)
+        total += int(rows[r0:r1].sum())
+        if limit is not None and total >= limit:
+            break
+    return rows
+
+def pvd_payload_bits(secret_data: bytes) -> int:
+    """Number of bits pvd_embed writes for secret_data, header included"""
+    return HEADER_BITS + len(secret_data) * 8
+
+def pvd_max_payload_bytes(capacity_bits: int) -> int:
+    return max(0, (capacity_bits - HEADER_BITS) // 8)
+
+# Bytes of decoded covers and capacity maps kept for reuse; 0 disables the cache
+COVER_CACHE = CoverCache(int(os.environ.get('STEGO_COVER_CACHE_BYTES', 128 * 1024 * 1024)))
+
+def load_cover(image_bytes: Optional[bytes] = None, digest: Optional[str] = None) -> Cover:
+    """Decoded cover and its cumulative row capacity, from COVER_CACHE when the
+    same bytes were seen before. A cover named by digest alone must be cached."""
+    if image_bytes is None:
+        cover = COVER_CACHE.get(digest) if digest else None
+        if cover is None:
+            raise ValueError("Unknown cover_hash, upload the image again")
+        return cover
+
+    digest = content_digest(image_bytes)
+    cover = COVER_CACHE.get(digest)
+    if cover is not None:
+        return cover
+    with stage_timer('decode'):
+        img_array = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img_array is None:
+        raise ValueError("Failed to decode image")
+    return COVER_CACHE.put(Cover(digest, img_array, np.cumsum(pvd_row_capacity(img_array)), False))
+
+def image_capacity(image_bytes) -> Tuple[int, int, Tuple[int, ...]]:
+    """Capacity in bits, largest payload in bytes and shape of an encoded image
+    or a Cover from load_cover"""
+    cover = image_bytes if isinstance(image_bytes, Cover) else load_cover(image_bytes)
+    capacity_bits = int(cover.row_bits[-1]) if len(cover.row_bits) else 0
+    return capacity_bits, pvd_max_payload_bytes(capacity_bits), cover.pixels.shape
+
+def audio_capacity(audio_file) -> Tuple[int, int]:
+    """Capacity in bits and largest payload in bytes of a 16-bit WAV, read from its header"""
+    with wave.open(audio_file, 'rb') as audio:
+        params = audio.getparams()
+    if params.sampwidth != 2:  # 16-bit audio
+        raise ValueError("Only 16-bit WAV files are supported")
+    capacity_bits = params.nframes * params.nchannels  # 1 bit per sample
+    return capacity_bits, max(0, capacity_bits // 8 - HEADER_SIZE)
+
+# ---------------- Memory Estimates ----------------
+# Upper bounds on the bytes a request allocates at its peak, from the carrier
+# header alone, used to admit requests against a memory budget. Row bands
+# cost about PVD_BAND_BYTES_PER_PAIR of temporaries per pixel pair.
+PVD_BAND_BYTES_PER_PAIR = 80
+
+def image_embed_peak_bytes(samples: int, upload_bytes: int, in_place: Optional[bool] = None, ssim: bool = False) -> int:
+    """Peak allocation of embed_data_in_image_bytes for a cover of this many samples"""
+    in_place = IMAGE_IN_PLACE if in_place is None else in_place
+    arrays = 1 if in_place else 2
+    if ssim and in_place:
+        arrays += 1  # worst case: the payload reaches the last row
+    encoded = max(upload_bytes, samples // 2)
+    return upload_bytes + arrays * samples + encoded + PVD_BAND_PAIRS * PVD_BAND_BYTES_PER_PAIR
+
+def image_decode_peak_bytes(samples: int, upload_bytes: int) -> int:
+    """Peak allocation of load_cover: the upload, its pixels and one band of
+    capacity temporaries"""
+    return upload_bytes + samples + PVD_BAND_PAIRS * PVD_BAND_BYTES_PER_PAIR
+
+def image_extract_peak_bytes(samples: int, upload_bytes: int) -> int:
+    """Peak allocation of extract_data_from_image_bytes; the unpacked bit
+    stream holds up to one byte per sample"""
+    return upload_bytes + 2 * samples + 2 * PVD_BAND_PAIRS * PVD_BAND_BYTES_PER_PAIR
+
+def audio_peak_bytes(samples: int, upload_bytes: int) -> int:
+    """Peak allocation of the streaming WAV paths: the upload, the stego
+    output and its serialized copy"""
+    wav_bytes = max(upload_bytes, 2 * samples)
+    return upload_bytes + 2 * wav_bytes
+
 # ---------------- ECC Key Exchange ----------------
 def ecc_generate_keypair():
     private_key = get_random_bytes(32)
@@ -164,6 +1070,8 @@ def ecc_derive_shared_key(private_key, public_key):
     return shared_key[:16]  # AES-128
 
 # ---------------- AES Encryption / Decryption ----------------
+AES_OVERHEAD = 32  # nonce(16) + tag(16) prepended to the ciphertext
+
 def aes_encrypt(message, key):
     cipher = AES.new(key, AES.MODE_EAX)
     ciphertext, tag = cipher.encrypt_and_digest(message.encode('utf-8'))
@@ -189,6 +1097,200 @@ def aes_decrypt(encrypted_data, key):
         print(f"Decryption error: {e}")
         raise ValueError(f"Decryption failed: {str(e)}")
 
+# ---------------- Chunked AES-GCM Payloads ----------------
+# Binary payloads are sealed in chunks (the STREAM construction) so they can
+# be encrypted while the embedder consumes them. Layout:
+#   magic (4) | kind (1) | chunk size (4) | nonce prefix (7)
+#   then per chunk: ciphertext (chunk size, the last may be shorter) | tag (16)
+# Chunk i uses the nonce prefix | i (4) | last-chunk flag (1) and the 16-byte
+# header as associated data, so dropped, reordered or truncated chunks fail
+# authentication. The low nibble of kind is the payload kind and the high
+# nibble the compression applied before sealing. Payloads in the older
+# nonce|tag|ciphertext EAX layout are still accepted by decrypt_payload.
+AEAD_MAGIC = b'SGE1'
+AEAD_CHUNK_SIZE = 64 * 1024
+AEAD_TAG_SIZE = 16
+_AEAD_HEADER = struct.Struct('>4sBI7s')
+
+PAYLOAD_TEXT = 0
+PAYLOAD_BINARY = 1
+
+def aead_encrypted_size(length: int, chunk_size: int = AEAD_CHUNK_SIZE) -> int:
+    """Size of the sealed payload for length plaintext bytes"""
+    chunks = max(1, -(-length // chunk_size))
+    return _AEAD_HEADER.size + length + chunks * AEAD_TAG_SIZE
+
+def _aead_cipher(key, header, index, last):
+    nonce = header[-7:] + struct.pack('>IB', index, last)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(header)
+    return cipher
+
+def aead_encrypt_chunks(source, key, length, kind=PAYLOAD_BINARY, chunk_size=AEAD_CHUNK_SIZE):
+    """Yield the sealed payload for length bytes read from source, a bytes-like
+    object or binary file, one chunk at a time"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        read = lambda offset, size: view[offset:offset + size]
+    else:
+        read = lambda offset, size: source.read(size)
+
+    header = _AEAD_HEADER.pack(AEAD_MAGIC, kind, chunk_size, get_random_bytes(7))
+    yield header
+    chunks = max(1, -(-length // chunk_size))
+    for index in range(chunks):
+        offset = index * chunk_size
+        size = min(chunk_size, length - offset)
+        plain = read(offset, size)
+        if len(plain) != size:
+            raise ValueError(f"Payload source ended before its declared {length} bytes")
+        ciphertext, tag = _aead_cipher(key, header, index, index == chunks - 1).encrypt_and_digest(plain)
+        yield ciphertext
+        yield tag
+
+def aead_payload(source, key, length, kind=PAYLOAD_BINARY) -> ChunkedPayload:
+    """Sealed payload of length bytes from source, encrypted as the carrier consumes it"""
+    return ChunkedPayload(aead_encrypt_chunks(source, key, length, kind), aead_encrypted_size(length))
+
+def _aead_open(data, key) -> Tuple[bytes, int]:
+    """Sealed bytes and raw kind byte of a payload. Raises ValueError if the
+    layout is invalid or any chunk fails to authenticate."""
+    view = memoryview(data)
+    if len(view) < _AEAD_HEADER.size + AEAD_TAG_SIZE:
+        raise ValueError("Sealed payload too short")
+    magic, kind, chunk_size, _ = _AEAD_HEADER.unpack_from(view)
+    if magic != AEAD_MAGIC or chunk_size == 0:
+        raise ValueError("Not a sealed payload")
+    header = bytes(view[:_AEAD_HEADER.size])
+    body = view[_AEAD_HEADER.size:]
+
+    sealed = chunk_size + AEAD_TAG_SIZE
+    chunks = -(-len(body) // sealed)
+    if len(body) - (chunks - 1) * sealed < AEAD_TAG_SIZE:
+        raise ValueError("Sealed payload is truncated")
+    plaintext = bytearray(len(body) - chunks * AEAD_TAG_SIZE)
+    out = memoryview(plaintext)
+    for index in range(chunks):
+        piece = body[index * sealed:(index + 1) * sealed]
+        start = index * chunk_size
+        _aead_cipher(key, header, index, index == chunks - 1).decrypt_and_verify(
+            piece[:-AEAD_TAG_SIZE], piece[-AEAD_TAG_SIZE:], output=out[start:start + len(piece) - AEAD_TAG_SIZE]
+        )
+    return bytes(plaintext), kind
+
+def aead_decrypt(data, key) -> Tuple[bytes, int]:
+    """Plaintext and kind of a sealed payload, decompressed. Raises ValueError
+    if it does not authenticate or decompress."""
+    plaintext, kind = _aead_open(data, key)
+    return decompress_payload(plaintext, kind >> 4), kind & 0x0F
+
+def decrypt_payload(data, key) -> Tuple[bytes, int]:
+    """Plaintext and kind of an extracted payload in either layout, with its
+    tag verified. Raises ValueError if it does not authenticate."""
+    shard = parse_shard(data)
+    if shard is not None:
+        raise ValueError(f"Carrier holds shard {shard[0].index + 1} of {shard[0].count} of a sharded payload, "
+                         f"extract all its carriers together")
+    if bytes(data[:len(AEAD_MAGIC)]) == AEAD_MAGIC:
+        try:
+            plaintext, kind = _aead_open(data, key)
+        except ValueError:
+            pass  # an EAX nonce can start with the magic by chance
+        else:
+            return decompress_payload(plaintext, kind >> 4), kind & 0x0F
+    if len(data) < AES_OVERHEAD:
+        raise ValueError(f"Encrypted data too short: {len(data)} bytes")
+    try:
+        cipher = AES.new(key, AES.MODE_EAX, nonce=data[:16])
+        return cipher.decrypt_and_verify(data[32:], data[16:32]), PAYLOAD_TEXT
+    except ValueError as e:
+        raise ValueError(f"Decryption failed: {str(e)}")
+
+# ---------------- Payload Compression ----------------
+# Messages are compressed before sealing when it pays: payloads under
+# COMPRESS_MIN_SIZE are left alone, raw deflate is tried first and raw LZMA2
+# only when deflate's timing suggests it fits in the remaining budget. The
+# smallest output wins, and COMPRESS_NONE when nothing beats the input. Both
+# streams are headerless since the GCM tag already covers integrity.
+COMPRESS_NONE = 0
+COMPRESS_ZLIB = 1
+COMPRESS_LZMA = 2
+COMPRESSION_NAMES = {COMPRESS_NONE: 'none', COMPRESS_ZLIB: 'zlib', COMPRESS_LZMA: 'lzma'}
+
+COMPRESS_MIN_SIZE = 64
+COMPRESS_BUDGET_MS = float(os.environ.get('STEGO_COMPRESS_BUDGET_MS', 50))
+MAX_DECOMPRESSED_SIZE = int(os.environ.get('STEGO_MAX_DECOMPRESSED_SIZE', 64 * 1024 * 1024))
+LZMA_SLOWDOWN = 8  # rough LZMA2 / deflate time ratio on text
+_LZMA_FILTERS = [{'id': lzma.FILTER_LZMA2, 'preset': 6}]
+
+class Compression(NamedTuple):
+    method: int
+    data: bytes
+    original_size: int
+    time_ms: float
+
+    @property
+    def name(self) -> str:
+        return COMPRESSION_NAMES[self.method]
+
+    @property
+    def ratio(self) -> float:
+        """Original over compressed size; 1.0 when left uncompressed"""
+        return self.original_size / len(self.data) if self.data else 1.0
+
+def _deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+def compress_payload(data: bytes, budget_ms: Optional[float] = None) -> Compression:
+    """Smallest of data, deflate(data) and LZMA2(data) found within budget_ms
+    (COMPRESS_BUDGET_MS by default)"""
+    budget = (COMPRESS_BUDGET_MS if budget_ms is None else budget_ms) / 1000
+    start = time.perf_counter()
+    method, best = COMPRESS_NONE, data
+    if len(data) >= COMPRESS_MIN_SIZE:
+        deflated = _deflate(data)
+        deflate_time = time.perf_counter() - start
+        if len(deflated) < len(best):
+            method, best = COMPRESS_ZLIB, deflated
+        if deflate_time * (1 + LZMA_SLOWDOWN) <= budget:
+            # A dictionary no larger than the input saves most of LZMA's setup
+            # time on short messages; the decoder's default one covers it
+            filters = [dict(_LZMA_FILTERS[0], dict_size=min(max(len(data), 1 << 16), 1 << 23))]
+            packed = lzma.compress(data, lzma.FORMAT_RAW, filters=filters)
+            if len(packed) < len(best):
+                method, best = COMPRESS_LZMA, packed
+    return Compression(method, best, len(data), (time.perf_counter() - start) * 1000)
+
+def decompress_payload(data: bytes, method: int) -> bytes:
+    """Inverse of compress_payload for the recorded method, refusing output
+    beyond MAX_DECOMPRESSED_SIZE"""
+    if method == COMPRESS_NONE:
+        return data
+    if method == COMPRESS_ZLIB:
+        decompressor = zlib.decompressobj(-15)
+    elif method == COMPRESS_LZMA:
+        decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=_LZMA_FILTERS)
+    else:
+        raise ValueError(f"Unknown payload compression {method}")
+    try:
+        output = decompressor.decompress(data, MAX_DECOMPRESSED_SIZE)
+    except (zlib.error, lzma.LZMAError) as e:
+        raise ValueError(f"Payload decompression failed: {str(e)}")
+    if not decompressor.eof:
+        raise ValueError(f"Payload decompresses beyond {MAX_DECOMPRESSED_SIZE} bytes or is truncated")
+    return output
+
+def encrypt_message(message, key):
+    """Compress and seal a text message as a single chunk. Returns
+    (encrypted_data, ciphertext, tag, compression) like aes_encrypt plus the
+    Compression that was applied."""
+    compression = compress_payload(message.encode('utf-8'))
+    data = compression.data
+    kind = PAYLOAD_TEXT | compression.method << 4
+    encrypted_data = b''.join(aead_encrypt_chunks(data, key, len(data), kind, chunk_size=max(1, len(data))))
+    return encrypted_data, encrypted_data[_AEAD_HEADER.size:-AEAD_TAG_SIZE], encrypted_data[-AEAD_TAG_SIZE:], compression
+
 # ---------------- Quality Metrics ----------------
 def calculate_psnr(original, stego):
     """Calculate PSNR between original and stego image"""
@@ -214,80 +1316,217 @@ def calculate_snr(original, stego):
     snr = 10 * math.log10(signal_power / noise_power)
     return snr
 
-def calculate_entropy(data):
-    """Calculate Shannon entropy of data"""
-    if len(data) == 0:
-        return 0
-    entropy = 0
-    for x in range(256):
-        p_x = float(data.count(bytes([x]))) / len(data)
-        if p_x > 0:
-            entropy += - p_x * math.log2(p_x)
-    return entropy
+class DistortionStats:
+    """Changed-sample count and squared error accumulated by the embedding
+    engines as they modify values, so PSNR, SNR and MSE need neither the
+    original carrier nor float copies of it"""
+
+    def __init__(self):
+        self.samples = 0           # carrier samples (pixel channels or audio samples)
+        self.changed = 0
+        self.sse = 0
+        self.rows = 0              # image rows touched by the embedder
+        self.signal_power = None   # mean square of the original audio
+        self.ssim = None
+
+    def add(self, original: np.ndarray, modified: np.ndarray) -> None:
+        delta = modified.astype(np.int64) - original
+        self.record(int(np.count_nonzero(delta)), int((delta * delta).sum()))
+
+    def record(self, changed: int, sse: int) -> None:
+        self.changed += changed
+        self.sse += sse
+
+    @property
+    def mse(self) -> float:
+        return self.sse / self.samples if self.samples else 0.0
+
+    def psnr(self, max_value: float = 255.0) -> float:
+        if self.sse == 0:
+            return float('inf')
+        return 20 * math.log10(max_value / math.sqrt(self.mse))
+
+    def snr(self) -> float:
+        if self.sse == 0:
+            return float('inf')
+        return 10 * math.log10(self.signal_power / self.mse)
+
+def _mean_square(samples, chunk=1 << 20):
+    """Mean of squared integer samples, in int64 chunks"""
+    total = 0
+    for i in range(0, len(samples), chunk):
+        part = samples[i:i + chunk].astype(np.int64)
+        total += int(np.dot(part, part))
+    return total / len(samples) if len(samples) else 0.0
+
+SSIM_TILE = 8
+SSIM_TILE_CHUNK = 1 << 13
+
+def calculate_tile_ssim(original, stego, rows=None, tile=SSIM_TILE):
+    """Mean SSIM over non-overlapping tile x tile blocks of each channel.
+
+    Only the first rows rows (all by default) are compared and only tiles
+    that changed are computed; every other tile counts as 1. original may be
+    just the leading rows of the cover.
+    """
+    height = stego.shape[0] - stego.shape[0] % tile
+    width = stego.shape[1] - stego.shape[1] % tile
+    channels = stego.shape[2] if stego.ndim == 3 else 1
+    total_tiles = (height // tile) * (width // tile) * channels
+    if total_tiles == 0:
+        return 1.0
+    rows = height if rows is None else min(height, -(-rows // tile) * tile)
+    rows = min(rows, original.shape[0] - original.shape[0] % tile)
+
+    def blocks(img):
+        view = img[:rows, :width].reshape(rows // tile, tile, width // tile, tile, channels)
+        return view.transpose(0, 2, 4, 1, 3)
+
+    # Flag changed tiles a band of rows at a time to bound the comparison buffer
+    flags = np.empty((rows // tile, width // tile, channels), dtype=bool)
+    band = max(1, SSIM_TILE_CHUNK * tile * tile // (width * channels * tile)) * tile
+    for r0 in range(0, rows, band):
+        r1 = min(rows, r0 + band)
+        diff = original[r0:r1, :width] != stego[r0:r1, :width]
+        flags[r0 // tile:r1 // tile] = diff.reshape((r1 - r0) // tile, tile, width // tile, tile, channels).any(axis=(1, 3))
+    a, b = blocks(original), blocks(stego)
+    changed = np.flatnonzero(flags)
+    del flags
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ssim_sum = 0.0
+    for i in range(0, len(changed), SSIM_TILE_CHUNK):
+        idx = np.unravel_index(changed[i:i + SSIM_TILE_CHUNK], a.shape[:3])
+        x = a[idx].reshape(-1, tile * tile).astype(np.float32)
+        y = b[idx].reshape(-1, tile * tile).astype(np.float32)
+        mx, my = x.mean(axis=1), y.mean(axis=1)
+        vx, vy = x.var(axis=1), y.var(axis=1)
+        cov = ((x - mx[:, None]) * (y - my[:, None])).mean(axis=1)
+        ssim = ((2 * mx * my + c1) * (2 * cov + c2)) / ((mx ** 2 + my ** 2 + c1) * (vx + vy + c2))
+        ssim_sum += float(ssim.sum(dtype=np.float64))
+    return (ssim_sum + total_tiles - len(changed)) / total_tiles
 
 # ---------------- PVD Image Steganography ----------------
-def embed_data_in_image_DE(image_data, data_bytes):
+# Overwrite the decoded cover while embedding instead of working on a copy
+IMAGE_IN_PLACE = os.environ.get('STEGO_IMAGE_IN_PLACE', '0').lower() in ('1', 'true', 'yes', 'on')
+
+def _image_bytes_from_base64(image_data):
+    if isinstance(image_data, str) and image_data.startswith('data:image'):
+        image_data = image_data.split(',')[1]
+    return base64.b64decode(image_data)
+
+def embed_data_in_image_bytes(image_bytes, data_bytes, progress=None, stats=None, ssim=False, in_place=None, engine=None):
+    """Embed into an encoded image buffer, or a Cover from load_cover, and
+    return the stego PNG bytes.
+
+    Pass a DistortionStats as stats to read the MSE, changed-sample count and,
+    with ssim=True, the tile SSIM afterwards. With in_place (IMAGE_IN_PLACE by
+    default) the decoded cover is overwritten rather than copied, unless it
+    is held by the cover cache; only the rows the payload reaches are kept
+    aside when SSIM is requested. engine names the PVD engine, the
+    configured default if None.
+    """
     start = time.perf_counter()
+    in_place = IMAGE_IN_PLACE if in_place is None else in_place
     
     try:
-        # Convert base64 to PIL Image
-        if isinstance(image_data, str) and image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
-        
-        image_bytes = base64.b64decode(image_data)
+        # Decode straight from the upload buffer, or reuse the cached cover
+        cover = image_bytes if isinstance(image_bytes, Cover) else load_cover(image_bytes)
+        img_array, row_bits = cover.pixels, cover.row_bits
+        in_place = in_place and not cover.shared
+        del cover
         
-        # Convert to numpy array using OpenCV
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img_array = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        print(f"PVD Embedding: Embedding {len(data_bytes)} bytes into image with shape {img_array.shape}")
         
-        if img_array is None:
-            raise ValueError("Failed to decode image")
+        # Reject payloads the cover cannot hold instead of truncating them
+        max_capacity_bits = int(row_bits[-1]) if len(row_bits) else 0
+        needed_bits = pvd_payload_bits(data_bytes)
+        if needed_bits > max_capacity_bits:
+            raise ValueError(f"Message too large for image. Max: {pvd_max_payload_bytes(max_capacity_bits)} bytes, Required: {len(data_bytes)} bytes")
         
-        original_array = img_array.copy()
-
-        print(f"PVD Embedding: Embedding {len(data_bytes)} bytes into image with shape {img_array.shape}")
+        # Keep the rows the payload can reach for SSIM before they are overwritten
+        original = img_array
+        if ssim and in_place:
+            touched = int(np.searchsorted(row_bits, needed_bits)) + 1
+            original = img_array[:-(-touched // SSIM_TILE) * SSIM_TILE].copy()
+        del row_bits
         
         # Use PVD to embed data
-        stego_array = pvd_store(img_array, data_bytes)
+        with stage_timer('embed'):
+            stats = DistortionStats() if stats is None else stats
+            stego_array = pvd_embed(img_array, data_bytes, progress, stats=stats, in_place=in_place, engine=engine)
         
         # Encode back to PNG
-        success, encoded_image = cv2.imencode('.png', stego_array)
+        with stage_timer('encode'):
+            success, encoded_image = cv2.imencode('.png', stego_array)
         if not success:
             raise ValueError("Failed to encode stego image")
         
-        output_base64 = base64.b64encode(encoded_image).decode()
-        
         end = time.perf_counter()
         
-        # Calculate PSNR
-        psnr_value = calculate_psnr(original_array, stego_array)
+        # PSNR from the distortion accumulated while embedding
+        with stage_timer('metrics'):
+            psnr_value = stats.psnr()
+            if ssim:
+                stats.ssim = calculate_tile_ssim(original, stego_array, stats.rows)
         
         # Calculate capacity metrics
-        total_pixels = img_array.shape[0] * img_array.shape[1]
+        total_pixels = stego_array.shape[0] * stego_array.shape[1]
         capacity_bits = len(data_bytes) * 8
         capacity_per_pixel = capacity_bits / total_pixels if total_pixels > 0 else 0
+        del original, img_array, stego_array
         
+        PAYLOAD_BITS.inc(capacity_bits, carrier='image')
         print(f"PVD Embedding: Complete - {capacity_bits} bits embedded, PSNR: {psnr_value:.2f} dB")
         
-        return output_base64, (end - start) * 1000, psnr_value, capacity_bits, capacity_per_pixel
+        return encoded_image.tobytes(), (end - start) * 1000, psnr_value, capacity_bits, capacity_per_pixel
         
     except Exception as e:
         print(f"Error in PVD image embedding: {str(e)}")
         raise
 
-def extract_data_from_image_DE(image_data):
+def embed_data_in_image_DE(image_data, data_bytes, stats=None, ssim=False, in_place=None, engine=None):
+    start = time.perf_counter()
+    
+    # Convert base64 to raw image bytes
+    image_bytes = _image_bytes_from_base64(image_data)
+    del image_data
+    
+    stego_bytes, _, psnr_value, capacity_bits, capacity_per_pixel = embed_data_in_image_bytes(
+        image_bytes, data_bytes, stats=stats, ssim=ssim, in_place=in_place, engine=engine
+    )
+    del image_bytes
+    with stage_timer('serialize'):
+        output_base64 = base64.b64encode(stego_bytes).decode()
+    
+    end = time.perf_counter()
+    
+    return output_base64, (end - start) * 1000, psnr_value, capacity_bits, capacity_per_pixel
+
+def extract_data_from_image_bytes(image_bytes, engine=None):
+    """Extract the hidden payload from an encoded image buffer"""
     start = time.perf_counter()
     
     try:
-        # Convert base64 to numpy array
-        if isinstance(image_data, str) and image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
-        
-        image_bytes = base64.b64decode(image_data)
+        # Non-interlaced PNGs are decoded only as far down as the payload
+        if image_bytes[:len(PNG_SIGNATURE)] == PNG_SIGNATURE:
+            try:
+                rows = PNGRows(image_bytes)
+            except ValueError as e:
+                print(f"PVD Extraction: {str(e)}, decoding the whole image")
+            else:
+                print(f"PVD Extraction: Extracting from PNG rows with shape {rows.shape}")
+                with stage_timer('extract'):
+                    extracted_data = pvd_extract_rows(rows.read, rows.shape, engine=engine)
+                if extracted_data is not None:
+                    if not extracted_data:
+                        print("PVD Extraction: No data extracted from image")
+                    return extracted_data, (time.perf_counter() - start) * 1000
+                print("PVD Extraction: No stego container, decoding the whole image")
         
-        # Convert to numpy array using OpenCV
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img_array = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode straight from the upload buffer using OpenCV
+        with stage_timer('decode'):
+            nparr = np.frombuffer(image_bytes, np.uint8)
+            img_array = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         if img_array is None:
             raise ValueError("Failed to decode image")
@@ -295,7 +1534,8 @@ def extract_data_from_image_DE(image_data):
         print(f"PVD Extraction: Extracting from image with shape {img_array.shape}")
         
         # Use PVD to extract data
-        extracted_data = pvd_unstore(img_array)
+        with stage_timer('extract'):
+            extracted_data = pvd_extract(img_array, engine=engine)
         
         end = time.perf_counter()
         
@@ -306,18 +1546,436 @@ def extract_data_from_image_DE(image_data):
         
         return extracted_data, (end - start) * 1000
         
+    except EngineMismatch:
+        raise
     except Exception as e:
         print(f"Error in PVD image extraction: {str(e)}")
         return b'', 0
 
+def extract_data_from_image_DE(image_data, engine=None):
+    start = time.perf_counter()
+    
+    try:
+        # Convert base64 to raw image bytes
+        image_bytes = _image_bytes_from_base64(image_data)
+    except Exception as e:
+        print(f"Error in PVD image extraction: {str(e)}")
+        return b'', 0
+    
+    extracted_data, _ = extract_data_from_image_bytes(image_bytes, engine)
+    
+    return extracted_data, (time.perf_counter() - start) * 1000
+
+# ---------------- Streaming Rasters ----------------
+# Uncompressed BMP, TIFF and .npy rasters are memory-mapped instead of
+# decoded, and the PVD engine walks them in row stripes of PVD_BAND_PAIRS
+# pixel pairs, so memory is bounded by the stripe and payload sizes rather
+# than the image size. Stripes are written straight back into the mapped file.
+RASTER_EXTENSIONS = {'.bmp', '.tif', '.tiff', '.npy'}
+
+def open_raster(path: str, writable: bool = False) -> np.ndarray:
+    """Memory-map an 8-bit 3-channel raster as a (height, width, 3) BGR view.
+
+    Channels are presented in OpenCV order, so a streamed image holds exactly
+    the pixels embed_data_in_image_bytes would see. .npy arrays are taken as
+    BGR already.
+    """
+    mode = 'r+' if writable else 'r'
+    if os.path.splitext(path.lower())[1] == '.npy':
+        raster = np.load(path, mmap_mode=mode)
+        if raster.dtype != np.uint8 or raster.ndim != 3 or raster.shape[2] != 3:
+            raise ValueError(f"Only uint8 (height, width, 3) arrays can be streamed, got {raster.dtype} {raster.shape}")
+        return raster
+
+    with Image.open(path) as img:
+        width, height = img.size
+        image_format = img.format
+        tiles = img.tile
+    if not tiles or any(tile[0] != 'raw' for tile in tiles):
+        raise ValueError(f"Only uncompressed rasters can be streamed, {image_format} file is compressed")
+    rawmode, stride, orientation = tiles[0][3][:3]
+    if rawmode not in ('BGR', 'RGB') or any(tile[3][0] != rawmode for tile in tiles):
+        raise ValueError(f"Only 8-bit RGB rasters can be streamed, {image_format} file is {rawmode}")
+
+    # Strips must span the full width and follow each other in the file
+    row_bytes = stride or width * 3
+    offset = tiles[0][2]
+    for tile in tiles:
+        x0, y0, x1, y1 = tile[1]
+        if x0 != 0 or x1 != width or tile[2] != offset:
+            raise ValueError(f"{image_format} strips are not stored contiguously")
+        offset += (min(y1, height) - y0) * row_bytes
+
+    rows = np.memmap(path, dtype=np.uint8, mode=mode, offset=tiles[0][2], shape=(height, row_bytes))
+    raster = rows[:, :width * 3].reshape(height, width, 3)
+    if orientation < 0:
+        raster = raster[::-1]  # bottom-up BMP
+    if rawmode == 'RGB':
+        raster = raster[..., ::-1]
+    return raster
+
+def _close_raster(raster: np.ndarray) -> None:
+    if isinstance(raster, np.memmap) and raster.flags.writeable:
+        raster.flush()
+
+def raster_capacity(path: str) -> Tuple[int, int, Tuple[int, ...]]:
+    """Capacity in bits, largest payload in bytes and shape of a raster file, read stripe by stripe"""
+    raster = open_raster(path)
+    capacity_bits = int(pvd_row_capacity(raster).sum())
+    return capacity_bits, pvd_max_payload_bytes(capacity_bits), raster.shape
+
+def embed_data_in_raster(path: str, data_bytes: bytes, output_path: Optional[str] = None,
+                         progress=None, stats: Optional['DistortionStats'] = None):
+    """Stripe-streaming embed into an uncompressed raster file.
+
+    The stego raster is written into output_path, a copy of path in the same
+    format, or into path itself when output_path is None. Returns the embed
+    time, PSNR, payload bits and bits per pixel.
+    """
+    start = time.perf_counter()
+    
+    try:
+        raster = open_raster(path)
+        print(f"PVD Streaming: Embedding {len(data_bytes)} bytes into raster with shape {raster.shape}")
+        
+        # Check capacity before copying anything, reading only as many
+        # stripes as the payload needs
+        needed_bits = pvd_payload_bits(data_bytes)
+        capacity_bits = int(pvd_row_capacity(raster, limit=needed_bits).sum())
+        if needed_bits > capacity_bits:
+            raise ValueError(f"Message too large for image. Max: {pvd_max_payload_bytes(capacity_bits)} bytes, Required: {len(data_bytes)} bytes")
+        del raster
+        
+        if output_path is not None and os.path.abspath(output_path) != os.path.abspath(path):
+            shutil.copyfile(path, output_path)
+            path = output_path
+        
+        raster = open_raster(path, writable=True)
+        with stage_timer('embed'):
+            stats = DistortionStats() if stats is None else stats
+            # The parallel engine would copy the raster into shared memory
+            pvd_embed(raster, data_bytes, progress, workers=1, stats=stats, in_place=True)
+            _close_raster(raster)
+        
+        end = time.perf_counter()
+        
+        psnr_value = stats.psnr()
+        total_pixels = raster.shape[0] * raster.shape[1]
+        capacity_bits = len(data_bytes) * 8
+        capacity_per_pixel = capacity_bits / total_pixels if total_pixels > 0 else 0
+        
+        PAYLOAD_BITS.inc(capacity_bits, carrier='image')
+        print(f"PVD Streaming: Complete - {capacity_bits} bits embedded, PSNR: {psnr_value:.2f} dB")
+        
+        return (end - start) * 1000, psnr_value, capacity_bits, capacity_per_pixel
+        
+    except Exception as e:
+        print(f"Error in PVD raster embedding: {str(e)}")
+        raise
+
+def extract_data_from_raster(path: str):
+    """Extract the hidden payload from an uncompressed raster file, decoding
+    only the stripes that carry it"""
+    start = time.perf_counter()
+    
+    try:
+        raster = open_raster(path)
+        print(f"PVD Streaming: Extracting from raster with shape {raster.shape}")
+        
+        with stage_timer('extract'):
+            extracted_data = pvd_extract(raster, workers=1)
+        
+        if not extracted_data:
+            print("PVD Streaming: No data extracted from raster")
+        
+        return extracted_data, (time.perf_counter() - start) * 1000
+        
+    except Exception as e:
+        print(f"Error in PVD raster extraction: {str(e)}")
+        return b'', 0
+
+# ---------------- Video Steganography ----------------
+# Video carriers are read frame by frame with cv2.VideoCapture and the
+# container bits are laid across the frames in stream order, each frame
+# taking as many as its PVD capacity allows. Frames are embedded or decoded
+# by the PVD process pool with at most VIDEO_WINDOW_PER_WORKER frames per
+# worker in flight, so memory is bounded by that window and the payload
+# rather than the clip length. The stego video is written with a lossless
+# codec, since any lossy re-encode destroys the payload.
+VIDEO_EXTENSIONS = {'.avi', '.mkv', '.mov', '.mp4'}
+VIDEO_FOURCC = os.environ.get('STEGO_VIDEO_FOURCC', 'FFV1')
+VIDEO_WINDOW_PER_WORKER = 2
+
+def _open_video(path: str) -> Tuple[cv2.VideoCapture, Tuple[int, int, int, int], float]:
+    """Capture, (frames, height, width, 3) shape and frame rate of a video.
+    The frame count is the container's estimate and may be 0 if unknown."""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {os.path.basename(path)}")
+    frames = max(0, int(capture.get(cv2.CAP_PROP_FRAME_COUNT)))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    return capture, (frames, height, width, 3), capture.get(cv2.CAP_PROP_FPS) or 25.0
+
+def _video_frames(capture: cv2.VideoCapture):
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            return
+        yield frame
+
+def _video_map(task: Callable, args, workers: int):
+    """Results of task(*a) for each a in args, in order. With workers above 1
+    the calls run in the PVD pool, submitted no further ahead than the window."""
+    if workers <= 1:
+        for a in args:
+            yield task(*a)
+        return
+
+    pool = _get_pvd_pool(workers)
+    pending = deque()
+    try:
+        for a in args:
+            pending.append(pool.submit(task, *a))
+            if len(pending) >= workers * VIDEO_WINDOW_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def _slice_bits(data: bytes, start: int, count: int) -> np.ndarray:
+    """count bits of data starting at bit start, unpacking only their bytes"""
+    end = -(-(start + count) // 8)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=end - start // 8, offset=start // 8))
+    return bits[start % 8:start % 8 + count]
+
+def _video_embed_frame_task(frame: np.ndarray, bits: np.ndarray) -> Tuple[np.ndarray, int, int]:
+    """Frame with bits embedded, and its changed-sample count and squared error"""
+    stats = DistortionStats()
+    _pvd_store_stream(frame, BitStream(bits), False, workers=1, stats=stats, in_place=True)
+    return frame, stats.changed, stats.sse
+
+def _video_read_frame_task(frame: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Every bit a frame carries, packed, and their count"""
+    capacity = int(pvd_row_capacity(frame).sum())
+    return np.packbits(_pvd_read_bits(frame, capacity, False)), capacity
+
+def _video_capacity_task(frame: np.ndarray) -> int:
+    return int(pvd_row_capacity(frame).sum())
+
+def video_capacity(path: str, workers: Optional[int] = None) -> Tuple[int, int, Tuple[int, ...]]:
+    """Capacity in bits, largest payload in bytes and (frames, height, width, 3)
+    shape of a video, scanning every frame"""
+    capture, shape, _ = _open_video(path)
+    try:
+        frames = capacity_bits = 0
+        for bits in _video_map(_video_capacity_task, ((f,) for f in _video_frames(capture)), workers or PVD_WORKERS):
+            capacity_bits += bits
+            frames += 1
+    finally:
+        capture.release()
+    return capacity_bits, pvd_max_payload_bytes(capacity_bits), (frames,) + shape[1:]
+
+def embed_data_in_video(path: str, data_bytes: bytes, output_path: str, progress=None,
+                        stats: Optional['DistortionStats'] = None, workers: Optional[int] = None):
+    """Embed into a video file, writing the stego video to output_path with
+    the VIDEO_FOURCC codec. Frames after the payload are copied unchanged.
+
+    progress, if given, is called as progress(bits_embedded, bits_total)
+    after each frame. Returns the embed time, PSNR, payload bits and bits
+    per pixel, the last two over the frames that carry payload.
+    """
+    start = time.perf_counter()
+    workers = workers or PVD_WORKERS
+    capture = writer = None
+    
+    try:
+        capture, shape, fps = _open_video(path)
+        print(f"PVD Video: Embedding {len(data_bytes)} bytes into video with shape {shape}")
+        
+        payload = pack_header(CODEC_VIDEO_PVD, len(data_bytes)) + data_bytes
+        total = len(payload) * 8
+        # The frame count is only an estimate, so this rules out payloads
+        # that cannot fit and the real check is running out of frames
+        if shape[0] and total > shape[0] * _pvd_max_bits_for(shape[1:]):
+            max_bytes = pvd_max_payload_bytes(shape[0] * _pvd_max_bits_for(shape[1:]))
+            raise ValueError(f"Message too large for video. Max: {max_bytes} bytes, Required: {len(data_bytes)} bytes")
+        
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*VIDEO_FOURCC), fps, (shape[2], shape[1]))
+        if not writer.isOpened():
+            raise ValueError(f"Could not write {VIDEO_FOURCC} video to {os.path.basename(output_path)}")
+        
+        frames = _video_frames(capture)
+        offset = 0
+        payload_frames = 0
+        
+        def frame_bits():
+            # Capacity is scanned here, in order, to give every frame its
+            # payload offset; the workers only embed
+            nonlocal offset, payload_frames
+            for frame in frames:
+                capacity = int(pvd_row_capacity(frame, limit=total - offset).sum())
+                yield frame, _slice_bits(payload, offset, min(capacity, total - offset))
+                offset += capacity
+                payload_frames += 1
+                if offset >= total:
+                    return
+        
+        stats = DistortionStats() if stats is None else stats
+        with stage_timer('embed'):
+            for frame, changed, sse in _video_map(_video_embed_frame_task, frame_bits(), workers):
+                writer.write(frame)
+                stats.samples += frame.size
+                stats.record(changed, sse)
+                if progress is not None:
+                    progress(min(offset, total), total)
+            if offset < total:
+                raise ValueError(f"Message too large for video. Max: {pvd_max_payload_bytes(offset)} bytes, Required: {len(data_bytes)} bytes")
+            for frame in frames:
+                writer.write(frame)
+                stats.samples += frame.size
+        
+        end = time.perf_counter()
+        
+        psnr_value = stats.psnr()
+        total_pixels = payload_frames * shape[1] * shape[2]
+        capacity_bits = len(data_bytes) * 8
+        capacity_per_pixel = capacity_bits / total_pixels if total_pixels > 0 else 0
+        
+        PAYLOAD_BITS.inc(capacity_bits, carrier='video')
+        print(f"PVD Video: Complete - {capacity_bits} bits embedded in {payload_frames} frames, PSNR: {psnr_value:.2f} dB")
+        
+        return (end - start) * 1000, psnr_value, capacity_bits, capacity_per_pixel
+        
+    except Exception as e:
+        print(f"Error in PVD video embedding: {str(e)}")
+        if writer is not None:
+            writer.release()
+            writer = None
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        raise
+    finally:
+        if writer is not None:
+            writer.release()
+        if capture is not None:
+            capture.release()
+
+def extract_data_from_video(path: str, workers: Optional[int] = None):
+    """Extract the hidden payload from a stego video, decoding frames only
+    until the container's declared length is read"""
+    start = time.perf_counter()
+    workers = workers or PVD_WORKERS
+    capture = None
+    
+    try:
+        capture, shape, _ = _open_video(path)
+        print(f"PVD Video: Extracting from video with shape {shape}")
+        max_bits = shape[0] * _pvd_max_bits_for(shape[1:]) if shape[0] else float('inf')
+        
+        payload = bytearray()
+        spare = np.zeros(0, dtype=np.uint8)  # bits short of a whole byte
+        needed = None
+        results = _video_map(_video_read_frame_task, ((f,) for f in _video_frames(capture)), workers)
+        try:
+            with stage_timer('extract'):
+                for frame, (packed, count) in enumerate(results, 1):
+                    bits = np.concatenate((spare, np.unpackbits(packed, count=count)))
+                    whole = len(bits) - len(bits) % 8
+                    payload += np.packbits(bits[:whole]).tobytes()
+                    spare = bits[whole:]
+                    
+                    if needed is None and len(payload) >= HEADER_SIZE:
+                        header = parse_header(payload)
+                        if header is None:
+                            print("PVD Video: No stego container found")
+                            return b'', (time.perf_counter() - start) * 1000
+                        problem = check_header(header, CODEC_VIDEO_PVD, max_bits)
+                        if problem:
+                            print(f"PVD Video: Rejected container, {problem}")
+                            return b'', (time.perf_counter() - start) * 1000
+                        print(f"PVD Video: Container v{header.version} with {header.length} bytes")
+                        needed = HEADER_SIZE + header.length
+                    if needed is not None and len(payload) >= needed:
+                        print(f"PVD Video: Decoded {frame} frames")
+                        return bytes(payload[HEADER_SIZE:needed]), (time.perf_counter() - start) * 1000
+        finally:
+            results.close()
+        
+        print("PVD Video: Video ends before the declared payload")
+        return b'', (time.perf_counter() - start) * 1000
+        
+    except Exception as e:
+        print(f"Error in PVD video extraction: {str(e)}")
+        return b'', 0
+    finally:
+        if capture is not None:
+            capture.release()
+
 # ---------------- DE Audio Steganography ----------------
-def embed_data_in_audio_DE(audio_file_path, data_bytes):
+# Stego WAVs stay in memory up to this size and spill to a temp file beyond it
+SPOOL_MAX_SIZE = int(os.environ.get('STEGO_SPOOL_MAX_SIZE', 64 * 1024 * 1024))
+
+def _lsb_embed_vectorized(frames, chunks):
+    """Write the bits of chunks into the LSBs of the leading samples in place.
+    Returns the bits written and the samples that changed."""
+    n_bits = flipped = 0
+    for chunk in chunks:
+        data_bits = np.unpackbits(np.frombuffer(chunk, dtype=np.uint8))
+        target = frames[n_bits:n_bits + len(data_bits)]
+        # Each flipped LSB changes its sample by exactly 1
+        flipped += int(np.count_nonzero((target & 1) != data_bits))
+        target[...] = (target & ~1) | data_bits.astype(np.int16)
+        n_bits += len(data_bits)
+    return n_bits, flipped
+
+def _lsb_embed_reference(frames, chunks):
+    """_lsb_embed_vectorized one sample at a time"""
+    n_bits = flipped = 0
+    for chunk in chunks:
+        for byte in bytes(chunk):
+            for shift in range(7, -1, -1):
+                sample = int(frames[n_bits])
+                if sample & 1 != (byte >> shift) & 1:
+                    frames[n_bits] = sample ^ 1
+                    flipped += 1
+                n_bits += 1
+    return n_bits, flipped
+
+def _lsb_read_vectorized(samples):
+    """Bytes packed from the LSBs of samples, the last one zero-filled on the right"""
+    return BitStream(samples & 1).to_bytes()
+
+def _lsb_read_reference(samples):
+    """_lsb_read_vectorized one sample at a time"""
+    bits = [sample & 1 for sample in samples.tolist()]
+    out = bytearray()
+    for i in range(0, len(bits), 8):
+        byte = 0
+        for bit in bits[i:i + 8]:
+            byte = byte << 1 | bit
+        out.append(byte << (8 - len(bits[i:i + 8])))
+    return bytes(out)
+
+register_engine('audio', REFERENCE_ENGINE, _lsb_embed_reference, _lsb_read_reference, streams=True)
+register_engine('audio', 'vectorized', _lsb_embed_vectorized, _lsb_read_vectorized, streams=True)
+
+def embed_data_in_audio_stream(audio_source, data_bytes, spool_max_size=None, stats=None, engine=None):
+    """Embed into a WAV given as a path or file-like object.
+
+    Returns the stego WAV as a stream positioned at its start. It is held in
+    memory unless it grows past spool_max_size bytes. Pass a DistortionStats
+    as stats to read the MSE and changed-sample count afterwards. engine
+    names the LSB engine, the configured default if None.
+    """
     start = time.perf_counter()
-    temp_output = None
+    output = None
     
     try:
         # Read audio file
-        with wave.open(audio_file_path, 'rb') as audio:
+        with stage_timer('decode'), wave.open(audio_source, 'rb') as audio:
             params = audio.getparams()
             # Check if audio is compatible
             if params.sampwidth != 2:  # 16-bit audio
@@ -325,83 +1983,133 @@ def embed_data_in_audio_DE(audio_file_path, data_bytes):
             
             frames = np.frombuffer(audio.readframes(audio.getnframes()), dtype=np.int16).copy()
         
-        original_frames = frames.copy()
+        stats = DistortionStats() if stats is None else stats
+        stats.samples = len(frames)
+        stats.signal_power = _mean_square(frames)
 
         # Calculate maximum capacity
         max_capacity_bits = len(frames)  # 1 bit per sample
-        data_size_bits = (len(data_bytes) + 8) * 8  # +8 for length and checksum
+        data_size_bits = HEADER_BITS + len(data_bytes) * 8
         
         if data_size_bits > max_capacity_bits:
-            raise ValueError(f"Message too large for audio. Max: {max_capacity_bits//8} bytes, Required: {len(data_bytes)} bytes")
+            raise ValueError(f"Message too large for audio. Max: {max(0, max_capacity_bits // 8 - HEADER_SIZE)} bytes, Required: {len(data_bytes)} bytes")
 
         print(f"Embedding {len(data_bytes)} bytes ({data_size_bits} bits) into audio with {len(frames)} samples")
         
-        # Add checksum for data integrity
-        checksum = hashlib.md5(data_bytes).digest()[:4]
-        length_bytes = struct.pack('>I', len(data_bytes))
-        full_data = length_bytes + checksum + data_bytes
-        
-        print(f"Total bits to embed: {len(full_data)*8} (header: 64 bits, data: {len(data_bytes)*8} bits)")
+        print(f"Total bits to embed: {data_size_bits} (header: {HEADER_BITS} bits, data: {len(data_bytes)*8} bits)")
         
-        data_bits = ''.join(format(b, '08b') for b in full_data)
-        bit_idx = 0
-        total_bits_embedded = 0
+        # Simple LSB embedding for audio: one payload bit per leading sample,
+        # a chunk at a time for streamed payloads
+        streamed = isinstance(data_bytes, ChunkedPayload)
+        chunks = data_bytes if streamed else [data_bytes]
+        header = pack_header(CODEC_WAV_LSB, len(data_bytes))
+        chosen = select_engine('audio', engine, data_size_bits, len(frames), streamed)
+        verify = not streamed and _verify_sampled(chosen)
+        cover = frames.copy() if verify else None
+        with stage_timer('embed'):
+            n_bits, flipped = chosen.embed(frames, itertools.chain([header], chunks))
+        if verify:
+            expected = ENGINES['audio'][REFERENCE_ENGINE].embed(cover, [header, data_bytes])
+            _check_engine('audio', chosen, 'embed', expected == (n_bits, flipped) and np.array_equal(cover, frames))
+            del cover
+        stats.record(flipped, flipped)
+        total_bits_embedded = n_bits
 
-        # Simple LSB embedding for audio
-        for i in range(len(frames)):
-            if bit_idx >= len(data_bits):
-                break
-            
-            # Get current sample value
-            current_sample = frames[i]
-            
-            # Extract LSB and prepare new value
-            new_sample = (current_sample & ~1) | int(data_bits[bit_idx])
-            
-            # Ensure the value stays within int16 bounds
-            if new_sample > 32767:
-                new_sample = 32767
-            elif new_sample < -32768:
-                new_sample = -32768
-                
-            frames[i] = np.int16(new_sample)
-            bit_idx += 1
-            total_bits_embedded += 1
-
-        # Verify all bits were embedded
-        if bit_idx < len(data_bits):
-            raise ValueError(f"Not all data could be embedded. Embedded {bit_idx}/{len(data_bits)} bits")
+        print(f"Successfully embedded {total_bits_embedded} bits out of {data_size_bits} requested")
 
-        print(f"Successfully embedded {total_bits_embedded} bits out of {len(data_bits)} requested")
-
-        # Save to temporary file
-        temp_output = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
+        # Write the stego WAV to a spooled buffer
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE if spool_max_size is None else spool_max_size)
         
-        with wave.open(temp_output.name, 'wb') as new_audio:
+        with stage_timer('encode'), wave.open(output, 'wb') as new_audio:
             new_audio.setparams(params)
-            new_audio.writeframes(frames.astype(np.int16).tobytes())
+            new_audio.writeframes(memoryview(frames).cast('B'))
+        output.seek(0)
         
         end = time.perf_counter()
         
-        # Calculate audio quality metrics
-        snr_value = calculate_snr(original_frames, frames)
+        # SNR from the distortion accumulated while embedding
+        with stage_timer('metrics'):
+            snr_value = stats.snr()
         
         # Calculate capacity metrics
         total_samples = len(frames)
         capacity_bits = total_bits_embedded
         capacity_per_sample = capacity_bits / total_samples if total_samples > 0 else 0
         
+        PAYLOAD_BITS.inc(capacity_bits, carrier='audio')
         print(f"Audio embedding complete: {total_bits_embedded} bits embedded, SNR: {snr_value:.2f} dB")
         
-        return temp_output.name, (end - start) * 1000, snr_value, capacity_bits, capacity_per_sample
+        return output, (end - start) * 1000, snr_value, capacity_bits, capacity_per_sample
         
     except Exception as e:
         print(f"Error in audio embedding: {str(e)}")
-        if temp_output and os.path.exists(temp_output.name):
-            safe_delete_file(temp_output.name)
+        if output is not None:
+            output.close()
         raise
 
-def extract_data_from_audio_DE(audio_file_path):
+def embed_data_in_audio_DE(audio_file_path, data_bytes):
+    """File-based wrapper around embed_data_in_audio_stream returning a temp WAV path"""
+    stego_stream, embed_time, snr_value, capacity_bits, capacity_per_sample = embed_data_in_audio_stream(audio_file_path, data_bytes)
+    
+    with stego_stream, tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_output:
+        shutil.copyfileobj(stego_stream, temp_output)
+    
+    return temp_output.name, embed_time, snr_value, capacity_bits, capacity_per_sample
+
+def _read_lsb_samples(audio, first_sample, n_bits):
+    """The n_bits samples from first_sample on, decoding only the frames that hold them"""
+    channels = audio.getnchannels()
+    offset = first_sample % channels
+    audio.setpos(first_sample // channels)
+    samples = np.frombuffer(audio.readframes(-(-(offset + n_bits) // channels)), dtype=np.int16)
+    return samples[offset:offset + n_bits]
+
+def _read_lsb_bytes(audio, first_sample, n_bytes):
+    """Read n_bytes hidden in sample LSBs"""
+    return _lsb_read_vectorized(_read_lsb_samples(audio, first_sample, n_bytes * 8))
+
+def _extract_audio_container(audio, header, total_samples, engine=None):
+    problem = check_header(header, CODEC_WAV_LSB, total_samples)
+    if problem:
+        print(f"Rejected audio container: {problem}")
+        return b''
+    print(f"Container v{header.version} with {header.length} bytes")
+    chosen = select_engine('audio', engine, header.length * 8, total_samples)
+    with stage_timer('extract'):
+        samples = _read_lsb_samples(audio, HEADER_BITS, header.length * 8)
+        data = chosen.read(samples)
+    if _verify_sampled(chosen):
+        _check_engine('audio', chosen, 'extract', data == ENGINES['audio'][REFERENCE_ENGINE].read(samples))
+    return data
+
+def _extract_audio_legacy(audio, total_samples):
+    """Headerless WAVs: 32-bit length and MD5 prefix, then the payload"""
+    max_data_length = 10 * 1024 * 1024  # 10MB max data length
+    
+    with stage_timer('extract'):
+        header = _read_lsb_bytes(audio, 0, 8)
+    data_length = struct.unpack('>I', header[:4])[0]
+    checksum_extracted = header[4:8]
+    
+    # Calculate total bits needed
+    total_bits_needed = (4 + 4 + data_length) * 8
+    if data_length == 0 or data_length > max_data_length or total_bits_needed > total_samples:
+        print(f"No stego container or legacy payload found (legacy length {data_length} bytes)")
+        return b''
+    
+    with stage_timer('extract'):
+        data_bytes = _read_lsb_bytes(audio, 64, data_length)
+    
+    # Verify checksum
+    if hashlib.md5(data_bytes).digest()[:4] != checksum_extracted:
+        print("Audio checksum verification failed - no valid legacy payload")
+        return b''
+    
+    print(f"Successfully extracted {len(data_bytes)} legacy bytes with valid checksum")
+    return data_bytes
+
+def extract_data_from_audio_DE(audio_file_path, engine=None):
+    """Extract from a WAV given as a path or seekable file-like object"""
     start = time.perf_counter()
     
     try:
@@ -411,89 +2119,26 @@ def extract_data_from_audio_DE(audio_file_path):
             if params.sampwidth != 2:  # 16-bit audio
                 raise ValueError("Only 16-bit WAV files are supported")
             
-            frames = np.frombuffer(audio.readframes(audio.getnframes()), dtype=np.int16)
-        
-        data_bits = ''
-        # Extract ALL available bits
-        total_samples = len(frames)
-        print(f"Extracting from {total_samples} audio samples")
-        
-        for i in range(len(frames)):
-            # Direct extraction without uint16 conversion
-            sample = frames[i]
-            data_bits += str(sample & 1)
-
-        print(f"Extracted {len(data_bits)} bits from audio")
-
-        # Try to extract the data with checksum verification
-        extracted_data = b''
-        max_data_length = 10 * 1024 * 1024  # 10MB max data length
-        
-        try:
-            if len(data_bits) >= 64:  # 32 bits for length + 32 bits for checksum
-                # Extract length
-                length_bytes = bytearray()
-                for i in range(0, 32, 8):
-                    if i + 8 <= len(data_bits):
-                        byte_val = int(data_bits[i:i+8], 2)
-                        length_bytes.append(byte_val)
-                
-                if len(length_bytes) == 4:
-                    data_length = struct.unpack('>I', bytes(length_bytes))[0]
-                    print(f"Data length from header: {data_length} bytes")
-                    
-                    # Safety check for data length
-                    if data_length > max_data_length:
-                        print(f"Data length too large: {data_length} bytes")
-                        return b'', (time.perf_counter() - start) * 1000
-                    
-                    # Extract checksum
-                    checksum_extracted = bytearray()
-                    for i in range(32, 64, 8):
-                        if i + 8 <= len(data_bits):
-                            byte_val = int(data_bits[i:i+8], 2)
-                            checksum_extracted.append(byte_val)
-                    
-                    # Calculate total bits needed
-                    total_bits_needed = (4 + 4 + data_length) * 8
-                    print(f"Total bits needed: {total_bits_needed}, Available: {len(data_bits)}")
-                    
-                    if len(data_bits) >= total_bits_needed:
-                        # Extract data
-                        data_bytes = bytearray()
-                        for i in range(64, total_bits_needed, 8):
-                            if i + 8 <= len(data_bits):
-                                byte_val = int(data_bits[i:i+8], 2)
-                                data_bytes.append(byte_val)
-                        
-                        if len(data_bytes) == data_length:
-                            # Verify checksum
-                            calculated_checksum = hashlib.md5(bytes(data_bytes)).digest()[:4]
-                            extracted_checksum = bytes(checksum_extracted)
-                            
-                            if extracted_checksum == calculated_checksum:
-                                extracted_data = bytes(data_bytes)
-                                print(f"Successfully extracted {len(extracted_data)} bytes with valid checksum")
-                            else:
-                                print("Audio checksum verification failed - data may be corrupted")
-                                # Use the data anyway
-                                extracted_data = bytes(data_bytes)
-                                print(f"Using data without checksum verification: {len(extracted_data)} bytes")
-                        else:
-                            print(f"Data length mismatch: expected {data_length}, got {len(data_bytes)}")
-                            # Use what we have
-                            extracted_data = bytes(data_bytes)
-                            print(f"Using available data: {len(extracted_data)} bytes")
-                    else:
-                        print(f"Insufficient bits extracted. Needed: {total_bits_needed}, Got: {len(data_bits)}")
-                else:
-                    print("Failed to extract length header from audio")
-            else:
-                print(f"Insufficient bits for audio header. Needed: 64, Got: {len(data_bits)}")
-                
-        except Exception as e:
-            print(f"Error during audio data extraction: {e}")
+            total_samples = params.nframes * params.nchannels
+            print(f"Extracting from {total_samples} audio samples")
+            
             extracted_data = b''
+            try:
+                if total_samples < HEADER_BITS:
+                    print(f"Insufficient bits for audio header. Needed: {HEADER_BITS}, Got: {total_samples}")
+                else:
+                    with stage_timer('extract'):
+                        header = parse_header(_read_lsb_bytes(audio, 0, HEADER_SIZE))
+                    if header is not None:
+                        extracted_data = _extract_audio_container(audio, header, total_samples, engine)
+                    else:
+                        extracted_data = _extract_audio_legacy(audio, total_samples)
+                    
+            except EngineMismatch:
+                raise
+            except Exception as e:
+                print(f"Error during audio data extraction: {e}")
+                extracted_data = b''
         
         end = time.perf_counter()
         
@@ -504,31 +2149,17 @@ def extract_data_from_audio_DE(audio_file_path):
         
         return extracted_data, (end - start) * 1000
         
+    except EngineMismatch:
+        raise
     except Exception as e:
         print(f"Error in audio extraction: {str(e)}")
         return b'', 0
 
 # ---------------- Utility Functions ----------------
-def analyze_ciphertext(ciphertext, tag, encrypted_data):
-    """Analyze and display ciphertext information"""
-    analysis = {
-        'ciphertext_length': len(ciphertext),
-        'tag_length': len(tag),
-        'nonce_length': 16,
-        'total_encrypted_length': len(encrypted_data),
-        'ciphertext_hex': ciphertext.hex()[:100] + '...' if len(ciphertext.hex()) > 100 else ciphertext.hex(),
-        'ciphertext_base64': base64.b64encode(ciphertext).decode()[:100] + '...',
-        'tag_hex': tag.hex(),
-        'entropy': calculate_entropy(ciphertext)
-    }
-    return analysis
-
 def get_system_metrics():
+    """Last background sample of CPU percent and RSS in MB (non-blocking)"""
     try:
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        process = psutil.Process(os.getpid())
-        memory_usage = process.memory_info().rss / 1e6  # MB
-        return cpu_percent, memory_usage
+        return system_metrics()
     except:
         return 0.0, 0.0
 
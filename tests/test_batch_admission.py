@@ -0,0 +1,130 @@
+import io
+import json
+import threading
+import time
+import zipfile
+
+import cv2
+import numpy as np
+import pytest
+
+import app as app_module
+from admission import MemoryBudget
+
+def _png(seed, shape=(64, 96, 3)):
+    pixels = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+    return cv2.imencode('.png', pixels)[1].tobytes()
+
+def _batch_embed(client, count=2):
+    data = {
+        'carriers': [(io.BytesIO(_png(i)), f'cover{i}.png') for i in range(count)],
+        'secret_message': 'batch secret'
+    }
+    response = client.post('/batch/embed', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        return json.loads(archive.read('manifest.json'))
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'ADMISSION_MAX_WAIT', 0.2)
+    monkeypatch.setattr(app_module, '_scheduler', None)
+    monkeypatch.setattr(app_module, '_memory_budget', None)
+    return app_module.app.test_client()
+
+def _budget(monkeypatch, nbytes, max_wait):
+    budget = MemoryBudget(nbytes, max_wait)
+    monkeypatch.setattr(app_module, '_memory_budget', budget)
+    return budget
+
+def test_batch_items_fit_in_budget(client):
+    manifest = _batch_embed(client)
+    assert manifest['summary'] == {'items': 2, 'succeeded': 2, 'failed': 0}
+
+def test_batch_items_refused_while_budget_exhausted(client, monkeypatch):
+    budget = _budget(monkeypatch, 1 << 30, max_wait=0.2)
+    with budget.reserve(budget.budget):
+        manifest = _batch_embed(client)
+    assert manifest['summary']['failed'] == 2
+    assert all('memory budget exhausted' in item['error'] for item in manifest['items'])
+
+def test_batch_item_larger_than_budget_refused(client, monkeypatch):
+    _budget(monkeypatch, 1 << 20, max_wait=0.2)
+    manifest = _batch_embed(client, count=1)
+    assert manifest['summary']['failed'] == 1
+    assert 'above the server memory budget' in manifest['items'][0]['error']
+
+def test_batch_deferred_until_budget_frees(client, monkeypatch):
+    budget = _budget(monkeypatch, 1 << 30, max_wait=10)
+    held = threading.Event()
+
+    def hold():
+        with budget.reserve(budget.budget):
+            held.set()
+            time.sleep(0.5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+    start = time.perf_counter()
+    manifest = _batch_embed(client)
+    holder.join()
+    assert time.perf_counter() - start >= 0.4
+    assert manifest['summary'] == {'items': 2, 'succeeded': 2, 'failed': 0}
+
+def _shard_embed(client, count=2):
+    data = {
+        'carriers': [(io.BytesIO(_png(i)), f'cover{i}.png') for i in range(count)],
+        'secret_message': 'sharded secret'
+    }
+    return client.post('/shard/embed', data=data, content_type='multipart/form-data')
+
+def test_shard_set_refused_while_budget_exhausted(client, monkeypatch):
+    budget = _budget(monkeypatch, 1 << 30, max_wait=0.2)
+    with budget.reserve(budget.budget):
+        response = _shard_embed(client)
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+
+def test_shard_set_larger_than_budget_refused(client, monkeypatch):
+    # Each cover fits on its own, but not the whole set
+    _budget(monkeypatch, app_module.image_embed_peak_bytes(64 * 96 * 3, 20000) * 3 // 2, max_wait=0.2)
+    response = _shard_embed(client)
+    assert response.status_code == 413
+
+def test_shard_admission_held_until_sent(client, monkeypatch):
+    budget = _budget(monkeypatch, 1 << 30, max_wait=0.2)
+    response = _shard_embed(client)
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        assert json.loads(archive.read('manifest.json'))['summary']['succeeded'] == 2
+    response.close()
+    assert budget._reserved == 0
+    assert app_module._get_scheduler().heavy._running == 0
+
+def _job_embed(client):
+    data = {'image': (io.BytesIO(_png(0)), 'cover.png'), 'secret_message': 'job secret'}
+    return client.post('/jobs/embed_image', data=data, content_type='multipart/form-data')
+
+def test_job_refused_while_budget_exhausted(client, monkeypatch):
+    budget = _budget(monkeypatch, 1 << 30, max_wait=0.2)
+    with budget.reserve(budget.budget):
+        response = _job_embed(client)
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+
+def test_job_larger_than_budget_refused(client, monkeypatch):
+    _budget(monkeypatch, 1 << 20, max_wait=0.2)
+    assert _job_embed(client).status_code == 413
+
+def test_job_holds_budget_until_finished(client, monkeypatch):
+    budget = _budget(monkeypatch, 1 << 30, max_wait=0.2)
+    response = _job_embed(client)
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    deadline = time.perf_counter() + 60
+    while client.get(status_url).get_json()['status'] in ('queued', 'running'):
+        assert time.perf_counter() < deadline
+        time.sleep(0.05)
+    assert client.get(status_url).get_json()['status'] == 'done'
+    assert budget._reserved == 0
@@ -0,0 +1,107 @@
+import lzma
+
+import pytest
+from Crypto.Random import get_random_bytes
+
+import stego_core
+from stego_core import (AEAD_TAG_SIZE, COMPRESS_LZMA, COMPRESS_NONE, COMPRESS_ZLIB, PAYLOAD_BINARY, PAYLOAD_TEXT,
+                        _AEAD_HEADER, _aead_open, aead_encrypt_chunks, aead_encrypted_size, aes_encrypt,
+                        compress_payload, decompress_payload, decrypt_payload, encrypt_message)
+
+KEY = bytes(range(32))
+CHUNK = 64
+
+def _seal(plaintext, kind=PAYLOAD_BINARY, chunk_size=CHUNK):
+    return b''.join(aead_encrypt_chunks(plaintext, KEY, len(plaintext), kind, chunk_size))
+
+@pytest.mark.parametrize('length', [0, 1, CHUNK, CHUNK + 1, 3 * CHUNK])
+def test_sealed_payload_round_trips(length):
+    plaintext = get_random_bytes(length)
+    sealed = _seal(plaintext)
+    assert len(sealed) == aead_encrypted_size(length, CHUNK)
+    assert _aead_open(sealed, KEY) == (plaintext, PAYLOAD_BINARY)
+    assert decrypt_payload(sealed, KEY) == (plaintext, PAYLOAD_BINARY)
+
+def test_sealed_payload_reads_from_a_file(tmp_path):
+    plaintext = get_random_bytes(CHUNK * 2 + 5)
+    path = tmp_path / 'payload.bin'
+    path.write_bytes(plaintext)
+    with open(path, 'rb') as source:
+        sealed = b''.join(aead_encrypt_chunks(source, KEY, len(plaintext), PAYLOAD_BINARY, CHUNK))
+    assert decrypt_payload(sealed, KEY) == (plaintext, PAYLOAD_BINARY)
+
+def test_truncated_payload_rejected():
+    sealed = _seal(get_random_bytes(CHUNK * 2 + 10))
+    for cut in (1, AEAD_TAG_SIZE, 10 + AEAD_TAG_SIZE):
+        with pytest.raises(ValueError):
+            _aead_open(sealed[:-cut], KEY)
+
+def test_dropped_final_chunk_rejected():
+    # Two whole chunks; without the last one the first is not marked final
+    sealed = _seal(get_random_bytes(CHUNK * 2))
+    with pytest.raises(ValueError):
+        _aead_open(sealed[:-(CHUNK + AEAD_TAG_SIZE)], KEY)
+
+def test_flipped_byte_rejected():
+    sealed = _seal(get_random_bytes(CHUNK + 1))
+    for offset in (4, _AEAD_HEADER.size, _AEAD_HEADER.size + CHUNK, len(sealed) - 1):
+        tampered = bytearray(sealed)
+        tampered[offset] ^= 0x01
+        with pytest.raises(ValueError):
+            decrypt_payload(bytes(tampered), KEY)
+
+def test_wrong_key_rejected():
+    with pytest.raises(ValueError):
+        decrypt_payload(_seal(b'secret'), bytes(32))
+
+def test_legacy_eax_payload_still_decrypts():
+    encrypted_data, _, _ = aes_encrypt('legacy secret', KEY)
+    assert decrypt_payload(encrypted_data, KEY) == (b'legacy secret', PAYLOAD_TEXT)
+
+TEXT = 'the quick brown fox jumps over the lazy dog ' * 200
+
+def _compress(data, method):
+    """Raw stream for method, whichever compress_payload would have picked"""
+    if method == COMPRESS_LZMA:
+        return lzma.compress(data, lzma.FORMAT_RAW, filters=stego_core._LZMA_FILTERS)
+    return stego_core._deflate(data)
+
+def test_short_payload_left_uncompressed():
+    compression = compress_payload(b'short')
+    assert (compression.method, compression.data) == (COMPRESS_NONE, b'short')
+
+def test_compressed_message_round_trips():
+    encrypted_data, _, _, compression = encrypt_message(TEXT, KEY)
+    assert compression.method != COMPRESS_NONE
+    assert decompress_payload(compression.data, compression.method) == TEXT.encode()
+    # The high nibble of the kind byte records the compression
+    assert encrypted_data[4] == PAYLOAD_TEXT | compression.method << 4
+    assert decrypt_payload(encrypted_data, KEY) == (TEXT.encode(), PAYLOAD_TEXT)
+
+def test_deflate_only_without_budget():
+    assert compress_payload(TEXT.encode(), budget_ms=0).method == COMPRESS_ZLIB
+
+@pytest.mark.parametrize('kind', [PAYLOAD_TEXT, PAYLOAD_BINARY])
+@pytest.mark.parametrize('method', [COMPRESS_ZLIB, COMPRESS_LZMA])
+def test_kind_nibbles_round_trip(method, kind):
+    sealed = _seal(_compress(TEXT.encode(), method), kind | method << 4)
+    assert decrypt_payload(sealed, KEY) == (TEXT.encode(), kind)
+
+def test_unknown_compression_rejected():
+    with pytest.raises(ValueError):
+        decrypt_payload(_seal(b'data', PAYLOAD_TEXT | 0x70), KEY)
+
+@pytest.mark.parametrize('method', [COMPRESS_ZLIB, COMPRESS_LZMA])
+def test_decompression_bomb_rejected(method, monkeypatch):
+    bomb = _compress(bytes(1 << 16), method)
+    monkeypatch.setattr(stego_core, 'MAX_DECOMPRESSED_SIZE', 1 << 15)
+    with pytest.raises(ValueError, match='beyond'):
+        decompress_payload(bomb, method)
+    with pytest.raises(ValueError):
+        decrypt_payload(_seal(bomb, PAYLOAD_BINARY | method << 4), KEY)
+
+@pytest.mark.parametrize('method', [COMPRESS_ZLIB, COMPRESS_LZMA])
+def test_truncated_compressed_stream_rejected(method):
+    stream = _compress(TEXT.encode(), method)
+    with pytest.raises(ValueError):
+        decompress_payload(stream[:len(stream) // 2], method)
@@ -0,0 +1,17 @@
+import time
+
+import numpy as np
+
+from metrics import PeakMemory
+
+def test_rss_peak_keeps_buffers_freed_before_exit():
+    with PeakMemory('test', mode='rss') as tracker:
+        buffer = np.ones((2000, 2000, 3))
+        time.sleep(0.05)
+        del buffer
+    assert tracker.peak() >= 0.9 * 2000 * 2000 * 3 * 8
+
+def test_rss_peak_of_idle_block_is_small():
+    with PeakMemory('test', mode='rss') as tracker:
+        pass
+    assert tracker.peak() < 16 << 20
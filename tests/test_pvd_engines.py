@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import stego_core
+from stego_core import (pvd_capacity, pvd_embed, pvd_extract, pvd_max_payload_bytes, pvd_store, pvd_store_parallel,
+                        pvd_store_vectorized, pvd_unstore, pvd_unstore_parallel, pvd_unstore_vectorized)
+
+ENGINES = ('reference', 'vectorized', 'parallel')
+# Small bands put band edges inside every cover (a band is at least a row);
+# the default keeps each cover in one band. Parallel workers are spawned
+# with the default, but split the rows into tasks of their own.
+BAND_PAIRS = (1, 40, stego_core.PVD_BAND_PAIRS)
+
+def _case(seed, legacy=False):
+    """Seeded random cover (odd widths included) and a payload filling most of it"""
+    rng = np.random.default_rng(seed)
+    shape = (int(rng.integers(6, 24)), int(rng.integers(4, 40)), 3)
+    cover = rng.integers(0, 256, shape, dtype=np.uint8)
+    capacity = pvd_capacity(cover, legacy)[1]
+    limit = (capacity - 32) // 8 if legacy else pvd_max_payload_bytes(capacity)
+    length = int(rng.integers(1, max(2, limit)))
+    return cover, rng.integers(0, 256, length, dtype=np.uint8).tobytes()
+
+@pytest.mark.parametrize('band_pairs', BAND_PAIRS)
+@pytest.mark.parametrize('seed', range(4))
+def test_container_engines_agree(seed, band_pairs, monkeypatch):
+    monkeypatch.setattr(stego_core, 'PVD_BAND_PAIRS', band_pairs)
+    cover, payload = _case(seed)
+    stegos = {name: pvd_embed(cover, payload, workers=2, engine=name) for name in ENGINES}
+    for name in ENGINES:
+        assert np.array_equal(stegos[name], stegos['reference']), name
+        assert pvd_extract(stegos['reference'], workers=2, engine=name) == payload, name
+
+# The legacy format lets pixel values wrap (numpy uint8 overflow in change_diff)
+@pytest.mark.filterwarnings('ignore:overflow encountered:RuntimeWarning')
+@pytest.mark.parametrize('band_pairs', BAND_PAIRS)
+@pytest.mark.parametrize('seed', range(4))
+def test_legacy_engines_match_pvd_store(seed, band_pairs, monkeypatch):
+    monkeypatch.setattr(stego_core, 'PVD_BAND_PAIRS', band_pairs)
+    cover, payload = _case(seed, legacy=True)
+    stego = pvd_store(cover, payload)
+    assert np.array_equal(pvd_store_vectorized(cover, payload), stego)
+    assert np.array_equal(pvd_store_parallel(cover, payload, workers=2), stego)
+    extracted = pvd_unstore(stego)
+    assert pvd_unstore_vectorized(stego) == extracted
+    assert pvd_unstore_parallel(stego, workers=2) == extracted
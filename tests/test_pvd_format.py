@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from bitstream import BitStream
+from stego_core import (_anchored_pair, _pvd_read_bits, _pvd_store_stream, pvd_embed, pvd_extract,
+                        pvd_read_bits_reference, pvd_store, pvd_store_reference, pvd_store_vectorized, pvd_unstore,
+                        pvd_unstore_vectorized)
+
+# Two PVD layouts share the difference ranges but not the pixel update. The
+# legacy format (pvd_store) moves both pixels apart around the pair and lets
+# the values wrap modulo 256, which can leave the pair in another range, so
+# legacy payloads often read back wrong. The container codec keeps each
+# pair's anchor min + dif // 2 and skips pairs whose range does not fit
+# around it. These tests pin both layouts so a change to either shows up
+# on its own.
+COVER = np.array([[[95, 130, 194], [217, 207, 235]]], dtype=np.uint8)
+BITS = np.array([1, 0, 1, 0, 0, 1, 0, 1, 1, 0, 1, 1], dtype=np.uint8)
+
+def _noise(shape=(32, 32, 3)):
+    return np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+
+# The wrap is numpy uint8 overflow in change_diff
+@pytest.mark.filterwarnings('ignore:overflow encountered:RuntimeWarning')
+def test_legacy_pixels_wrap_around():
+    stego = pvd_store(COVER, b'\xa5')
+    # 95 and 217 (difference 122) are pushed past 0..255 and wrap
+    assert stego.tolist() == [[[236, 9, 71], [76, 73, 103]]]
+    assert np.array_equal(pvd_store_vectorized(COVER, b'\xa5'), stego)
+
+@pytest.mark.filterwarnings('ignore:overflow encountered:RuntimeWarning')
+def test_legacy_wrap_around_loses_payloads():
+    cover, payload = _noise(), bytes(range(1, 101))
+    assert pvd_unstore(pvd_store(cover, payload)) != payload
+    assert pvd_unstore_vectorized(pvd_store_vectorized(cover, payload)) != payload
+
+def test_anchored_pairs_keep_their_anchor():
+    assert [_anchored_pair(int(a), int(b)) for a, b in zip(COVER[0, 0], COVER[0, 1])] == \
+        [(156, 96, 5), (168, 64, 5), (214, 32, 4)]
+    stego = pvd_store_reference(COVER, BitStream(BITS))
+    assert stego.tolist() == [[[98, 125, 192], [214, 211, 236]]]
+    assert np.array_equal(_pvd_store_stream(COVER, BitStream(BITS), False), stego)
+    for k in range(3):
+        assert _anchored_pair(*map(int, stego[0, :, k]))[0] == _anchored_pair(*map(int, COVER[0, :, k]))[0]
+    assert pvd_read_bits_reference(stego, len(BITS)).tolist() == BITS.tolist()
+    assert _pvd_read_bits(stego, len(BITS), False).tolist() == BITS.tolist()
+
+def test_container_round_trips_where_legacy_does_not():
+    cover, payload = _noise(), bytes(range(1, 101))
+    assert pvd_extract(pvd_embed(cover, payload)) == payload